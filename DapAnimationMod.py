@@ -65,6 +65,7 @@ from PySide import QtGui, QtCore
 from pivy import coin
 
 import DapToolsMod as DT
+import DapSolutionMod
 
 Debug = False
 # =============================================================================
@@ -231,8 +232,22 @@ class TaskPanelDapAnimateClass:
         for animationBodyName in self.solverObj.BodyNames:
             self.animationBodyObj.append(self.animationDocument.findObjects(Name="^Ani_"+animationBodyName+"$")[0])
 
-        # Load the calculated values of positions/angles from the results file
-        self.Positions = np.loadtxt(path.join(self.solverObj.Directory, "DapAnimation.csv"))
+        # Load the calculated values of positions/angles
+        # Sample them from the dense solution if it is there, at the animation time step (if one is set)
+        # otherwise use the results file, which is at the reporting time step of the solution
+        # A static equilibrium or modal analysis leaves the dense solution of the last dynamic solution untouched
+        solutionFileName = path.join(self.solverObj.Directory, DapSolutionMod.SOLUTION_FILE_NAME)
+        if path.isfile(solutionFileName) and getattr(self.solverObj, "AnalysisType", "Dynamic") == "Dynamic":
+            denseSolution = DapSolutionMod.DapDenseSolutionC()
+            denseSolution.loadFromFile(solutionFileName)
+            if self.solverObj.AnimationTimeStep > 0.0:
+                frameTimes = denseSolution.reportingTimes(self.solverObj.AnimationTimeStep)
+            else:
+                frameTimes = denseSolution.reportingTimes(self.solverObj.DeltaTime)
+            self.Positions = np.column_stack((frameTimes,
+                                              denseSolution.sample(frameTimes)[:, :len(self.solverObj.BodyNames) * 3]))
+        else:
+            self.Positions = np.loadtxt(path.join(self.solverObj.Directory, "DapAnimation.csv"))
         self.nTimeSteps = len(self.Positions.T[0])
 
         # Positions matrix is:
@@ -320,7 +335,7 @@ class TaskPanelDapAnimateClass:
 
         self.form.timeStepLabel.setText(
             "{0:5.3f}s of {1:5.3f}s".format(
-                tick * self.solverObj.DeltaTime,
+                self.Positions[tick, 0],
                 self.solverObj.TimeLength
             )
         )
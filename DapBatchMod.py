@@ -0,0 +1,242 @@
+# ********************************************************************************
+# *                                                                              *
+# *   This program is free software; you can redistribute it and/or modify       *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)         *
+# *   as published by the Free Software Foundation; either version 3 of          *
+# *   the License, or (at your option) any later version.                        *
+# *   for detail see the LICENCE text file.                                      *
+# *                                                                              *
+# *   This program is distributed in the hope that it will be useful,            *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of             *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       *
+# *   See the GNU Lesser General Public License for more details.                *
+# *                                                                              *
+# *   You should have received a copy of the GNU Lesser General Public           *
+# *   License along with this program; if not, write to the Free Software        *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston,                      *
+# *   MA 02111-1307, USA                                                         *
+# *_____________________________________________________________________________ *
+# *                                                                              *
+# *        ##########################################################            *
+# *       #### Nikra-DAP FreeCAD WorkBench Revision 2.1 (c) 2024: ####           *
+# *        ##########################################################            *
+# *                                                                              *
+# *                     Authors of this workbench:                               *
+# *                   Cecil Churms <churms@gmail.com>                            *
+# *             Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                 *
+# *                                                                              *
+# *               This file is a sizeable expansion of the:                      *
+# *                "Nikra-DAP-Rev-1" workbench for FreeCAD                       *
+# *        with increased functionality and inherent code documentation          *
+# *                  by means of expanded variable naming                        *
+# *                                                                              *
+# *     Which in turn, is based on the MATLAB code Complementary to              *
+# *                  Chapters 7 and 8 of the textbook:                           *
+# *                                                                              *
+# *                     "PLANAR MULTIBODY DYNAMICS                               *
+# *         Formulation, Programming with MATLAB, and Applications"              *
+# *                          Second Edition                                      *
+# *                         by P.E. Nikravesh                                    *
+# *                          CRC Press, 2018                                     *
+# *                                                                              *
+# *     Authors of Rev-1:                                                        *
+# *            Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>         *
+# *            Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                  *
+# *            Dewald Hattingh (UP) <u17082006@tuks.co.za>                       *
+# *            Varnu Govender (UP) <govender.v@tuks.co.za>                       *
+# *                                                                              *
+# * Copyright (c) 2024 Cecil Churms <churms@gmail.com>                           *
+# * Copyright (c) 2024 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>          *
+# * Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za> *
+# * Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>               *
+# * Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>               *
+# *                                                                              *
+# *             Please refer to the Documentation and README for                 *
+# *         more information regarding this WorkBench and its usage              *
+# *                                                                              *
+# ********************************************************************************
+import FreeCAD as CAD
+
+import os
+import csv
+import json
+import time
+import concurrent.futures
+
+import DapToolsMod as DT
+import DapMainMod
+
+Debug = False
+# =============================================================================
+# The batch runner solves one base model many times, each time with a different
+# set of parameter overrides, e.g. spring stiffness, body masses, driver
+# parameters or initial velocities.  The model is compiled once from the
+# FreeCAD document, and the variants are then solved (in parallel) from the
+# compiled model without reference to the document
+#
+# Example of use from the FreeCAD Python console:
+#   import DapBatchMod
+#   model = DapBatchMod.compileActiveModel(2.0, 0.01, 5, True)
+#   batch = DapBatchMod.DapBatchC(model, 2.0, 0.01, 5, True)
+#   overrides = [{"DapForce001.Stiffness": k} for k in (100.0, 200.0, 400.0)]
+#   summaries = batch.runBatch(overrides, "/tmp/sweep", "Results")
+# or, to integrate all the variants together in one vectorised solve:
+#   summaries = batch.runScenarios(overrides, "/tmp/sweep")
+# =============================================================================
+def compileActiveModel(simEnd, simDelta, Accuracy, correctInitial):
+    """Build the model in the active DAP container and return it in compiled form"""
+    if Debug:
+        DT.Mess("compileActiveModel")
+    mainInstance = DapMainMod.DapMainC(simEnd, simDelta, Accuracy, correctInitial)
+    return mainInstance.compileModel()
+#  -------------------------------------------------------------------------
+def readOverrideTable(fileName):
+    """Read a table of parameter overrides from a CSV file
+    The first row contains the parameter names, e.g. 'DapForce001.Stiffness'
+    and every following row is one run.  A value containing ';' is read
+    as a vector, e.g. '100;0' for a body 'worldDot'"""
+    if Debug:
+        DT.Mess("readOverrideTable")
+    overrideTable = []
+    with open(fileName, newline="") as tableFILE:
+        reader = csv.reader(tableFILE)
+        parameterNames = [name.strip() for name in next(reader)]
+        for row in reader:
+            if len(row) == 0:
+                continue
+            overrides = {}
+            for parameterName, valueString in zip(parameterNames, row):
+                if ";" in valueString:
+                    overrides[parameterName] = tuple(float(value) for value in valueString.split(";"))
+                else:
+                    overrides[parameterName] = float(valueString)
+            overrideTable.append(overrides)
+    return overrideTable
+#  -------------------------------------------------------------------------
+def solveBatchRun(runArguments):
+    """Solve a single run of the batch and return its summary
+    This is called in the worker processes, so it must stay at module level"""
+    (runNumber, compiledModel, overrides, simEnd, simDelta, Accuracy, correctInitial,
+     runDirectory, outputFileName) = runArguments
+    summary = {"run": runNumber,
+               "overrides": overrides,
+               "directory": runDirectory,
+               "status": "error",
+               "message": "",
+               "endTime": 0.0,
+               "evaluations": 0,
+               "wallTime": 0.0,
+               "finalState": []}
+    startTime = time.perf_counter()
+    try:
+        os.makedirs(runDirectory, exist_ok=True)
+        mainInstance = DapMainMod.DapMainC(simEnd, simDelta, Accuracy, correctInitial, compiledModel=compiledModel)
+        mainInstance.outputDirectory = runDirectory
+        mainInstance.outputFileName = outputFileName
+        for parameterName, value in overrides.items():
+            mainInstance.setParameter(parameterName, value)
+        if mainInstance.prepareSolution() is False:
+            summary["message"] = "Initial conditions could not be made consistent with the constraints"
+        else:
+            mainInstance.integrateSolution()
+            mainInstance.writeResults()
+            summary["status"] = mainInstance.solveStatus
+            summary["message"] = mainInstance.solveMessage
+            summary["endTime"] = float(mainInstance.solveEndTime)
+            summary["evaluations"] = mainInstance.Counter
+            if len(mainInstance.uResults) > 0:
+                summary["finalState"] = mainInstance.uResults[-1].tolist()
+    except Exception as e:
+        summary["message"] = str(e)
+    summary["wallTime"] = time.perf_counter() - startTime
+    return summary
+# =============================================================================
+class DapBatchC:
+    """Solve a compiled base model once for every set of parameter overrides in a table"""
+    #  -------------------------------------------------------------------------
+    def __init__(self, compiledModel, simEnd, simDelta, Accuracy, correctInitial=True):
+        if Debug:
+            DT.Mess("DapBatchC-__init__")
+        self.compiledModel = compiledModel
+        self.simEnd = simEnd
+        self.simDelta = simDelta
+        self.Accuracy = Accuracy
+        self.correctInitial = correctInitial
+        self.summaries = []
+    #  -------------------------------------------------------------------------
+    def runBatch(self, overrideTable, batchDirectory, outputFileName="-", maxWorkers=None):
+        """Solve every row of the override table, each into its own RunNNNN sub-directory
+        of batchDirectory, and return the list of run summaries
+        maxWorkers=1 solves the runs one after the other in this process"""
+        if Debug:
+            DT.Mess("DapBatchC-runBatch")
+        os.makedirs(batchDirectory, exist_ok=True)
+        argumentList = []
+        for runNumber in range(len(overrideTable)):
+            runDirectory = os.path.join(batchDirectory, "Run" + str(runNumber).zfill(4))
+            argumentList.append((runNumber, self.compiledModel, overrideTable[runNumber],
+                                 self.simEnd, self.simDelta, self.Accuracy, self.correctInitial,
+                                 runDirectory, outputFileName))
+
+        if maxWorkers == 1:
+            self.summaries = [solveBatchRun(runArguments) for runArguments in argumentList]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+                self.summaries = list(executor.map(solveBatchRun, argumentList))
+
+        # Report the runs which did not reach the end
+        for summary in self.summaries:
+            if summary["status"] != "finished":
+                CAD.Console.PrintError("Batch run " + str(summary["run"]) + " did not complete: " +
+                                       summary["message"] + "\n")
+
+        with open(os.path.join(batchDirectory, "DapBatchSummary.json"), "w") as summaryFILE:
+            json.dump(self.summaries, summaryFILE, indent=1)
+        return self.summaries
+    #  -------------------------------------------------------------------------
+    def runScenarios(self, overrideTable, batchDirectory, fixedStep=False):
+        """Solve every row of the override table together in one vectorised integration
+        (DapMainC.AnalysisBatch) instead of one process per run
+        Each scenario's animation file is written into its own ScenarioNNNN sub-directory"""
+        if Debug:
+            DT.Mess("DapBatchC-runScenarios")
+        startTime = time.perf_counter()
+        mainInstance = DapMainMod.DapMainC(self.simEnd, self.simDelta, self.Accuracy, self.correctInitial,
+                                           compiledModel=self.compiledModel)
+        if mainInstance.setUpScenarios(overrideTable) is False:
+            CAD.Console.PrintError("Initial conditions of a scenario could not be made consistent with the constraints\n")
+            return []
+        mainInstance.integrateScenarios(fixedStep)
+
+        self.summaries = []
+        for runNumber in range(len(overrideTable)):
+            scenario = mainInstance.scenarioList[runNumber]
+            scenario.outputDirectory = os.path.join(batchDirectory, "Scenario" + str(runNumber).zfill(4))
+            os.makedirs(scenario.outputDirectory, exist_ok=True)
+            scenario.writeResults()
+            self.summaries.append({"run": runNumber,
+                                   "overrides": overrideTable[runNumber],
+                                   "directory": scenario.outputDirectory,
+                                   "status": scenario.solveStatus,
+                                   "evaluations": int(mainInstance.scenarioCounterNp[runNumber]),
+                                   "finalState": scenario.uResults[-1].tolist()})
+            if scenario.solveStatus != "finished":
+                CAD.Console.PrintError("Scenario " + str(runNumber) + " did not complete\n")
+        DT.Mess("Scenarios solved in " + str(round(time.perf_counter() - startTime, 3)) + " s")
+
+        with open(os.path.join(batchDirectory, "DapBatchSummary.json"), "w") as summaryFILE:
+            json.dump(self.summaries, summaryFILE, indent=1)
+        return self.summaries
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("DapBatchC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("DapBatchC-loads")
+        if state:
+            self.Type = state
+        return None
+    #  =========================================================================
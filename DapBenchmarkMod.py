@@ -0,0 +1,485 @@
+# ********************************************************************************
+# *                                                                              *
+# *   This program is free software; you can redistribute it and/or modify       *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)         *
+# *   as published by the Free Software Foundation; either version 3 of          *
+# *   the License, or (at your option) any later version.                        *
+# *   for detail see the LICENCE text file.                                      *
+# *                                                                              *
+# *   This program is distributed in the hope that it will be useful,            *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of             *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       *
+# *   See the GNU Lesser General Public License for more details.                *
+# *                                                                              *
+# *   You should have received a copy of the GNU Lesser General Public           *
+# *   License along with this program; if not, write to the Free Software        *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston,                      *
+# *   MA 02111-1307, USA                                                         *
+# *_____________________________________________________________________________ *
+# *                                                                              *
+# *        ##########################################################            *
+# *       #### Nikra-DAP FreeCAD WorkBench Revision 2.1 (c) 2024: ####           *
+# *        ##########################################################            *
+# *                                                                              *
+# *                     Authors of this workbench:                               *
+# *                   Cecil Churms <churms@gmail.com>                            *
+# *             Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                 *
+# *                                                                              *
+# *               This file is a sizeable expansion of the:                      *
+# *                "Nikra-DAP-Rev-1" workbench for FreeCAD                       *
+# *        with increased functionality and inherent code documentation          *
+# *                  by means of expanded variable naming                        *
+# *                                                                              *
+# *     Which in turn, is based on the MATLAB code Complementary to              *
+# *                  Chapters 7 and 8 of the textbook:                           *
+# *                                                                              *
+# *                     "PLANAR MULTIBODY DYNAMICS                               *
+# *         Formulation, Programming with MATLAB, and Applications"              *
+# *                          Second Edition                                      *
+# *                         by P.E. Nikravesh                                    *
+# *                          CRC Press, 2018                                     *
+# *                                                                              *
+# *     Authors of Rev-1:                                                        *
+# *            Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>         *
+# *            Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                  *
+# *            Dewald Hattingh (UP) <u17082006@tuks.co.za>                       *
+# *            Varnu Govender (UP) <govender.v@tuks.co.za>                       *
+# *                                                                              *
+# * Copyright (c) 2024 Cecil Churms <churms@gmail.com>                           *
+# * Copyright (c) 2024 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>          *
+# * Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za> *
+# * Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>               *
+# * Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>               *
+# *                                                                              *
+# *             Please refer to the Documentation and README for                 *
+# *         more information regarding this WorkBench and its usage              *
+# *                                                                              *
+# ********************************************************************************
+import FreeCAD as CAD
+
+import os
+import json
+import math
+import time
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+
+import DapToolsMod as DT
+import DapMainMod
+
+Debug = False
+# =============================================================================
+# Synthetic scaling benchmarks for the solver (DapMainC)
+#
+# Models of increasing size are generated directly as solver records, without a
+# FreeCAD document, so this can be run headless (e.g. in FreeCADCmd).  For each
+# model the setup time, the number of RHS (Analysis) evaluations per second, the
+# full solution wall time, the output time and the peak memory are measured and
+# written to a JSON file, which can be compared against a stored baseline to
+# catch scaling regressions
+#
+# Example of use from the FreeCAD Python console (or FreeCADCmd):
+#   import DapBenchmarkMod
+#   DapBenchmarkMod.runSuite("/tmp/DapBenchmark.json", "/tmp/DapBenchmarkBaseline.json")
+# =============================================================================
+# Gravity used in all the benchmark models [mm/s^2]
+BENCHMARK_GRAVITY = CAD.Vector(0.0, -9810.0, 0.0)
+# The full solution is only timed for models up to this many bodies
+# Larger models are only timed for setup and RHS evaluations
+SOLVE_BODY_LIMIT = 100
+# Number of RHS evaluations timed for the evaluations per second figure
+NUM_RHS_EVALUATIONS = 50
+# A benchmark result this much slower (or bigger) than the baseline is a regression
+REGRESSION_TOLERANCE = 1.25
+# Timings which are compared against the baseline
+COMPARED_METRICS = ["setupTime", "rhsTime", "solveTime", "outputTime", "peakMemory"]
+# =============================================================================
+class DapModelBuilderC:
+    """Build the records of a headless model (see DapMainC.buildModelFromRecords)
+    from links, blocks, joints and forces.  Body 0 is the ground and its points
+    are given in world coordinates"""
+    #  -------------------------------------------------------------------------
+    def __init__(self):
+        if Debug:
+            DT.Mess("DapModelBuilderC-__init__")
+        self.bodies = []
+        self.joints = []
+        self.forces = []
+        self.addBody("Ground", 1.0, 1.0, (0.0, 0.0), 0.0, [])
+    #  -------------------------------------------------------------------------
+    def addBody(self, name, mass, momentInertia, centreOfGravity, phi, pointLocals):
+        """Add a body with its points given relative to its CoG in body local coordinates
+        Returns the index of the body"""
+        pointNames = [name + "-Point" + str(index).zfill(3) for index in range(len(pointLocals))]
+        self.bodies.append(DapMainMod.DapObjectRecordC(
+            Name=name,
+            Label=name,
+            Mass=mass,
+            momentInertia=momentInertia,
+            centreOfGravity=CAD.Vector(centreOfGravity[0], centreOfGravity[1], 0.0),
+            phi=phi,
+            worldDot=CAD.Vector(),
+            phiDot=0.0,
+            pointNames=pointNames,
+            pointLabels=list(pointNames),
+            pointLocals=[CAD.Vector(xi, eta, 0.0) for xi, eta in pointLocals]))
+        return len(self.bodies) - 1
+    #  -------------------------------------------------------------------------
+    def addGroundPoint(self, x, y):
+        """Add a point to the ground and return its index"""
+        ground = self.bodies[0]
+        ground.pointNames.append("Ground-Point" + str(len(ground.pointLocals)).zfill(3))
+        ground.pointLabels.append(ground.pointNames[-1])
+        ground.pointLocals.append(CAD.Vector(x, y, 0.0))
+        return len(ground.pointLocals) - 1
+    #  -------------------------------------------------------------------------
+    def addBodyAtPoints(self, name, mass, momentInertia, centreOfGravity, worldPoints):
+        """Add a body with phi = 0 and its points given in world coordinates"""
+        return self.addBody(name, mass, momentInertia, centreOfGravity, 0.0,
+                            [(x - centreOfGravity[0], y - centreOfGravity[1]) for x, y in worldPoints])
+    #  -------------------------------------------------------------------------
+    def addLink(self, name, start, end, mass):
+        """Add a slender link from start to end - point 0 is at the start and point 1 at the end"""
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        return self.addBody(name, mass, mass * length**2 / 12.0,
+                            ((start[0] + end[0]) / 2.0, (start[1] + end[1]) / 2.0),
+                            math.atan2(end[1] - start[1], end[0] - start[0]),
+                            [(-length / 2.0, 0.0), (length / 2.0, 0.0)])
+    #  -------------------------------------------------------------------------
+    def addBlock(self, name, centre, mass, size):
+        """Add a square block - point 0 is at its centre, point 1 along its x axis and point 2 along its y axis"""
+        return self.addBody(name, mass, mass * size**2 / 6.0, centre, 0.0,
+                            [(0.0, 0.0), (size / 2.0, 0.0), (0.0, size / 2.0)])
+    #  -------------------------------------------------------------------------
+    def addJoint(self, jointTypeName, body_I_Index, point_I_i_Index, body_J_Index, point_J_i_Index,
+                 point_I_j_Index=0, point_J_j_Index=0, **properties):
+        """Add a joint of the type named in DT.JOINT_TYPE_DICTIONARY between two body points
+        The second points define the unit vectors of the translational joints
+        Any other joint properties (e.g. x0 of a Disc) can be given as keywords"""
+        jointName = "Joint" + str(len(self.joints)).zfill(4)
+        self.joints.append(DapMainMod.DapObjectRecordC(
+            Name=jointName,
+            Label=jointName,
+            JointType=DT.JOINT_TYPE_DICTIONARY[jointTypeName],
+            JointNumber=len(self.joints),
+            fixDof=False,
+            body_I_Index=body_I_Index,
+            body_J_Index=body_J_Index,
+            point_I_i_Index=point_I_i_Index,
+            point_I_j_Index=point_I_j_Index,
+            point_J_i_Index=point_J_i_Index,
+            point_J_j_Index=point_J_j_Index,
+            FunctType=-1,
+            lengthLink=0.0,
+            Radius=0.0,
+            world0=CAD.Vector(),
+            phi0=0.0,
+            d0=CAD.Vector(),
+            nMovBodies=-1,
+            mConstraints=-1,
+            rowStart=-1,
+            rowEnd=-1,
+            **properties))
+    #  -------------------------------------------------------------------------
+    def addForce(self, forceTypeName, body_I_Index=0, point_i_Index=0, body_J_Index=0, point_j_Index=0,
+                 Stiffness=0.0, LengthAngle0=0.0, DampingCoeff=0.0, **properties):
+        """Add a force of the type named in DT.FORCE_TYPE_DICTIONARY
+        Any other force properties (e.g. constTorque) can be given as keywords"""
+        properties.setdefault("ForceMagnitude", 0.0)
+        properties.setdefault("TorqueMagnitude", 0.0)
+        properties.setdefault("constLocalForce", CAD.Vector())
+        properties.setdefault("constWorldForce", CAD.Vector())
+        properties.setdefault("constTorque", 0.0)
+        forceName = "Force" + str(len(self.forces)).zfill(4)
+        self.forces.append(DapMainMod.DapObjectRecordC(
+            Name=forceName,
+            Label=forceName,
+            actuatorType=DT.FORCE_TYPE_DICTIONARY[forceTypeName],
+            body_I_Index=body_I_Index,
+            point_i_Index=point_i_Index,
+            body_J_Index=body_J_Index,
+            point_j_Index=point_j_Index,
+            Stiffness=Stiffness,
+            LengthAngle0=LengthAngle0,
+            DampingCoeff=DampingCoeff,
+            **properties))
+    #  -------------------------------------------------------------------------
+    def modelRecords(self):
+        """Return the records ready for DapMainC(..., modelRecords=...)"""
+        return {"bodies": self.bodies,
+                "joints": self.joints,
+                "forces": self.forces,
+                "gravity": BENCHMARK_GRAVITY}
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("DapModelBuilderC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("DapModelBuilderC-loads")
+        if state:
+            self.Type = state
+        return None
+    #  =========================================================================
+# =============================================================================
+# The model generators - each returns the modelRecords of a model of the given size
+# =============================================================================
+def circleIntersection(centre1, radius1, centre2, radius2):
+    """Return the intersection of two circles which lies to the left of centre1 -> centre2"""
+    dx = centre2[0] - centre1[0]
+    dy = centre2[1] - centre1[1]
+    distance = math.hypot(dx, dy)
+    along = (distance**2 + radius1**2 - radius2**2) / (2.0 * distance)
+    across = math.sqrt(max(radius1**2 - along**2, 0.0))
+    return (centre1[0] + (along * dx - across * dy) / distance,
+            centre1[1] + (along * dy + across * dx) / distance)
+#  -------------------------------------------------------------------------
+def pendulumChain(numBodies, linkLength=100.0, linkMass=0.5):
+    """A chain of links joined by revolute joints, hanging from the ground and released horizontally"""
+    builder = DapModelBuilderC()
+    previousBody = 0
+    previousPoint = builder.addGroundPoint(0.0, 0.0)
+    for index in range(numBodies):
+        bodyIndex = builder.addLink("Link" + str(index).zfill(4),
+                                    (index * linkLength, 0.0), ((index + 1) * linkLength, 0.0), linkMass)
+        builder.addJoint("Revolute", previousBody, previousPoint, bodyIndex, 0)
+        previousBody = bodyIndex
+        previousPoint = 1
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def fourBarArray(numMechanisms, spacing=400.0):
+    """A row of independent four-bar linkages (crank, coupler and rocker)"""
+    builder = DapModelBuilderC()
+    for index in range(numMechanisms):
+        pivotA = (index * spacing, 0.0)
+        pivotD = (index * spacing + 200.0, 0.0)
+        pointB = (pivotA[0] + 60.0 * math.cos(math.pi / 3.0), 60.0 * math.sin(math.pi / 3.0))
+        pointC = circleIntersection(pointB, 220.0, pivotD, 150.0)
+        groundA = builder.addGroundPoint(*pivotA)
+        groundD = builder.addGroundPoint(*pivotD)
+        crank = builder.addLink("Crank" + str(index).zfill(4), pivotA, pointB, 0.2)
+        coupler = builder.addLink("Coupler" + str(index).zfill(4), pointB, pointC, 0.6)
+        rocker = builder.addLink("Rocker" + str(index).zfill(4), pivotD, pointC, 0.4)
+        builder.addJoint("Revolute", 0, groundA, crank, 0)
+        builder.addJoint("Revolute", crank, 1, coupler, 0)
+        builder.addJoint("Revolute", coupler, 1, rocker, 1)
+        builder.addJoint("Revolute", rocker, 0, 0, groundD)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def sliderCrankArray(numMechanisms, spacing=500.0):
+    """A row of independent slider-crank mechanisms, each slider on a horizontal track"""
+    builder = DapModelBuilderC()
+    for index in range(numMechanisms):
+        pivotA = (index * spacing, 0.0)
+        pointB = (pivotA[0] + 50.0 * math.cos(math.pi / 4.0), 50.0 * math.sin(math.pi / 4.0))
+        pointC = (pointB[0] + math.sqrt(200.0**2 - pointB[1]**2), 0.0)
+        groundA = builder.addGroundPoint(*pivotA)
+        groundTrack = builder.addGroundPoint(*pointC)
+        groundTrackEnd = builder.addGroundPoint(pointC[0] + 10.0, 0.0)
+        crank = builder.addLink("Crank" + str(index).zfill(4), pivotA, pointB, 0.2)
+        rod = builder.addLink("Rod" + str(index).zfill(4), pointB, pointC, 0.5)
+        slider = builder.addBlock("Slider" + str(index).zfill(4), pointC, 1.0, 40.0)
+        builder.addJoint("Revolute", 0, groundA, crank, 0)
+        builder.addJoint("Revolute", crank, 1, rod, 0)
+        builder.addJoint("Revolute", rod, 1, slider, 0)
+        builder.addJoint("Translation", slider, 0, 0, groundTrack, 1, groundTrackEnd)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def springLattice(numSide, spacing=100.0):
+    """A square lattice of free blocks joined to their neighbours by linear spring-dampers
+    The top row hangs from the ground by spring-dampers as well - there are no joints"""
+    builder = DapModelBuilderC()
+    blockIndex = {}
+    for row in range(numSide):
+        for column in range(numSide):
+            blockIndex[row, column] = builder.addBlock("Block" + str(row).zfill(3) + str(column).zfill(3),
+                                                       (column * spacing, -(row + 1) * spacing), 0.1, 20.0)
+    for row in range(numSide):
+        for column in range(numSide):
+            if row == 0:
+                groundPoint = builder.addGroundPoint(column * spacing, 0.0)
+                builder.addForce("Linear Spring Damper", 0, groundPoint, blockIndex[row, column], 0,
+                                 Stiffness=50.0, LengthAngle0=spacing, DampingCoeff=0.5)
+            if column > 0:
+                builder.addForce("Linear Spring Damper", blockIndex[row, column - 1], 0, blockIndex[row, column], 0,
+                                 Stiffness=50.0, LengthAngle0=spacing, DampingCoeff=0.5)
+            if row > 0:
+                builder.addForce("Linear Spring Damper", blockIndex[row - 1, column], 0, blockIndex[row, column], 0,
+                                 Stiffness=50.0, LengthAngle0=spacing, DampingCoeff=0.5)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def mixedLinkageArray(numMechanisms, spacing=500.0):
+    """A row of crank-rocker linkages with a massless Revolute-Revolute coupler,
+    where the rocker tip drives a sliding yoke through a Translation-Revolute joint
+    The crank is short (30 against a coupler of 200, a rocker of 150 and 200 between the pivots)
+    so that the transmission angle stays between 56 and 81 degrees whichever way the crank turns,
+    and the mechanism never comes near a toggle"""
+    builder = DapModelBuilderC()
+    for index in range(numMechanisms):
+        pivotA = (index * spacing, 0.0)
+        pivotD = (index * spacing + 200.0, 0.0)
+        pointB = (pivotA[0] + 30.0 * math.cos(math.pi / 3.0), 30.0 * math.sin(math.pi / 3.0))
+        pointC = circleIntersection(pointB, 200.0, pivotD, 150.0)
+        groundA = builder.addGroundPoint(*pivotA)
+        groundD = builder.addGroundPoint(*pivotD)
+        groundTrack = builder.addGroundPoint(*pointC)
+        groundTrackEnd = builder.addGroundPoint(pointC[0] + 10.0, pointC[1])
+        crank = builder.addLink("Crank" + str(index).zfill(4), pivotA, pointB, 0.2)
+        rocker = builder.addLink("Rocker" + str(index).zfill(4), pivotD, pointC, 0.4)
+        yoke = builder.addBlock("Yoke" + str(index).zfill(4), pointC, 0.5, 40.0)
+        builder.addJoint("Revolute", 0, groundA, crank, 0)
+        builder.addJoint("Revolute", 0, groundD, rocker, 0)
+        builder.addJoint("Revolute-Revolute", crank, 1, rocker, 1)
+        # The yoke slides horizontally and its vertical slot carries the rocker tip
+        builder.addJoint("Translation", yoke, 0, 0, groundTrack, 1, groundTrackEnd)
+        builder.addJoint("Translation-Revolute", yoke, 0, rocker, 1, 2)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+# =============================================================================
+# The benchmark suite - generator and model sizes of every case
+# =============================================================================
+BENCHMARK_CASES = [
+    ("PendulumChain", pendulumChain, [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]),
+    ("FourBarArray", fourBarArray, [1, 5, 20]),
+    ("SliderCrankArray", sliderCrankArray, [1, 5, 20]),
+    ("SpringLattice", springLattice, [2, 4, 8]),
+    ("MixedLinkageArray", mixedLinkageArray, [1, 5, 20]),
+]
+# =============================================================================
+def runBenchmark(caseName, modelRecords, simEnd=1.0, simDelta=0.01, Accuracy=3, measureMemory=True):
+    """Measure setup time, RHS evaluations per second, solution time,
+    output time and peak memory for one model and return them in a dictionary
+    The peak memory is measured in a separate solution, so that the overhead
+    of tracemalloc does not affect the timings"""
+    if Debug:
+        DT.Mess("runBenchmark")
+    result = {"case": caseName,
+              "numBodies": len(modelRecords["bodies"]) - 1,
+              "status": "error",
+              "message": ""}
+    try:
+        startTime = time.perf_counter()
+        mainInstance = DapMainMod.DapMainC(simEnd, simDelta, Accuracy, True, modelRecords=modelRecords)
+        if mainInstance.prepareSolution() is False:
+            result["message"] = "Initial conditions could not be made consistent with the constraints"
+            return result
+        result["setupTime"] = time.perf_counter() - startTime
+        result["numConstraints"] = mainInstance.numConstraints
+
+        # Time a fixed number of RHS evaluations at the initial state
+        startTime = time.perf_counter()
+        for evaluation in range(NUM_RHS_EVALUATIONS):
+            mainInstance.Analysis(0.0, mainInstance.uArray)
+        result["rhsTime"] = (time.perf_counter() - startTime) / NUM_RHS_EVALUATIONS
+        result["rhsPerSecond"] = 1.0 / result["rhsTime"]
+
+        if result["numBodies"] <= SOLVE_BODY_LIMIT:
+            mainInstance.Counter = 0
+            startTime = time.perf_counter()
+            mainInstance.integrateSolution()
+            result["solveTime"] = time.perf_counter() - startTime
+            result["evaluations"] = mainInstance.Counter
+            result["status"] = mainInstance.solveStatus
+            result["message"] = mainInstance.solveMessage
+            # The timings of a solution which stopped part way cannot be compared with anything
+            if mainInstance.solveStatus == "failed":
+                result["status"] = "error"
+                result["message"] = "Integration failed: " + str(mainInstance.solveMessage)
+                return result
+
+            with tempfile.TemporaryDirectory() as outputDirectory:
+                mainInstance.outputDirectory = outputDirectory
+                mainInstance.outputFileName = "DapBenchmark"
+                startTime = time.perf_counter()
+                mainInstance.writeResults()
+                result["outputTime"] = time.perf_counter() - startTime
+        else:
+            result["status"] = "not solved"
+        if measureMemory:
+            result["peakMemory"] = peakMemory(modelRecords, simEnd, simDelta, Accuracy,
+                                              result["numBodies"] <= SOLVE_BODY_LIMIT)
+    except Exception as e:
+        result["message"] = str(e)
+    return result
+#  -------------------------------------------------------------------------
+def peakMemory(modelRecords, simEnd, simDelta, Accuracy, solve):
+    """Return the peak memory [bytes] allocated while setting up (and if solve is True, solving)
+    the model, in a pass of its own under tracemalloc"""
+    if Debug:
+        DT.Mess("peakMemory")
+    tracemalloc.start()
+    try:
+        mainInstance = DapMainMod.DapMainC(simEnd, simDelta, Accuracy, True, modelRecords=modelRecords)
+        if mainInstance.prepareSolution() is not False and solve:
+            mainInstance.integrateSolution()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+#  -------------------------------------------------------------------------
+def compareWithBaseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Return a list of the metrics which are worse than the baseline by more than the tolerance"""
+    if Debug:
+        DT.Mess("compareWithBaseline")
+    baselineDict = {(result["case"], result["numBodies"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        baseResult = baselineDict.get((result["case"], result["numBodies"]))
+        if baseResult is None or result["status"] == "error" or baseResult["status"] == "error":
+            continue
+        for metric in COMPARED_METRICS:
+            if metric in result and metric in baseResult and baseResult[metric] > 0.0:
+                ratio = result[metric] / baseResult[metric]
+                if ratio > tolerance:
+                    regressions.append({"case": result["case"],
+                                        "numBodies": result["numBodies"],
+                                        "metric": metric,
+                                        "baseline": baseResult[metric],
+                                        "value": result[metric],
+                                        "ratio": ratio})
+    return regressions
+#  -------------------------------------------------------------------------
+def runSuite(resultsFileName, baselineFileName="", measureMemory=True, maxBodies=None):
+    """Run all the benchmark cases and write the results to a JSON file
+    If the baseline file exists, the results are compared against it and the regressions are reported
+    maxBodies limits the size of the models, for a quicker run"""
+    if Debug:
+        DT.Mess("runSuite")
+    results = {"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "python": platform.python_version(),
+               "numpy": np.__version__,
+               "machine": platform.machine(),
+               "results": []}
+    for caseName, generator, sizes in BENCHMARK_CASES:
+        for size in sizes:
+            modelRecords = generator(size)
+            if maxBodies is not None and len(modelRecords["bodies"]) - 1 > maxBodies:
+                continue
+            result = runBenchmark(caseName, modelRecords, measureMemory=measureMemory)
+            result["size"] = size
+            DT.Mess(caseName + " " + str(size) + ": " + result["status"] +
+                    "  setup " + "{:.4f}".format(result.get("setupTime", -1.0)) + "s" +
+                    "  RHS/s " + "{:.1f}".format(result.get("rhsPerSecond", -1.0)) +
+                    "  solve " + "{:.3f}".format(result.get("solveTime", -1.0)) + "s")
+            if result["status"] == "error":
+                CAD.Console.PrintError(caseName + " " + str(size) + " failed: " + result["message"] + "\n")
+            results["results"].append(result)
+
+    if baselineFileName != "" and os.path.isfile(baselineFileName):
+        with open(baselineFileName) as baselineFILE:
+            baseline = json.load(baselineFILE)
+        results["regressions"] = compareWithBaseline(results, baseline)
+        for regression in results["regressions"]:
+            CAD.Console.PrintError("Regression: " + regression["case"] + " " + str(regression["numBodies"]) +
+                                   " bodies " + regression["metric"] + " is " +
+                                   "{:.2f}".format(regression["ratio"]) + " times the baseline\n")
+    with open(resultsFileName, "w") as resultsFILE:
+        json.dump(results, resultsFILE, indent=1)
+    return results
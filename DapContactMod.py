@@ -0,0 +1,301 @@
+# ********************************************************************************
+# *                                                                              *
+# *   This program is free software; you can redistribute it and/or modify       *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)         *
+# *   as published by the Free Software Foundation; either version 3 of          *
+# *   the License, or (at your option) any later version.                        *
+# *   for detail see the LICENCE text file.                                      *
+# *                                                                              *
+# *   This program is distributed in the hope that it will be useful,            *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of             *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       *
+# *   See the GNU Lesser General Public License for more details.                *
+# *                                                                              *
+# *   You should have received a copy of the GNU Lesser General Public           *
+# *   License along with this program; if not, write to the Free Software        *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston,                      *
+# *   MA 02111-1307, USA                                                         *
+# *_____________________________________________________________________________ *
+# *                                                                              *
+# *        ##########################################################            *
+# *       #### Nikra-DAP FreeCAD WorkBench Revision 2.1 (c) 2024: ####           *
+# *        ##########################################################            *
+# *                                                                              *
+# *                     Authors of this workbench:                               *
+# *                   Cecil Churms <churms@gmail.com>                            *
+# *             Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                 *
+# *                                                                              *
+# *               This file is a sizeable expansion of the:                      *
+# *                "Nikra-DAP-Rev-1" workbench for FreeCAD                       *
+# *        with increased functionality and inherent code documentation          *
+# *                  by means of expanded variable naming                        *
+# *                                                                              *
+# *     Which in turn, is based on the MATLAB code Complementary to              *
+# *                  Chapters 7 and 8 of the textbook:                           *
+# *                                                                              *
+# *                     "PLANAR MULTIBODY DYNAMICS                               *
+# *         Formulation, Programming with MATLAB, and Applications"              *
+# *                          Second Edition                                      *
+# *                         by P.E. Nikravesh                                    *
+# *                          CRC Press, 2018                                     *
+# *                                                                              *
+# *     Authors of Rev-1:                                                        *
+# *            Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>         *
+# *            Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                  *
+# *            Dewald Hattingh (UP) <u17082006@tuks.co.za>                       *
+# *            Varnu Govender (UP) <govender.v@tuks.co.za>                       *
+# *                                                                              *
+# * Copyright (c) 2024 Cecil Churms <churms@gmail.com>                           *
+# * Copyright (c) 2024 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>          *
+# * Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za> *
+# * Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>               *
+# * Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>               *
+# *                                                                              *
+# *             Please refer to the Documentation and README for                 *
+# *         more information regarding this WorkBench and its usage              *
+# *                                                                              *
+# ********************************************************************************
+import numpy as np
+
+import DapToolsMod as DT
+
+Debug = False
+# =============================================================================
+# Contact forces between points and lines or circles
+#
+# Every "Contact Friction" force makes contact pairs between its head body points
+# (only the first point, or all of them) and a contact line or circle on its tail body
+# The line passes through the second point with the given normal pointing to the free side
+# The circle is centred on the second point, and the head body points touch it from outside
+# Each head body point may have a rounded tip with a radius (e.g. the centre of a wheel)
+#
+# Broad phase:  all the pairs closer than CONTACT_SKIN_DISTANCE are kept in a candidate list
+# which is only rebuilt once any body has moved far enough for another pair to be able to touch
+# Narrow phase: the penetration, the Lankarani-Nikravesh or Flores normal force and the
+# regularised friction force are evaluated for all the candidate pairs at once
+# Impacts: the penetration rate at impact is only latched at the end of each accepted step
+# =============================================================================
+# The pairs closer than this (mm) are candidates until the next rebuild of the candidate list
+CONTACT_SKIN_DISTANCE = 5.0
+# The penetration velocity at impact (mm/s) is never taken as less than this
+CONTACT_MIN_IMPACT_VELOCITY = 1.0
+# The friction force is regularised with tanh(FRICTION_SHARPNESS * v / Stribeck velocity)
+FRICTION_SHARPNESS = 4.0
+# =============================================================================
+class DapContactC:
+    """Contact force engine for all the contact pairs of a model
+    The pair geometry and parameters are held in NumPy arrays with one entry per pair"""
+    #  -------------------------------------------------------------------------
+    def __init__(self, mainObj, contactForceList):
+        """Make the contact pairs of the (forceIndex, forceObj) entries in contactForceList
+        mainObj is the DapMainC solver object, with its model arrays at the initial position"""
+        if Debug:
+            DT.Mess("DapContactC-__init__")
+        pairList = []
+        for forceIndex, forceObj in contactForceList:
+            if forceObj.ContactAllPoints is True:
+                pointIndexList = range(len(mainObj.pointDictList[forceObj.body_I_Index]))
+            else:
+                pointIndexList = [forceObj.point_i_Index]
+            # The contact line normal is given in the x-y frame at the initial position
+            normalNp = np.array([forceObj.ContactNormal[0], forceObj.ContactNormal[1]], dtype=np.float64)
+            if forceObj.ContactRadius <= 0.0:
+                normalNp = DT.NormalizeNpVec(normalNp)
+            normalXiEtaNp = mainObj.RotMatPhiNp[forceObj.body_J_Index].T @ normalNp
+            for pointIndex in pointIndexList:
+                if forceObj.body_I_Index == forceObj.body_J_Index:
+                    continue
+                pairList.append((forceIndex, forceObj, pointIndex, normalXiEtaNp))
+
+        self.numPairs = len(pairList)
+        self.forceIndexNp = np.array([pair[0] for pair in pairList], dtype=np.int64)
+        self.bodyINp = np.array([pair[1].body_I_Index for pair in pairList], dtype=np.int64)
+        self.pointINp = np.array([pair[2] for pair in pairList], dtype=np.int64)
+        self.bodyJNp = np.array([pair[1].body_J_Index for pair in pairList], dtype=np.int64)
+        self.pointJNp = np.array([pair[1].point_j_Index for pair in pairList], dtype=np.int64)
+        self.normalXiEtaNp = np.array([pair[3] for pair in pairList], dtype=np.float64).reshape((-1, 2))
+        self.radiusNp = np.array([max(pair[1].ContactRadius, 0.0) for pair in pairList], dtype=np.float64)
+        self.circleNp = self.radiusNp > 0.0
+        self.pointRadiusNp = np.array([pair[1].ContactPointRadius for pair in pairList], dtype=np.float64)
+        self.stiffnessNp = np.array([pair[1].ContactStiffness for pair in pairList], dtype=np.float64)
+        self.restitutionNp = np.array([pair[1].Restitution for pair in pairList], dtype=np.float64)
+        self.floresNp = np.array([pair[1].FloresContact for pair in pairList], dtype=bool)
+        self.muStaticNp = np.array([pair[1].FrictionStatic for pair in pairList], dtype=np.float64)
+        self.muDynamicNp = np.array([pair[1].FrictionDynamic for pair in pairList], dtype=np.float64)
+        # A zero Stribeck velocity would make the friction force discontinuous
+        self.stribeckVelocityNp = np.array([max(pair[1].FrictionVelocity, CONTACT_MIN_IMPACT_VELOCITY)
+                                            for pair in pairList], dtype=np.float64)
+        self.contactForceIndexNp = np.unique(self.forceIndexNp)
+
+        # Distance from each body CoG to its furthest contact point
+        self.pointReachNp = np.zeros((mainObj.numBodies,), dtype=np.float64)
+        if self.numPairs > 0:
+            np.maximum.at(self.pointReachNp, self.bodyINp,
+                          np.linalg.norm(mainObj.pointXiEtaNp[self.bodyINp, self.pointINp], axis=1) + self.pointRadiusNp)
+
+        # Impact state of every pair, for the hysteresis damping
+        self.inContactNp = np.zeros((self.numPairs,), dtype=bool)
+        self.impactVelocityNp = np.zeros((self.numPairs,), dtype=np.float64)
+
+        # The candidate list is built on the first call of addContactForces
+        self.candidateNp = np.zeros((0,), dtype=np.int64)
+        self.referenceWorldNp = None
+        self.referencePhiNp = None
+        self.reachNp = self.pointReachNp.copy()
+        self.numRebuilds = 0
+    #  -------------------------------------------------------------------------
+    def pairGeometry(self, mainObj, pairs):
+        """Return the gap (negative when penetrating), the unit normal on the surface
+        and the contact point in world coordinates of the given pairs"""
+        bodyINp = self.bodyINp[pairs]
+        bodyJNp = self.bodyJNp[pairs]
+        pointNp = mainObj.pointXYWorldNp[bodyINp, self.pointINp[pairs]]
+        centreNp = mainObj.pointXYWorldNp[bodyJNp, self.pointJNp[pairs]]
+        diffNp = pointNp - centreNp
+
+        # Line:    the normal rotates with the tail body
+        # Circle:  the normal points from the centre to the point
+        normalNp = np.einsum("nij,nj->ni", mainObj.RotMatPhiNp[bodyJNp], self.normalXiEtaNp[pairs])
+        gapNp = np.einsum("ij,ij->i", normalNp, diffNp)
+        circleNp = self.circleNp[pairs]
+        if np.any(circleNp):
+            distanceNp = np.linalg.norm(diffNp[circleNp], axis=1)
+            safeDistanceNp = np.where(distanceNp > 0.0, distanceNp, 1.0)
+            normalNp[circleNp] = np.where((distanceNp > 0.0)[:, np.newaxis],
+                                          diffNp[circleNp] / safeDistanceNp[:, np.newaxis], np.array([0.0, 1.0]))
+            gapNp[circleNp] = distanceNp - self.radiusNp[pairs][circleNp]
+        gapNp -= self.pointRadiusNp[pairs]
+
+        # The contact is at the tip of the rounded point
+        contactNp = pointNp - normalNp * self.pointRadiusNp[pairs][:, np.newaxis]
+        return gapNp, normalNp, contactNp
+    #  -------------------------------------------------------------------------
+    def needsRebuild(self, mainObj):
+        """True if a body has moved far enough since the last rebuild of the candidate list
+        for a pair which is not a candidate to possibly touch
+        The gap of a pair changes by at most the movement of both its bodies
+        at the distance of the contact point from each CoG"""
+        if self.referenceWorldNp is None:
+            return True
+        movementNp = np.linalg.norm(mainObj.worldNp - self.referenceWorldNp, axis=1) + \
+                     np.abs(mainObj.phiNp - self.referencePhiNp) * self.reachNp
+        return 2.0 * movementNp.max() > CONTACT_SKIN_DISTANCE
+    #  -------------------------------------------------------------------------
+    def rebuildCandidates(self, mainObj):
+        """Keep the pairs closer than the skin distance as candidates
+        and remember the body positions they were found at"""
+        if Debug:
+            DT.Mess("DapContactC-rebuildCandidates")
+        allPairs = np.arange(self.numPairs)
+        gapNp, normalNp, contactNp = self.pairGeometry(mainObj, allPairs)
+        self.candidateNp = allPairs[gapNp < CONTACT_SKIN_DISTANCE]
+
+        # A surface body must also allow for the distance of the contact points from its CoG
+        # which can grow by at most the skin distance before the next rebuild
+        self.reachNp = self.pointReachNp.copy()
+        surfaceReachNp = np.linalg.norm(contactNp - mainObj.worldNp[self.bodyJNp], axis=1) + CONTACT_SKIN_DISTANCE
+        np.maximum.at(self.reachNp, self.bodyJNp, surfaceReachNp)
+
+        self.referenceWorldNp = mainObj.worldNp.copy()
+        self.referencePhiNp = mainObj.phiNp.copy()
+        self.numRebuilds += 1
+    #  -------------------------------------------------------------------------
+    def contactVelocities(self, mainObj, pairs, contactNp):
+        """Return the arms from each body CoG to the contact points of the given pairs
+        and the velocity of the contact point on body I relative to that on body J"""
+        bodyINp = self.bodyINp[pairs]
+        bodyJNp = self.bodyJNp[pairs]
+        armINp = contactNp - mainObj.worldNp[bodyINp]
+        armJNp = contactNp - mainObj.worldNp[bodyJNp]
+        velocityINp = mainObj.worldDotNp[bodyINp] + mainObj.phiDotNp[bodyINp][:, np.newaxis] * np.stack((-armINp[:, 1], armINp[:, 0]), axis=1)
+        velocityJNp = mainObj.worldDotNp[bodyJNp] + mainObj.phiDotNp[bodyJNp][:, np.newaxis] * np.stack((-armJNp[:, 1], armJNp[:, 0]), axis=1)
+        return armINp, armJNp, velocityINp - velocityJNp
+    #  -------------------------------------------------------------------------
+    def latchContacts(self, mainObj):
+        """Update the impact state of every pair from the state at the end of an accepted step
+        A pair which has started touching keeps its penetration rate at impact for the hysteresis damping
+        This is never done within the equations of motion, where the integrator also tries states it rejects"""
+        if Debug:
+            DT.Mess("DapContactC-latchContacts")
+        if self.numPairs == 0:
+            return
+        if self.needsRebuild(mainObj):
+            self.rebuildCandidates(mainObj)
+        touchingAllNp = np.zeros((self.numPairs,), dtype=bool)
+        if len(self.candidateNp) > 0:
+            gapNp, normalNp, contactNp = self.pairGeometry(mainObj, self.candidateNp)
+            touchingNp = gapNp < 0.0
+            touchingAllNp[self.candidateNp[touchingNp]] = True
+            newImpactNp = touchingNp & ~self.inContactNp[self.candidateNp]
+            if np.any(newImpactNp):
+                pairs = self.candidateNp[newImpactNp]
+                armINp, armJNp, slipNp = self.contactVelocities(mainObj, pairs, contactNp[newImpactNp])
+                penetrationDotNp = -np.einsum("ij,ij->i", slipNp, normalNp[newImpactNp])
+                self.impactVelocityNp[pairs] = np.maximum(penetrationDotNp, CONTACT_MIN_IMPACT_VELOCITY)
+        self.inContactNp = touchingAllNp
+    #  -------------------------------------------------------------------------
+    def addContactForces(self, mainObj):
+        """Add the contact and friction forces of all the touching pairs
+        to mainObj.sumForcesNp and mainObj.sumMomentsNp
+        The total normal force of each contact force is put in mainObj.forceValueNp"""
+        if Debug:
+            DT.Mess("DapContactC-addContactForces")
+        mainObj.forceValueNp[self.contactForceIndexNp] = 0.0
+        if self.numPairs == 0:
+            return
+        if self.needsRebuild(mainObj):
+            self.rebuildCandidates(mainObj)
+        if len(self.candidateNp) == 0:
+            return
+
+        gapNp, normalNp, contactNp = self.pairGeometry(mainObj, self.candidateNp)
+        touchingNp = gapNp < 0.0
+        if not np.any(touchingNp):
+            return
+        pairs = self.candidateNp[touchingNp]
+        normalNp = normalNp[touchingNp]
+        contactNp = contactNp[touchingNp]
+        bodyINp = self.bodyINp[pairs]
+        bodyJNp = self.bodyJNp[pairs]
+        armINp, armJNp, slipNp = self.contactVelocities(mainObj, pairs, contactNp)
+
+        # Penetration and its rate - the impact state is only changed by latchContacts
+        # so a pair which is not yet latched takes its present penetration rate as the impact velocity
+        penetrationNp = -gapNp[touchingNp]
+        penetrationDotNp = -np.einsum("ij,ij->i", slipNp, normalNp)
+        impactVelocityNp = np.where(self.inContactNp[pairs], self.impactVelocityNp[pairs],
+                                    np.maximum(penetrationDotNp, CONTACT_MIN_IMPACT_VELOCITY))
+
+        stiffnessNp = self.stiffnessNp[pairs]
+        restitutionNp = self.restitutionNp[pairs]
+        normalForceNp = np.where(self.floresNp[pairs],
+                                 DT.Contact_FM(penetrationNp, penetrationDotNp, impactVelocityNp, stiffnessNp, restitutionNp),
+                                 DT.Contact_LN(penetrationNp, penetrationDotNp, impactVelocityNp, stiffnessNp, restitutionNp))
+        # The contact can push but never pull
+        normalForceNp = np.maximum(normalForceNp, 0.0)
+
+        # Friction opposes the sliding velocity along the tangent
+        tangentNp = np.stack((-normalNp[:, 1], normalNp[:, 0]), axis=1)
+        slidingNp = np.einsum("ij,ij->i", slipNp, tangentNp)
+        frictionNp = DT.Friction_A(self.muStaticNp[pairs], self.muDynamicNp[pairs], self.stribeckVelocityNp[pairs], 2.0,
+                                   FRICTION_SHARPNESS / self.stribeckVelocityNp[pairs], slidingNp, normalForceNp)
+
+        forceNp = normalNp * normalForceNp[:, np.newaxis] - tangentNp * frictionNp[:, np.newaxis]
+        np.add.at(mainObj.sumForcesNp, bodyINp, forceNp)
+        np.add.at(mainObj.sumForcesNp, bodyJNp, -forceNp)
+        np.add.at(mainObj.sumMomentsNp, bodyINp, armINp[:, 0] * forceNp[:, 1] - armINp[:, 1] * forceNp[:, 0])
+        np.add.at(mainObj.sumMomentsNp, bodyJNp, armJNp[:, 1] * forceNp[:, 0] - armJNp[:, 0] * forceNp[:, 1])
+        np.add.at(mainObj.forceValueNp, self.forceIndexNp[pairs], normalForceNp)
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("DapContactC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("DapContactC-loads")
+        if state:
+            self.Type = state
+        return None
+    #  =========================================================================
@@ -169,6 +169,20 @@ class DapForceClass:
         DT.addObjectProperty(forceObject, "constLocalForce",      CAD.Vector(), "App::PropertyVector",  "Values",     "Constant force in local frame")
         DT.addObjectProperty(forceObject, "constWorldForce",      CAD.Vector(), "App::PropertyVector",  "Values",     "Constant force in x-y frame")
         DT.addObjectProperty(forceObject, "constTorque",          0.0,          "App::PropertyFloat",   "Values",     "Constant torque in x-y frame")
+        DT.addObjectProperty(forceObject, "ForceMagnitude",       0.0,          "App::PropertyFloat",   "Values",     "Constant actuator force of a spring")
+        DT.addObjectProperty(forceObject, "TorqueMagnitude",      0.0,          "App::PropertyFloat",   "Values",     "Constant actuator torque of a rotational spring")
+        DT.addObjectProperty(forceObject, "ForceLaw",             "",           "App::PropertyString",  "Values",     "Force/torque law e.g. k*x + c*v*abs(v) in t, x, v, L, phi, phiDot, k, c, L0, F0 and drive_<joint> - empty for the linear law. A positive torque T gives the head body (I) a moment of -T and the tail body (J) +T, so a negative torque drives the head body anticlockwise")
+
+        DT.addObjectProperty(forceObject, "ContactAllPoints",     False,        "App::PropertyBool",    "Contact",    "All the points of the head body make contact, not only the first point")
+        DT.addObjectProperty(forceObject, "ContactPointRadius",   0.0,          "App::PropertyFloat",   "Contact",    "Radius of the rounded tip around each contact point")
+        DT.addObjectProperty(forceObject, "ContactRadius",        0.0,          "App::PropertyFloat",   "Contact",    "Radius of the contact circle around the second point - zero for a contact line")
+        DT.addObjectProperty(forceObject, "ContactNormal",        CAD.Vector(0.0, 1.0, 0.0), "App::PropertyVector", "Contact", "Normal of the contact line through the second point, pointing to the free side, in x-y frame at the start")
+        DT.addObjectProperty(forceObject, "ContactStiffness",     0.0,          "App::PropertyFloat",   "Contact",    "Contact stiffness K in force = K * penetration^1.5")
+        DT.addObjectProperty(forceObject, "Restitution",          0.8,          "App::PropertyFloat",   "Contact",    "Coefficient of restitution of the contact")
+        DT.addObjectProperty(forceObject, "FloresContact",        False,        "App::PropertyBool",    "Contact",    "Use the Flores instead of the Lankarani-Nikravesh contact damping")
+        DT.addObjectProperty(forceObject, "FrictionStatic",       0.0,          "App::PropertyFloat",   "Contact",    "Static friction coefficient")
+        DT.addObjectProperty(forceObject, "FrictionDynamic",      0.0,          "App::PropertyFloat",   "Contact",    "Dynamic friction coefficient")
+        DT.addObjectProperty(forceObject, "FrictionVelocity",     10.0,         "App::PropertyFloat",   "Contact",    "Stribeck velocity of the friction (mm/s)")
     #  -------------------------------------------------------------------------
     def dumps(self):
         if Debug:
@@ -405,6 +419,12 @@ class TaskPanelDapForceClass:
             self.forceTaskObject.Stiffness = self.form.rotSpringDampStiffness.value()
         elif self.forceTaskObject.actuatorType == 7:
             self.forceTaskObject.constWorldForce = self.form.globalForceMag.value() * CAD.Vector(self.form.globalForceX.value(), self.form.globalForceY.value(), self.form.globalForceZ.value())
+        elif self.forceTaskObject.actuatorType == 9:
+            # The contact parameters are set in the property editor
+            pass
+        elif self.forceTaskObject.actuatorType == 10 or self.forceTaskObject.actuatorType == 11:
+            # The motor torque and its ForceLaw are set in the property editor
+            pass
         else:
             CAD.Console.PrintError("Code for the selected force is still in development")
 
@@ -743,7 +763,7 @@ class TaskPanelDapForceClass:
         self.form.forceData.setCurrentIndex(actuatorType - 1)
 
         # Two bodies, two points
-        if (actuatorType == 1) or (actuatorType == 3) or (actuatorType == 5):
+        if (actuatorType == 1) or (actuatorType == 3) or (actuatorType == 5) or (actuatorType == 9):
             self.form.bodyPointData.setCurrentIndex(TwoBodiesTwoPoints)
             self.form.bodyPointData.setHidden(False)
 
@@ -761,9 +781,10 @@ class TaskPanelDapForceClass:
             self.form.bodyPointData.setCurrentIndex(OneBodyOnePoint)
             self.form.bodyPointData.setHidden(False)
 
-        # No bodies or points
-        elif actuatorType == 9 or actuatorType == 10 or actuatorType == 11:
-            self.form.bodyPointData.setHidden(True)
+        # Two bodies, one point - the motor acts between the two bodies
+        elif actuatorType == 10 or actuatorType == 11:
+            self.form.bodyPointData.setCurrentIndex(TwoBodiesOnePoint)
+            self.form.bodyPointData.setHidden(False)
     #  -------------------------------------------------------------------------
     def getStandardButtons(self):
         """ Set which button will appear at the top of the TaskDialog [Called from FreeCAD]"""
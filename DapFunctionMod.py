@@ -60,10 +60,31 @@ import DapToolsMod as DT
 from os import path
 from math import degrees, sin, cos
 import numpy as np
+from scipy.interpolate import CubicSpline, PPoly, make_interp_spline
 import FreeCADGui as CADGui
 from PySide import QtGui, QtCore
+from math import comb, ceil, pi
+import ast
 Debug = False
 # ============================================================================
+# Every analytic driver is also held as a piecewise polynomial of at most this degree
+DRIVER_TABLE_DEGREE = 7
+# Number of quintic pieces per period used to tabulate a type 'e' (sinusoidal) driver
+DRIVER_SINE_PIECES_PER_PERIOD = 32
+# Drivers with at most this many breakpoints are merged into one table on a common set of breakpoints
+DRIVER_TABLE_MERGE_KNOTS = 64
+# The variables a force law expression may use, in the order they are passed to it
+# x = deflection, v = deflection rate, L = length (or relative angle),
+# phi / phiDot = angle / angular velocity of the head body,
+# k, c, L0, F0 = the force element's Stiffness, DampingCoeff, LengthAngle0 and Force-/TorqueMagnitude
+FORCE_LAW_VARIABLES = ["t", "x", "v", "L", "phi", "phiDot", "k", "c", "L0", "F0"]
+# The value of the drive function of a driven joint is available in a force law as drive_<joint name>
+FORCE_LAW_DRIVE_PREFIX = "drive_"
+# The AST node types which a force law expression may contain
+FORCE_LAW_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Constant, ast.Load,
+                   ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd,
+                   ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.BitAnd, ast.BitOr)
+# ============================================================================
 class FunctionC:
     """
     This class encapsulates the function evaluations of Nikravesh et al.
@@ -75,9 +96,12 @@ class FunctionC:
         <timeStart>, <timeEnd>,
         <value of function at Start>, <value of function at End>,
         <dfdt at End>,
-        <C0>, <C1>, <C2>, <C3>, <C4>, <C5>
+        <C0>, <C1>, <C2>, <C3>, <C4>, <C5>,
+        <table file name>, <spline degree>
         ]
     Values not needed for the specific function type are ignored
+    Function type 6 is a spline through the times and values in the table file,
+    with the times taken relative to timeStart
 
     A call to FunctionC.getFofT(t) returns a list at time t:
         [f(t), fDot(t), fDotDot(t)]
@@ -99,14 +123,17 @@ class FunctionC:
         functionTypeD = 3
         functionTypeE = 4
         functionTypeF = 5
+        functionTypeTable = 6
         self.functDictionary = {functionTypeA: self.function_a,
                                 functionTypeB: self.function_b,
                                 functionTypeC: self.function_c,
                                 functionTypeD: self.function_d,
                                 functionTypeE: self.function_e,
-                                functionTypeF: self.function_f}
+                                functionTypeF: self.function_f,
+                                functionTypeTable: self.function_table}
 
         # Copy over the parameters which were passed in the init call
+        self.parameterList = list(FunctionParameterList)
         self.functType = FunctionParameterList[0]
         timeStart = FunctionParameterList[1]
         timeEnd = FunctionParameterList[2]
@@ -120,6 +147,13 @@ class FunctionC:
         Cs = FunctionParameterList[9]
         Ct = FunctionParameterList[10]
         Cu = FunctionParameterList[11]
+        if len(FunctionParameterList) > 12:
+            tableFileName = FunctionParameterList[12]
+            self.splineDegree = FunctionParameterList[13]
+        else:
+            tableFileName = ""
+            self.splineDegree = 3
+        self.tableObj = None
 
 
         # Make an alias for an undefined value
@@ -305,9 +339,151 @@ class FunctionC:
                               Cs,
                               Ct,
                               Cu]
+        #  -----------------------------------------
+        # Func type 'table'
+        #    tt before the first time in the table:
+        #        f(tt) = first value in the table
+        #    tt between the first and last times in the table:
+        #        f(tt) = C2 cubic (or quintic) spline through the tabulated values
+        #    tt after the last time in the table:
+        #        f(tt) = last value in the table
+        #    with the table times taken relative to timeStart
+        elif self.functType == functionTypeTable:
+            self.Constants = [timeStart,
+                              timeEnd,
+                              valueAtStart,
+                              undefined,
+                              undefined,
+                              undefined,
+                              undefined,
+                              undefined,
+                              undefined,
+                              undefined,
+                              undefined]
+            self.loadTable(tableFileName, valueAtStart)
         else:
             CAD.Console.PrintError("Illegal Function Type specified\n")
     #  ------------------------------------------------------------------------
+    def loadTable(self, tableFileName, valueAtStart):
+        """Load the times and values of a tabulated function from the first two columns
+        of a CSV file (with or without a heading line) or of a NumPy .npy file"""
+        if Debug:
+            DT.Mess("FunctionC-loadTable")
+        self.tableTimesNp = np.zeros((1,), dtype=np.float64)
+        self.tableValuesNp = np.array([valueAtStart], dtype=np.float64)
+        try:
+            if tableFileName.lower().endswith(".npy"):
+                tableNp = np.load(tableFileName)
+            else:
+                with open(tableFileName, "r") as tableFILE:
+                    firstLine = tableFILE.readline()
+                try:
+                    [float(value) for value in firstLine.split(",")]
+                    skipRows = 0
+                except ValueError:
+                    skipRows = 1
+                tableNp = np.loadtxt(tableFileName, delimiter=",", skiprows=skipRows, ndmin=2)
+        except (OSError, ValueError) as error:
+            CAD.Console.PrintError("Drive function table could not be read from " + tableFileName + ": " + str(error) + "\n")
+            return
+        if tableNp.ndim != 2 or tableNp.shape[1] < 2 or tableNp.shape[0] <= self.splineDegree:
+            CAD.Console.PrintError("Drive function table needs columns of time and value, with more rows than the spline degree: " +
+                                   tableFileName + "\n")
+            return
+        if np.any(np.diff(tableNp[:, 0]) <= 0.0):
+            CAD.Console.PrintError("Drive function table times must increase from row to row: " + tableFileName + "\n")
+            return
+        self.tableTimesNp = tableNp[:, 0].astype(np.float64)
+        self.tableValuesNp = tableNp[:, 1].astype(np.float64)
+    #  ------------------------------------------------------------------------
+    def polynomialPieces(self):
+        """Return the function as (knotsNp, coefficientsNp) where piece k holds
+        f(tt) = sum over j of coefficientsNp[k, j] * (tt - knotsNp[k])**j  from knotsNp[k] up to knotsNp[k+1]
+        Piece 0 is the constant value before the start and applies to any time before knotsNp[1]"""
+        [functType, timeStart, timeEnd, valueAtStart, valueAtEnd, dfdtEnd,
+         Cp, Cq, Cr, Cs, Ct, Cu] = self.parameterList[0:12]
+        duration = timeEnd - timeStart
+        mainNp = np.zeros((DRIVER_TABLE_DEGREE + 1,), dtype=np.float64)
+        # The function before the start, then during the drive
+        beforeNp = np.zeros((DRIVER_TABLE_DEGREE + 1,), dtype=np.float64)
+        beforeNp[0] = valueAtStart
+        mainNp[0] = valueAtStart
+        if functType == 0:
+            mainNp[1:3] = Cp, Cq
+        elif functType == 1:
+            mainNp[3:6] = np.ravel(self.Constants[5:8])
+        elif functType == 2:
+            mainNp[4:7] = np.ravel(self.Constants[5:8])
+        elif functType == 3:
+            mainNp[1:6] = Cp, Cq, Cr, Cs, Ct
+        elif functType == 4:
+            return self.sinePieces(timeStart, timeEnd, valueAtStart, Cp, Cq, Cr, Cs, Ct)
+        elif functType == 5:
+            mainNp[0:5] = valueAtStart + Cp, Cq, Cr, Cs, Ct
+        elif functType == 6:
+            return self.splinePieces(timeStart)
+        else:
+            CAD.Console.PrintError("Illegal Function Type specified\n")
+            return np.array([timeStart]), beforeNp[np.newaxis, :]
+
+        # The function after the end - type 'b' ends at its end value,
+        # type 'c' carries on at its end derivative and the others keep their end value
+        afterNp = np.zeros((DRIVER_TABLE_DEGREE + 1,), dtype=np.float64)
+        afterNp[0] = np.polynomial.polynomial.polyval(duration, mainNp)
+        if functType == 1:
+            afterNp[0] = valueAtEnd
+        elif functType == 2:
+            afterNp[1] = dfdtEnd
+        return np.array([timeStart, timeStart, timeEnd]), np.stack((beforeNp, mainNp, afterNp))
+    #  ------------------------------------------------------------------------
+    def sinePieces(self, timeStart, timeEnd, valueAtStart, Cp, Cq, Cr, Cs, Ct):
+        """Tabulate the type 'e' function by quintic pieces which match f, f' and f'' at both ends"""
+        duration = timeEnd - timeStart
+        if duration <= 0.0:
+            beforeNp = np.zeros((1, DRIVER_TABLE_DEGREE + 1), dtype=np.float64)
+            beforeNp[0, 0] = valueAtStart
+            return np.array([timeStart]), beforeNp
+        numPieces = max(1, int(ceil(duration * max(abs(Cr), abs(Cs)) * DRIVER_SINE_PIECES_PER_PERIOD)))
+        tNp = np.linspace(0.0, duration, numPieces + 1)
+        omegaP = 2.0 * pi * Cr
+        omegaQ = 2.0 * pi * Cs
+        fNp = np.stack((valueAtStart + Cp * np.sin(omegaP * tNp + Ct) + Cq * np.cos(omegaQ * tNp + Ct),
+                        Cp * omegaP * np.cos(omegaP * tNp + Ct) - Cq * omegaQ * np.sin(omegaQ * tNp + Ct),
+                        -Cp * omegaP**2 * np.sin(omegaP * tNp + Ct) - Cq * omegaQ**2 * np.cos(omegaQ * tNp + Ct)), axis=1)
+        mainNp = hermiteQuinticPieces(tNp, fNp)
+
+        beforeNp = np.zeros((1, DRIVER_TABLE_DEGREE + 1), dtype=np.float64)
+        beforeNp[0, 0] = valueAtStart
+        afterNp = np.zeros((1, DRIVER_TABLE_DEGREE + 1), dtype=np.float64)
+        afterNp[0, 0] = fNp[-1, 0]
+        knotsNp = np.concatenate(([timeStart], timeStart + tNp))
+        return knotsNp, np.concatenate((beforeNp, mainNp, afterNp))
+    #  ------------------------------------------------------------------------
+    def splinePieces(self, timeStart):
+        """Fit the spline through the tabulated values and return its pieces
+        A natural cubic spline, or an interpolating quintic B-spline, are both C2"""
+        if Debug:
+            DT.Mess("FunctionC-splinePieces")
+        timesNp = self.tableTimesNp + timeStart
+        beforeNp = np.zeros((1, self.splineDegree + 1), dtype=np.float64)
+        beforeNp[0, 0] = self.tableValuesNp[0]
+        if len(timesNp) <= self.splineDegree:
+            return timesNp[0:1], beforeNp
+        if self.splineDegree == 5:
+            splineObj = PPoly.from_spline(make_interp_spline(timesNp, self.tableValuesNp, k=5))
+        else:
+            if self.splineDegree != 3:
+                CAD.Console.PrintError("Drive function spline degree must be 3 or 5 - using 3\n")
+            splineObj = CubicSpline(timesNp, self.tableValuesNp, bc_type="natural")
+        # PPoly holds the coefficients with the highest power first
+        mainNp = splineObj.c[::-1].T
+        afterNp = np.zeros((1, mainNp.shape[1]), dtype=np.float64)
+        afterNp[0, 0] = self.tableValuesNp[-1]
+        beforeNp = np.zeros((1, mainNp.shape[1]), dtype=np.float64)
+        beforeNp[0, 0] = self.tableValuesNp[0]
+        knotsNp = np.concatenate((splineObj.x[0:1], splineObj.x))
+        return knotsNp, np.concatenate((beforeNp, mainNp, afterNp))
+    #  ------------------------------------------------------------------------
     def getFofT(self, fType, t):
         """
         # ========================= MATLAB CODE =========================
@@ -479,6 +655,13 @@ class FunctionC:
             d2_func_dt2 = 0
 
         return [func_t, d_func_dt, d2_func_dt2]
+    #  ------------------------------------------------------------------------
+    def function_table(self, tt):
+        """Func type 'table' -> 6
+        The spline is only fitted on the first call"""
+        if self.tableObj is None:
+            self.tableObj = DriverTableC([self])
+        return list(self.tableObj.evaluate(tt)[:, 0])
     #  -------------------------------------------------------------------------
     def dumps(self):
         if Debug:
@@ -492,3 +675,232 @@ class FunctionC:
             self.Type = state
         return None
 # ==============================================================================
+def hermiteQuinticPieces(tNp, fNp):
+    """Return the coefficients (numPieces, DRIVER_TABLE_DEGREE + 1) of the quintic pieces between the times tNp
+    which match the values, first and second derivatives in fNp (numTimes, 3) at both ends of each piece"""
+    hNp = np.diff(tNp)
+    f0Np = fNp[:-1]
+    f1Np = fNp[1:]
+    coefficientsNp = np.zeros((len(hNp), DRIVER_TABLE_DEGREE + 1), dtype=np.float64)
+    coefficientsNp[:, 0] = f0Np[:, 0]
+    coefficientsNp[:, 1] = f0Np[:, 1]
+    coefficientsNp[:, 2] = f0Np[:, 2] / 2.0
+    # Solve for the 3rd to 5th order coefficients from the conditions at the end of each piece
+    matrixNp = np.stack((np.stack((hNp**3, hNp**4, hNp**5), axis=1),
+                         np.stack((3 * hNp**2, 4 * hNp**3, 5 * hNp**4), axis=1),
+                         np.stack((6 * hNp, 12 * hNp**2, 20 * hNp**3), axis=1)), axis=1)
+    rhsNp = np.stack((f1Np[:, 0] - f0Np[:, 0] - f0Np[:, 1] * hNp - f0Np[:, 2] / 2.0 * hNp**2,
+                      f1Np[:, 1] - f0Np[:, 1] - f0Np[:, 2] * hNp,
+                      f1Np[:, 2] - f0Np[:, 2]), axis=1)
+    coefficientsNp[:, 3:6] = np.linalg.solve(matrixNp, rhsNp[:, :, np.newaxis])[:, :, 0]
+    return coefficientsNp
+#  ------------------------------------------------------------------------
+def shiftPolynomials(coefficientsNp, shiftNp):
+    """Re-expand polynomials in (tt - knot) as polynomials in (tt - knot - shift)
+    coefficientsNp has shape (n, degree + 1) and shiftNp shape (n,)"""
+    degree = coefficientsNp.shape[1] - 1
+    powersNp = shiftNp[:, np.newaxis] ** np.arange(degree + 1)
+    shiftedNp = np.zeros_like(coefficientsNp)
+    for j in range(degree + 1):
+        for k in range(j, degree + 1):
+            shiftedNp[:, j] += comb(k, j) * coefficientsNp[:, k] * powersNp[:, k - j]
+    return shiftedNp
+# ==============================================================================
+class DriverTableC:
+    """All the driver functions of a model held as piecewise polynomial tables
+    of f, f' and f'' which are evaluated together, for one time or an array of times
+
+    Drivers with few pieces share one table on the union of their breakpoints,
+    so all of them are found with one search per time
+    Long (e.g. tabulated) drivers each get a table of their own
+    The interval found last is tried first, as the time mostly advances slowly"""
+    #  ------------------------------------------------------------------------
+    def __init__(self, driverList):
+        """driverList holds the driver function objects in the order of their columns"""
+        if Debug:
+            DT.Mess("DriverTableC-__init__")
+        self.numDrivers = len(driverList)
+        self.groupKnotsList = []
+        self.groupBaseList = []
+        self.groupCoefficientsList = []
+        self.groupColumnsList = []
+        self.groupLastIndexList = []
+        mergedColumns = []
+        mergedPieces = []
+        for column in range(self.numDrivers):
+            knotsNp, coefficientsNp = driverList[column].polynomialPieces()
+            if len(knotsNp) > DRIVER_TABLE_MERGE_KNOTS:
+                self.addGroup([column], [(knotsNp, coefficientsNp)])
+            else:
+                mergedColumns.append(column)
+                mergedPieces.append((knotsNp, coefficientsNp))
+        if len(mergedColumns) > 0:
+            self.addGroup(mergedColumns, mergedPieces)
+    #  ------------------------------------------------------------------------
+    def addGroup(self, columns, pieceList):
+        """Make one table for the drivers in columns, from their (knotsNp, coefficientsNp) in pieceList
+        Interval 0 is before the first breakpoint and interval i from breakpoint i-1 to breakpoint i"""
+        if Debug:
+            DT.Mess("DriverTableC-addGroup")
+        knotsNp = np.unique(np.concatenate([pieces[0] for pieces in pieceList]))
+        baseNp = np.concatenate(([knotsNp[0]], knotsNp))
+        # The table is only as wide as the highest degree in the group
+        width = max([pieces[1].shape[1] for pieces in pieceList])
+        coefficientsNp = np.zeros((len(baseNp), 3, len(columns), width), dtype=np.float64)
+        for index in range(len(columns)):
+            driverKnotsNp, driverCoefficientsNp = pieceList[index]
+            # The piece of the driver which applies in each interval, re-expanded about the interval start
+            pieceIndexNp = np.searchsorted(driverKnotsNp, knotsNp, side="right") - 1
+            pieceIndexNp = np.concatenate(([0], np.clip(pieceIndexNp, 0, len(driverKnotsNp) - 1)))
+            coefficientsNp[:, 0, index, 0:driverCoefficientsNp.shape[1]] = shiftPolynomials(driverCoefficientsNp[pieceIndexNp],
+                                                                                             baseNp - driverKnotsNp[pieceIndexNp])
+        # The coefficients of the first and second derivatives
+        powersNp = np.arange(1, width)
+        coefficientsNp[:, 1, :, :-1] = coefficientsNp[:, 0, :, 1:] * powersNp
+        coefficientsNp[:, 2, :, :-1] = coefficientsNp[:, 1, :, 1:] * powersNp
+
+        self.groupKnotsList.append(knotsNp)
+        self.groupBaseList.append(baseNp)
+        self.groupCoefficientsList.append(coefficientsNp)
+        self.groupColumnsList.append(np.array(columns, dtype=np.int64))
+        self.groupLastIndexList.append(0)
+    #  ------------------------------------------------------------------------
+    def findInterval(self, group, tick):
+        """Return the interval of the group's table which contains the time tick
+        trying the interval found last, and the one after it, before searching"""
+        knotsNp = self.groupKnotsList[group]
+        lastIndex = self.groupLastIndexList[group]
+        for index in (lastIndex, lastIndex + 1):
+            if index > len(knotsNp):
+                break
+            if (index == 0 or knotsNp[index - 1] <= tick) and (index == len(knotsNp) or tick < knotsNp[index]):
+                self.groupLastIndexList[group] = index
+                return index
+        index = int(np.searchsorted(knotsNp, tick, side="right"))
+        self.groupLastIndexList[group] = index
+        return index
+    #  ------------------------------------------------------------------------
+    def evaluate(self, tick):
+        """Return f, f' and f'' of all the drivers at time tick as an array (3, numDrivers)
+        or, if tick is an array of times, as an array (numTimes, 3, numDrivers)"""
+        ticksNp = np.atleast_1d(np.asarray(tick, dtype=np.float64))
+        valuesNp = np.zeros((len(ticksNp), 3, self.numDrivers), dtype=np.float64)
+        for group in range(len(self.groupKnotsList)):
+            if np.ndim(tick) == 0:
+                indexNp = np.array([self.findInterval(group, ticksNp[0])])
+            else:
+                indexNp = np.searchsorted(self.groupKnotsList[group], ticksNp, side="right")
+            xNp = (ticksNp - self.groupBaseList[group][indexNp])[:, np.newaxis, np.newaxis]
+            coefficientsNp = self.groupCoefficientsList[group][indexNp]
+            degree = coefficientsNp.shape[-1] - 1
+            # Horner's scheme for f, f' and f'' of all the drivers in the group at once
+            resultNp = coefficientsNp[..., degree]
+            for power in range(degree - 1, -1, -1):
+                resultNp = resultNp * xNp + coefficientsNp[..., power]
+            valuesNp[:, :, self.groupColumnsList[group]] = resultNp
+        if np.ndim(tick) == 0:
+            return valuesNp[0]
+        return valuesNp
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("DriverTableC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("DriverTableC-loads")
+        if state:
+            self.Type = state
+        return None
+# ==============================================================================
+def stepFunction(x, x0, h0, x1, h1):
+    """Smooth (cubic) step from h0 at x0 to h1 at x1 - constant outside [x0, x1]"""
+    a = np.clip((x - x0) / (x1 - x0), 0.0, 1.0)
+    return h0 + (h1 - h0) * a * a * (3.0 - 2.0 * a)
+#  ------------------------------------------------------------------------
+# The functions and constants a force law expression may use
+FORCE_LAW_FUNCTIONS = {"sin": np.sin, "cos": np.cos, "tan": np.tan,
+                       "arcsin": np.arcsin, "arccos": np.arccos, "arctan": np.arctan, "arctan2": np.arctan2,
+                       "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+                       "exp": np.exp, "log": np.log, "log10": np.log10, "sqrt": np.sqrt,
+                       "abs": np.abs, "sign": np.sign, "minimum": np.minimum, "maximum": np.maximum,
+                       "where": np.where, "clip": np.clip, "step": stepFunction,
+                       "pi": np.pi}
+# ==============================================================================
+class ForceLawC:
+    """A force (or torque) law given as an expression, e.g.  k * x + c * v * abs(v)
+    or  step(t, 0, 0, 0.5, F0) * (1 - phiDot / 100)  for a motor torque curve
+
+    The expression is parsed once, checked against the allowed variables and functions,
+    and compiled to a function which evaluates it for arrays of force elements at once"""
+    #  ------------------------------------------------------------------------
+    def __init__(self, expression, driveColumnDict):
+        """driveColumnDict gives the driver table column for each drive_<joint name> which may be used
+        Raises ValueError if the expression is not a valid force law"""
+        if Debug:
+            DT.Mess("ForceLawC-__init__")
+        self.expression = expression
+        tree = self.validate(ast.parse(expression.strip(), mode="eval"), driveColumnDict)
+        self.driveNames = sorted({node.id for node in ast.walk(tree)
+                                  if isinstance(node, ast.Name) and node.id in driveColumnDict})
+        self.driveColumns = [driveColumnDict[name] for name in self.driveNames]
+        self.compileLaw()
+    #  ------------------------------------------------------------------------
+    def validate(self, tree, driveColumnDict):
+        """Raise ValueError unless the tree only holds arithmetic on numbers,
+        the allowed variables, drive values and calls of the allowed functions"""
+        for node in ast.walk(tree):
+            if not isinstance(node, FORCE_LAW_NODES):
+                raise ValueError("'" + type(node).__name__ + "' is not allowed in a force law")
+            if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+                raise ValueError("Only numbers are allowed as constants: " + repr(node.value))
+            if isinstance(node, ast.Name) and node.id not in FORCE_LAW_VARIABLES and \
+                    node.id not in FORCE_LAW_FUNCTIONS and node.id not in driveColumnDict:
+                raise ValueError("Unknown name: " + node.id)
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in FORCE_LAW_FUNCTIONS or \
+                        not callable(FORCE_LAW_FUNCTIONS[node.func.id]) or len(node.keywords) > 0:
+                    raise ValueError("Only the allowed functions may be called, without keywords")
+        return tree
+    #  ------------------------------------------------------------------------
+    def compileLaw(self):
+        """Compile the expression into a function of the force law variables and the drive values"""
+        tree = ast.parse(self.expression.strip(), mode="eval")
+        argumentsList = [ast.arg(arg=name) for name in FORCE_LAW_VARIABLES + self.driveNames]
+        lambdaTree = ast.Expression(body=ast.Lambda(args=ast.arguments(posonlyargs=[], args=argumentsList, vararg=None,
+                                                                       kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[]),
+                                                    body=tree.body))
+        ast.fix_missing_locations(lambdaTree)
+        self.lawFunction = eval(compile(lambdaTree, "<force law>", "eval"), {"__builtins__": {}, **FORCE_LAW_FUNCTIONS})
+    #  ------------------------------------------------------------------------
+    def evaluate(self, variablesList, driveValuesNp):
+        """Evaluate the law for all the elements in the arrays of variablesList
+        (in the order of FORCE_LAW_VARIABLES) and return an array of forces
+        driveValuesNp holds the values of all the drive functions, and may be None if the law uses none"""
+        if len(self.driveColumns) > 0:
+            result = self.lawFunction(*variablesList, *driveValuesNp[self.driveColumns])
+        else:
+            result = self.lawFunction(*variablesList)
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), np.shape(variablesList[1]))
+    #  ------------------------------------------------------------------------
+    def __getstate__(self):
+        """The compiled function cannot be pickled, so only the expression is kept"""
+        return {"expression": self.expression, "driveNames": self.driveNames, "driveColumns": self.driveColumns}
+    #  ------------------------------------------------------------------------
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compileLaw()
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("ForceLawC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("ForceLawC-loads")
+        if state:
+            self.Type = state
+        return None
+# ==============================================================================
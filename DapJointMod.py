@@ -186,7 +186,7 @@ class DapJointClass:
         DT.addObjectProperty(jointObject, "point_J_j_Index", -1, "App::PropertyInteger", "Points", "Index of the tail point of the 2nd unit vector in the NumPy array")
 
         DT.addObjectProperty(jointObject, "FunctClass", "", "App::PropertyPythonObject", "Driver", "A machine which is set up to generate a driver function")
-        DT.addObjectProperty(jointObject, "FunctType", -1, "App::PropertyInteger", "Driver", "Analytical function type")
+        DT.addObjectProperty(jointObject, "FunctType", -1, "App::PropertyInteger", "Driver", "Driver function type: 0-5 analytical (set in the task panel) or 6 tabulated from DriveTableFile (set here only)")
         DT.addObjectProperty(jointObject, "Coeff0", 0.0, "App::PropertyFloat", "Driver", "Drive Function coefficient 'c0'")
         DT.addObjectProperty(jointObject, "Coeff1", 0.0, "App::PropertyFloat", "Driver", "Drive Function coefficient 'c1'")
         DT.addObjectProperty(jointObject, "Coeff2", 0.0, "App::PropertyFloat", "Driver", "Drive Function coefficient 'c2'")
@@ -199,6 +199,8 @@ class DapJointClass:
         DT.addObjectProperty(jointObject, "startValueDriveFunc", 0.0, "App::PropertyFloat", "Driver", "Drive Func value at start")
         DT.addObjectProperty(jointObject, "endValueDriveFunc", 0.0, "App::PropertyFloat", "Driver", "Drive Func value at end")
         DT.addObjectProperty(jointObject, "endDerivativeDriveFunc", 0.0, "App::PropertyFloat", "Driver", "Drive Func derivative at end")
+        DT.addObjectProperty(jointObject, "DriveTableFile", "", "App::PropertyFile", "Driver", "CSV or NPY file with columns of time and value for a tabulated drive function (type 6)")
+        DT.addObjectProperty(jointObject, "DriveSplineDegree", 3, "App::PropertyInteger", "Driver", "Degree of the spline through the tabulated values (3 or 5)")
         DT.addObjectProperty(jointObject, "lengthLink", 0.0, "App::PropertyFloat", "Starting Values", "Link length")
         DT.addObjectProperty(jointObject, "Radius", 0.0, "App::PropertyFloat", "Starting Values", "Disc Radius")
         DT.addObjectProperty(jointObject, "world0", CAD.Vector(), "App::PropertyVector", "Starting Values",  "Initial condition for disc")
@@ -298,7 +300,10 @@ class ViewProviderDapJointClass:
         return None
 # ==============================================================================
 class TaskPanelDapJointClass:
-    """Task panel for editing DAP Joints"""
+    """Task panel for editing DAP Joints
+    The panel only offers the analytical driver functions (types 0-5).  The tabulated
+    drive (type 6) is set in the DriveTableFile and FunctType properties, and the panel
+    leaves it as it is unless another function is chosen or the driver is switched off"""
     if Debug:
         DT.Mess("TaskPanelDapJointClass-CLASS")
     #  -------------------------------------------------------------------------
@@ -379,6 +384,11 @@ class TaskPanelDapJointClass:
                 self.form.radioButtonE.setChecked(True)
             elif jointTaskObject.FunctType == 5:
                 self.form.radioButtonF.setChecked(True)
+            elif jointTaskObject.FunctType == 6:
+                # There is no radio button for the tabulated drive, so none is checked
+                DT.Mess("The tabulated drive of " + jointTaskObject.Label + " is set in its DriveTableFile property")
+                self.form.withRotationDriver.setToolTip("Tabulated drive (type 6) from " + jointTaskObject.DriveTableFile)
+                self.form.withTranslationDriver.setToolTip("Tabulated drive (type 6) from " + jointTaskObject.DriveTableFile)
             # if jointTaskObject.FunctType == 0:
             #     self.form.radioButtonA.setVisible(True)
             # elif jointTaskObject.FunctType == 1:
@@ -637,6 +647,7 @@ class TaskPanelDapJointClass:
             self.hideAllEquationsF()
         else:
             self.showAllEquationsF()
+            # With no radio button checked (e.g. a tabulated drive) FunctType is left as it is
             if self.form.radioButtonA.isChecked():
                 self.jointTaskObject.FunctType = 0
             elif self.form.radioButtonB.isChecked():
@@ -59,15 +59,139 @@ import FreeCAD as CAD
 import FreeCADGui as CADGui
 
 import os
+import io
+import copy
+import json
+import pickle
+import hashlib
+import time
+import threading
 import numpy as np
-from scipy.integrate import solve_ivp
+from scipy.integrate import RK23, RK45, DOP853, Radau, BDF, LSODA
+from scipy.optimize import brentq
+from scipy.linalg import lu_factor, lu_solve
 import math
 import PySide
 
 import DapToolsMod as DT
 import DapFunctionMod
+import DapSolutionMod
+import DapContactMod
 
 Debug = False
+
+# Minimum wall-clock time [s] between reports on the progress queue
+PROGRESS_INTERVAL = 0.2
+
+# Attributes (other than the NumPy arrays) which make up a compiled model
+COMPILED_MODEL_ATTRIBUTES = ["numBodies", "numJoints", "numForces", "numMovBodiesx3", "numConstraints",
+                             "bodyObjList", "jointObjList", "forceObjList", "pointDictList", "driverObjDict",
+                             "contactEngine", "driverTable", "springLawList", "rotSpringLawList"]
+# Compiled models are cached in memory (at most this many) and keyed by a hash of the DAP container
+COMPILED_MODEL_CACHE_SIZE = 4
+# Increment this whenever the content of a compiled model changes, so that old models are never reused
+COMPILED_MODEL_VERSION = 8
+# A compiled model persisted to disk is saved next to the document with this suffix
+COMPILED_MODEL_FILE_SUFFIX = ".DapModel.pkl"
+# The torque law of a Motor with Air Friction which has no ForceLaw of its own
+# The torque T acts as -T on body I, so +c * v * abs(v) opposes the relative speed v like the damping
+AIR_FRICTION_MOTOR_LAW = "F0 + c * v * abs(v)"
+# Properties of the container objects which have no influence on the compiled model
+MODEL_HASH_IGNORED_PROPERTIES = ["Label2", "Visibility", "ExpressionEngine"]
+# Property value types which are copied from the document objects into the solver records
+RECORD_PROPERTY_TYPES = (bool, int, float, str, list, CAD.Vector)
+# The scipy integrators which can be selected with DapMainC.integratorMethod
+INTEGRATOR_METHODS = {"RK23": RK23,
+                      "RK45": RK45,
+                      "DOP853": DOP853,
+                      "Radau": Radau,
+                      "BDF": BDF,
+                      "LSODA": LSODA}
+# Highest degree of the dense output polynomial of each of the INTEGRATOR_METHODS
+DENSE_OUTPUT_DEGREES = {"RK23": 3,
+                        "RK45": 4,
+                        "DOP853": 7,
+                        "Radau": 3,
+                        "BDF": 5,
+                        "LSODA": 12}
+# Evaluations of the equations of motion made by each call of dense_output() of the INTEGRATOR_METHODS
+# (DOP853 evaluates three extra stages for its interpolant, the others reuse the stages of the step)
+DENSE_OUTPUT_EVALUATIONS = {"RK23": 0,
+                            "RK45": 0,
+                            "DOP853": 3,
+                            "Radau": 0,
+                            "BDF": 0,
+                            "LSODA": 0}
+# Phases of the solution which are timed - the totals [s] are kept in DapMainC.phaseTimes
+PROFILE_PHASES = ["buildModel", "computeCoGAndMomentInertia", "correctInitialConditions", "rankCheck",
+                  "velocityCorrection", "unpack", "updatePointPositions", "updatePointVelocities",
+                  "makeForceArray", "GetJacobianF", "RHSAcc", "linearSolve", "pack",
+                  "integration", "output", "staticEquilibrium", "modal"]
+# Number of bins in the step size histogram and number of smallest steps which are reported
+STEP_HISTOGRAM_BINS = 12
+NUM_SMALLEST_STEPS = 10
+# Statistics of the solution are written to this file in the output directory after every run
+SOLVE_STATS_FILE_NAME = "DapSolveStats.json"
+# The final state of every solution is saved in this file in the output directory, so that it can be continued
+CHECKPOINT_FILE_NAME = "DapCheckpoint.npz"
+# Minimum wall-clock time [s] between the checkpoints saved while integrating
+CHECKPOINT_INTERVAL = 60.0
+# The types of event which can be defined in the Events property of the solver, with their parameters
+EVENT_PARAMETERS = {"pointCrossesLine": ["body", "point", "linePoint", "lineAngle"],
+                    "sliderStop": ["joint", "position"],
+                    "bodyAngle": ["body", "angle"],
+                    "forceThreshold": ["force", "threshold"]}
+# The times and states at which the events occurred are written to this file in the output directory
+EVENTS_FILE_NAME = "DapEvents.csv"
+# Events are located to within this time [s]
+EVENT_TIME_TOLERANCE = 1.0e-10
+# Static equilibrium: the most Newton-Raphson iterations, and the most halvings of a step which does not reduce the residual
+STATIC_MAX_ITERATIONS = 50
+STATIC_MAX_HALVINGS = 12
+# No body turns by more than this [rad] in one Newton-Raphson step
+STATIC_MAX_ROTATION = 0.5
+# When no halving of a step reduces the residual, the tangent matrix is given Levenberg damping
+# starting at this fraction of its largest diagonal term, and growing ten times up to the largest
+STATIC_INITIAL_DAMPING = 1.0e-3
+STATIC_MAX_DAMPING = 1.0e6
+# Static equilibrium is reached when the out-of-balance force is below this fraction of the applied loads
+# and the constraint error is below this distance [mm]
+STATIC_FORCE_TOLERANCE = 1.0e-9
+STATIC_CONSTRAINT_TOLERANCE = 1.0e-9
+# Relative step used to difference the Jacobian for the constraint part of the static tangent matrix
+STATIC_DIFFERENCE_STEP = 1.0e-7
+# The joint reactions at the static equilibrium are written to this file in the output directory
+STATIC_REACTIONS_FILE_NAME = "DapStaticReactions.csv"
+# The natural frequencies, damping ratios and mode shapes are written to this file in the output directory
+MODES_FILE_NAME = "DapModes.csv"
+# Singular values of the Jacobian below this fraction of the largest are taken as zero when finding its null space
+MODAL_RANK_TOLERANCE = 1.0e-10
+# Eigenvalues whose imaginary part is below this fraction of their size (or of one) are taken as real
+MODAL_REAL_TOLERANCE = 1.0e-9
+# The animation of a mode has this many frames over one period
+MODE_ANIMATION_FRAMES = 48
+# Relative step in the parameter (and along the sensitivity in the state) used to difference the equations of motion
+SENSITIVITY_RELATIVE_STEP = 1.0e-6
+# The sensitivities of the states to the parameters at the reporting times are saved in this file in the output directory
+SENSITIVITY_FILE_NAME = "DapSensitivities.npz"
+# State arrays which are stacked over the scenarios for AnalysisBatch
+BATCHED_STATE_ARRAYS = ["worldNp", "worldDotNp", "phiNp", "phiDotNp", "RotMatPhiNp",
+                        "pointXYrelCoGNp", "pointXYrelCoGrotNp", "pointXYrelCoGdotNp",
+                        "pointXYWorldNp", "pointWorldDotNp"]
+
+# Dormand-Prince RK5(4) coefficients for the batched adaptive integrator
+DP_C = np.array([0.0, 1.0/5.0, 3.0/10.0, 4.0/5.0, 8.0/9.0, 1.0])
+DP_A = [np.array([]),
+        np.array([1.0/5.0]),
+        np.array([3.0/40.0, 9.0/40.0]),
+        np.array([44.0/45.0, -56.0/15.0, 32.0/9.0]),
+        np.array([19372.0/6561.0, -25360.0/2187.0, 64448.0/6561.0, -212.0/729.0]),
+        np.array([9017.0/3168.0, -355.0/33.0, 46732.0/5247.0, 49.0/176.0, -5103.0/18656.0])]
+DP_B = np.array([35.0/384.0, 0.0, 500.0/1113.0, 125.0/192.0, -2187.0/6784.0, 11.0/84.0])
+DP_E = np.array([-71.0/57600.0, 0.0, 71.0/16695.0, -71.0/1920.0, 17253.0/339200.0, -22.0/525.0, 1.0/40.0])
+
+# Compiled models from previous solutions in this session: model hash --> compiled model
+compiledModelCache = {}
 # =============================================================================
 # ==================================
 # Matlab Code from Nikravesh: DAP_BC
@@ -168,30 +292,50 @@ Debug = False
 #  =========================================================================
 #  -------------------------------------------------------------------------
 class DapMainC:
-    """Instantiated when the 'solve' button is clicked in the task panel"""
+    """Instantiated when the 'solve' button is clicked in the task panel
+    or with a compiledModel (or modelRecords) for a solution which is independent of the FreeCAD document"""
     #  -------------------------------------------------------------------------
-    def __init__(self, simEnd, simDelta, Accuracy, correctInitial):
+    def __init__(self, simEnd, simDelta, Accuracy, correctInitial, compiledModel=None, modelRecords=None):
         if Debug:
             DT.Mess("DapMainClass-__init__")
 
         # Save the parameters passed via the __init__ function
         self.simEnd = simEnd
         self.simDelta = simDelta
+        self.Accuracy = Accuracy
         self.correctInitial = correctInitial
 
         # Store the required accuracy figures
         self.relativeTolerance = 10**(-Accuracy-2)
         self.absoluteTolerance = 10**(-Accuracy-4)
+        # Name of the integrator in INTEGRATOR_METHODS
+        self.integratorMethod = "RK45"
 
         print("self.relativeTolerance", self.relativeTolerance)
         print("self.absoluteTolerance", self.absoluteTolerance)
 
         # Counter of function evaluations
         self.Counter = 0
+        # Statistics of the integrator, filled in by integrateSolution
+        self.integratorStats = {}
+        # Accumulated wall clock time [s] spent in each phase of the solution
+        self.phaseTimes = dict.fromkeys(PROFILE_PHASES, 0.0)
+
+        # We will need the solver object as well (but not when running from a compiled model)
+        if compiledModel is None and modelRecords is None:
+            self.solverObj = CAD.ActiveDocument.findObjects(Name="^DapSolver$")[0]
+            self.outputDirectory = self.solverObj.Directory
+            self.outputFileName = self.solverObj.FileName
+        else:
+            self.solverObj = None
+            self.outputDirectory = os.getcwd()
+            self.outputFileName = "-"
+
+        # Progress is reported on this queue (if one is supplied) while integrating
+        # and the integration stops early when the cancel event is set
+        self.progressQueue = None
+        self.cancelEvent = threading.Event()
 
-        # We will need the solver object as well
-        self.solverObj = CAD.ActiveDocument.findObjects(Name="^DapSolver$")[0]
-        
         # Set a variable to flag whether we have reached the end error-free
         # It will be available to DapSolverMod as an instance variable
         self.initialised = False
@@ -229,6 +373,78 @@ class DapMainC:
             6: self.Driven_Revolute_Jacobian,
             7: self.Driven_Translational_Jacobian,
         }
+        # The same for the Jacobian functions of all the scenarios at once (see setUpScenarios)
+        self.dictJacobianBatchFunctions = {
+            0: self.Revolute_JacobianBatch,
+            1: self.Translational_JacobianBatch,
+            2: self.Revolute_Revolute_JacobianBatch,
+            3: self.Translational_Revolute_JacobianBatch,
+            4: self.Rigid_JacobianBatch,
+            5: self.Disc_JacobianBatch,
+            6: self.Driven_Revolute_JacobianBatch,
+            7: self.Driven_Translational_JacobianBatch,
+        }
+        # Dictionary of the pointers for Dynamic calling of the event functions
+        self.dictEventFunctions = {
+            "pointCrossesLine": self.pointCrossesLine_Event,
+            "sliderStop": self.sliderStop_Event,
+            "bodyAngle": self.bodyAngle_Event,
+            "forceThreshold": self.forceThreshold_Event,
+        }
+
+        # Hash of the DAP container from which the model was compiled ("" if not from the document)
+        self.modelHash = ""
+        startTime = time.perf_counter()
+        if modelRecords is not None:
+            self.buildModelFromRecords(modelRecords)
+        elif compiledModel is None:
+            self.modelHash = self.computeModelHash()
+            cachedModel = self.loadCompiledModel(self.modelHash)
+            if cachedModel is None:
+                self.buildModelFromDocument()
+                # Building the model may bring some properties in the document up-to-date (e.g. Mass)
+                self.modelHash = self.computeModelHash()
+                self.storeCompiledModel(self.modelHash)
+            else:
+                DT.Mess("Unchanged model - using the compiled model from the cache")
+                self.restoreCompiledModel(cachedModel)
+        else:
+            self.restoreCompiledModel(compiledModel)
+        self.phaseTimes["buildModel"] += time.perf_counter() - startTime
+
+        # The integration starts later than zero when continuing from a checkpoint
+        self.startTime = 0.0
+        # Time at which the driver functions were evaluated last
+        self.driverTick = None
+        # Number of reporting times already in the results files, and the results not yet written there
+        self.numWrittenRows = 0
+        self.lastReportedTime = np.nan
+        self.pendingTimeValues = np.zeros((0,), dtype=np.float64)
+        self.pendingUResults = np.zeros((0, self.numMovBodiesx3 * 2), dtype=np.float64)
+        # The piecewise polynomial solution, from the dense output of every integration step
+        self.denseSolution = None
+        # The events which are watched for while integrating, and those which have occurred
+        self.eventList = []
+        self.eventLog = []
+        # The parameters whose sensitivities are integrated alongside the states
+        # and for each of them its step and the edits of the model arrays which perturb it
+        self.sensitivityParameters = []
+        self.sensitivityPerturbations = []
+        # Whether the constraint violations are written to the results file, and their largest values
+        self.constraintViolationOutput = False
+        self.maxConstraintViolations = {}
+        if self.solverObj is not None:
+            self.setUpEvents(self.solverObj.Events)
+            self.setUpSensitivities(self.solverObj.SensitivityParameters)
+            self.constraintViolationOutput = self.solverObj.ConstraintViolations
+
+        # Return with a flag to show we have reached the end of init error-free
+        self.initialised = True
+    #  -------------------------------------------------------------------------
+    def buildModelFromDocument(self):
+        """Transfer the bodies, joints and forces in the active DAP container into the solver"""
+        if Debug:
+            DT.Mess("DapMainC-buildModelFromDocument")
 
         # Convert joint object Dictionary to Joint Object List to ensure being ordered
         jointObjDict = DT.getDictionary("DapJoint")
@@ -271,9 +487,15 @@ class DapMainC:
         # in case a body has been deleted after joint/force definition
         self.clearZombieBodies(bodyObjDict)
 
+        # From here on, the solver works with detached records of the joint and force objects
+        self.jointObjList = [DapObjectRecordC(jointObj) for jointObj in self.jointObjList]
+        self.forceObjList = [DapObjectRecordC(forceObj) for forceObj in self.forceObjList]
+
         # Get the plane normal rotation matrix from the main DAP container
         # This will rotate all the coordinates in the model, to be in the X-Y plane
-        xyzToXYRotation = CAD.Rotation(CAD.Vector(0.0, 0.0, 1.0), DT.getActiveContainerObject().movementPlaneNormal)
+        containerObj = DT.getActiveContainerObject()
+        xyzToXYRotation = CAD.Rotation(CAD.Vector(0.0, 0.0, 1.0), containerObj.movementPlaneNormal)
+        self.gravityNp = DT.CADVecToNumPyF(xyzToXYRotation.toMatrix().multVec(containerObj.gravityVector))
 
         # Find the global maximum number of points in any of the bodies
         # We will need this so we can initialise large enough NumPy arrays
@@ -290,7 +512,9 @@ class DapMainC:
             # Bring the body Mass, CoG, MoI and Weight up-to-date
             # It was already calculated after the Materials definition
             # but do it again, just in case something has changed since
+            startTime = time.perf_counter()
             DT.computeCoGAndMomentInertia(bodyObj)
+            self.phaseTimes["computeCoGAndMomentInertia"] += time.perf_counter() - startTime
             # All Mass and moment of inertia stuff
             self.MassNp[bodyIndex] = bodyObj.Mass
             self.momentInertiaNp[bodyIndex] = bodyObj.momentInertia
@@ -353,6 +577,11 @@ class DapMainC:
                 self.pointWorldDotNp[bodyIndex][pointIndex] = np.zeros((1, 2))
             # Next pointIndex
         # Next bodyIndex
+        # Any mass properties which were computed for the first time are written to the cache once
+        DT.saveMassPropertyCache()
+
+        # The body objects are finished with, so keep only detached records of them as well
+        self.bodyObjList = [DapObjectRecordC(bodyObj) for bodyObj in self.bodyObjList]
 
         # Print out what we have calculated for debugging
         if True:
@@ -408,6 +637,68 @@ class DapMainC:
             DT.Np3D(self.pointXYWorldNp)
             DT.Mess("")
 
+        self.completeModel()
+    #  -------------------------------------------------------------------------
+    def buildModelFromRecords(self, modelRecords):
+        """Build the model from records instead of from the FreeCAD document, e.g. for benchmarks
+        modelRecords is a dictionary with the keys:
+            "bodies"    list of DapObjectRecordC with Name, Label, Mass, momentInertia,
+                        centreOfGravity, phi, worldDot, phiDot, pointNames, pointLabels and pointLocals,
+                        where the vectors are already in the X-Y plane and the pointLocals
+                        are relative to the CoG in body local coordinates - body 0 is ground
+            "joints"    list of DapObjectRecordC with the properties of DapJoint objects
+            "forces"    list of DapObjectRecordC with the properties of DapForce objects
+            "gravity"   CAD.Vector of the gravitational acceleration [mm/s^2]"""
+        if Debug:
+            DT.Mess("DapMainC-buildModelFromRecords")
+        self.bodyObjList = modelRecords["bodies"]
+        self.jointObjList = modelRecords["joints"]
+        self.forceObjList = modelRecords["forces"]
+        self.numBodies = len(self.bodyObjList)
+        self.numJoints = len(self.jointObjList)
+        self.numForces = len(self.forceObjList)
+        self.numMovBodiesx3 = (self.numBodies-1) * 3
+        for jointNum in range(self.numJoints):
+            self.jointObjList[jointNum].JointNumber = jointNum
+        self.gravityNp = DT.CADVecToNumPyF(modelRecords["gravity"])
+
+        self.pointDictList = []
+        maxNumberPoints = 1
+        for bodyObj in self.bodyObjList:
+            self.pointDictList.append({bodyObj.pointNames[index]: index for index in range(len(bodyObj.pointLocals))})
+            maxNumberPoints = max(maxNumberPoints, len(bodyObj.pointLocals))
+        self.initNumPyArrays(maxNumberPoints)
+
+        for bodyIndex in range(self.numBodies):
+            bodyObj = self.bodyObjList[bodyIndex]
+            self.MassNp[bodyIndex] = bodyObj.Mass
+            self.momentInertiaNp[bodyIndex] = bodyObj.momentInertia
+            self.WeightNp[bodyIndex] = self.gravityNp * bodyObj.Mass
+            self.worldNp[bodyIndex] = DT.CADVecToNumPyF(bodyObj.centreOfGravity)
+            self.worldRotNp[bodyIndex] = DT.Rot90NumPy(self.worldNp[bodyIndex].copy())
+            self.worldDotNp[bodyIndex] = DT.CADVecToNumPyF(bodyObj.worldDot)
+            self.worldDotRotNp[bodyIndex] = DT.Rot90NumPy(self.worldDotNp[bodyIndex].copy())
+            self.phiNp[bodyIndex] = bodyObj.phi
+            self.phiDotNp[bodyIndex] = bodyObj.phiDot
+            self.RotMatPhiNp[bodyIndex] = DT.RotationMatrixNp(self.phiNp[bodyIndex])
+            for pointIndex in range(len(bodyObj.pointLocals)):
+                self.pointXiEtaNp[bodyIndex, pointIndex] = DT.CADVecToNumPyF(bodyObj.pointLocals[pointIndex])
+                npVec = self.RotMatPhiNp[bodyIndex] @ self.pointXiEtaNp[bodyIndex, pointIndex]
+                self.pointXYrelCoGNp[bodyIndex, pointIndex] = npVec
+                self.pointXYrelCoGrotNp[bodyIndex, pointIndex] = DT.Rot90NumPy(npVec.copy())
+                self.pointXYrelCoGdotNp[bodyIndex, pointIndex] = self.pointXYrelCoGrotNp[bodyIndex, pointIndex] * self.phiDotNp[bodyIndex]
+                self.pointXYWorldNp[bodyIndex, pointIndex] = npVec + self.worldNp[bodyIndex]
+                self.pointWorldRotNp[bodyIndex, pointIndex] = DT.Rot90NumPy(self.pointXYWorldNp[bodyIndex, pointIndex].copy())
+                self.pointWorldDotNp[bodyIndex, pointIndex] = self.worldDotNp[bodyIndex] + self.pointXYrelCoGdotNp[bodyIndex, pointIndex]
+
+        self.completeModel()
+    #  -------------------------------------------------------------------------
+    def completeModel(self):
+        """Set up the mass array, the joint unit vectors and the joint constraint rows and drivers
+        from the body arrays and the joint records which are already in place"""
+        if Debug:
+            DT.Mess("DapMainC-completeModel")
+
         # Make an array with the respective body Mass and moment of inertia
         # do not add the body=0 to the list because it is ground
         # ==================================
@@ -571,7 +862,7 @@ class DapMainC:
                     elif jointObj.body_J_Index == 0:
                         vec = (- self.pointXYWorldNp[jointObj.body_J_Index, jointObj.point_J_i_Index]
                                + self.worldNp[jointObj.body_I_Index]
-                               + self.RotMatPhiNp[jointObj.body_I_Index] @ self.pointXiEtaNp[jointObj.body_I_Index, point_i_Index])
+                               + self.RotMatPhiNp[jointObj.body_I_Index] @ self.pointXiEtaNp[jointObj.body_I_Index, jointObj.point_I_i_Index])
                     else:
                         vec = (+ self.worldNp[jointObj.body_I_Index]
                                + self.RotMatPhiNp[jointObj.body_I_Index] @ self.pointXiEtaNp[jointObj.body_I_Index, jointObj.point_I_i_Index]
@@ -606,6 +897,10 @@ class DapMainC:
                 # ==================================
                 jointObj.mConstraints = 1
                 jointObj.nMovBodies = 2
+                # L is the (constant) distance of the pin from the line of the slot
+                pinInSlot = self.pointXYWorldNp[jointObj.body_I_Index, jointObj.point_I_i_Index] - \
+                            self.pointXYWorldNp[jointObj.body_J_Index, jointObj.point_J_i_Index]
+                jointObj.lengthLink = self.jointUnit_I_WorldRotNp[jointObj.JointNumber].dot(pinInSlot)
             elif jointObj.JointType == DT.JOINT_TYPE_DICTIONARY["Driven-Translation"]:
                 # ==================================
                 # Matlab Code from Nikravesh: DAP_BC
@@ -678,13 +973,8 @@ class DapMainC:
             # If there is a driver function, then
             # store an instance of the class in driverObjDict and initialize its parameters
             if jointObj.FunctType != -1:
-                self.driverObjDict[jointObj.Name] = DapFunctionMod.FunctionC(
-                    [jointObj.FunctType,
-                     jointObj.startTimeDriveFunc, jointObj.endTimeDriveFunc,
-                     jointObj.startValueDriveFunc, jointObj.endValueDriveFunc,
-                     jointObj.endDerivativeDriveFunc,
-                     jointObj.Coeff0, jointObj.Coeff1, jointObj.Coeff2, jointObj.Coeff3, jointObj.Coeff4, jointObj.Coeff5]
-                )
+                self.driverObjDict[jointObj.Name] = self.makeDriverFunction(jointObj)
+        self.makeDriverTable()
 
         # Add up all the numbers of constraints and allocate row start and end pointers
         self.numConstraints = 0
@@ -693,27 +983,422 @@ class DapMainC:
             jointObj.rowEnd = self.numConstraints + jointObj.mConstraints
             self.numConstraints = jointObj.rowEnd
 
-        # Return with a flag to show we have reached the end of init error-free
-        self.initialised = True
+        self.compileForceElements()
+    #  -------------------------------------------------------------------------
+    def compileForceElements(self):
+        """Group the force elements by type into index and parameter arrays
+        so that makeForceArray can evaluate each type for all its elements at once
+        Must be called again whenever a force parameter changes"""
+        if Debug:
+            DT.Mess("DapMainC-compileForceElements")
+        springList = []
+        rotSpringList = []
+        localForceList = []
+        worldForceList = []
+        torqueList = []
+        contactList = []
+        self.gravityCountNp = np.zeros((1,), dtype=np.float64)
+        for forceIndex in range(self.numForces):
+            forceObj = self.forceObjList[forceIndex]
+            if forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Gravity"]:
+                self.gravityCountNp[0] += 1.0
+            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Spring"] or \
+                    forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Linear Spring Damper"]:
+                springList.append((forceIndex, forceObj))
+            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Rotational Spring"] or \
+                    forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Rotational Spring Damper"] or \
+                    forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Motor"] or \
+                    forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Motor with Air Friction"]:
+                # A motor is a rotational actuator between two bodies whose torque is TorqueMagnitude
+                # or given by its ForceLaw, e.g. a torque-speed curve in phiDot or v
+                rotSpringList.append((forceIndex, forceObj))
+            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Force Local to Body"]:
+                localForceList.append((forceIndex, forceObj))
+            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Global Force"]:
+                worldForceList.append((forceIndex, forceObj))
+            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Torque about a Point"]:
+                torqueList.append((forceIndex, forceObj))
+            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Contact Friction"]:
+                contactList.append((forceIndex, forceObj))
+            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Unilateral Spring Damper"]:
+                # TODO: Future implementation - not explicitly handled by Nikravesh
+                CAD.Console.PrintError("Still in development - force ignored: " + forceObj.Label + "\n")
+            else:
+                CAD.Console.PrintError("Unknown Force type - this should never occur\n")
+
+        # Point-to-point springs, dampers and actuators
+        self.springForceIndexNp = np.array([forceIndex for forceIndex, forceObj in springList], dtype=np.int64)
+        self.springBodyINp = np.array([forceObj.body_I_Index for forceIndex, forceObj in springList], dtype=np.int64)
+        self.springPointINp = np.array([forceObj.point_i_Index for forceIndex, forceObj in springList], dtype=np.int64)
+        self.springBodyJNp = np.array([forceObj.body_J_Index for forceIndex, forceObj in springList], dtype=np.int64)
+        self.springPointJNp = np.array([forceObj.point_j_Index for forceIndex, forceObj in springList], dtype=np.int64)
+        self.springStiffnessNp = np.array([forceObj.Stiffness for forceIndex, forceObj in springList], dtype=np.float64)
+        self.springDampingNp = np.array([forceObj.DampingCoeff for forceIndex, forceObj in springList], dtype=np.float64)
+        self.springLength0Np = np.array([forceObj.LengthAngle0 for forceIndex, forceObj in springList], dtype=np.float64)
+        self.springActuatorNp = np.array([forceObj.ForceMagnitude for forceIndex, forceObj in springList], dtype=np.float64)
+
+        # Rotational springs, dampers and actuators
+        self.rotSpringForceIndexNp = np.array([forceIndex for forceIndex, forceObj in rotSpringList], dtype=np.int64)
+        self.rotSpringBodyINp = np.array([forceObj.body_I_Index for forceIndex, forceObj in rotSpringList], dtype=np.int64)
+        self.rotSpringBodyJNp = np.array([forceObj.body_J_Index for forceIndex, forceObj in rotSpringList], dtype=np.int64)
+        # Zero where the body is the ground, so that the ground angle is ignored as in Nikravesh
+        self.rotSpringMaskINp = (self.rotSpringBodyINp != 0).astype(np.float64)
+        self.rotSpringMaskJNp = (self.rotSpringBodyJNp != 0).astype(np.float64)
+        self.rotSpringStiffnessNp = np.array([forceObj.Stiffness for forceIndex, forceObj in rotSpringList], dtype=np.float64)
+        self.rotSpringDampingNp = np.array([forceObj.DampingCoeff for forceIndex, forceObj in rotSpringList], dtype=np.float64)
+        self.rotSpringAngle0Np = np.array([forceObj.LengthAngle0 for forceIndex, forceObj in rotSpringList], dtype=np.float64)
+        self.rotSpringActuatorNp = np.array([forceObj.TorqueMagnitude for forceIndex, forceObj in rotSpringList], dtype=np.float64)
+
+        # Elements with a ForceLaw expression instead of the linear law
+        self.springLawList = self.compileForceLaws(springList)
+        self.rotSpringLawList = self.compileForceLaws(rotSpringList)
+
+        # Constant forces local to a body, constant world forces and constant torques
+        self.localForceIndexNp = np.array([forceIndex for forceIndex, forceObj in localForceList], dtype=np.int64)
+        self.localForceBodyNp = np.array([forceObj.body_I_Index for forceIndex, forceObj in localForceList], dtype=np.int64)
+        self.localForceXiEtaNp = np.array([[forceObj.constLocalForce[0], forceObj.constLocalForce[1]]
+                                           for forceIndex, forceObj in localForceList], dtype=np.float64).reshape((-1, 2))
+        self.worldForceIndexNp = np.array([forceIndex for forceIndex, forceObj in worldForceList], dtype=np.int64)
+        self.worldForceBodyNp = np.array([forceObj.body_I_Index for forceIndex, forceObj in worldForceList], dtype=np.int64)
+        self.worldForceXYNp = np.array([[forceObj.constWorldForce[0], forceObj.constWorldForce[1]]
+                                        for forceIndex, forceObj in worldForceList], dtype=np.float64).reshape((-1, 2))
+        self.torqueForceIndexNp = np.array([forceIndex for forceIndex, forceObj in torqueList], dtype=np.int64)
+        self.torqueBodyNp = np.array([forceObj.body_I_Index for forceIndex, forceObj in torqueList], dtype=np.int64)
+        self.torqueValueNp = np.array([forceObj.constTorque for forceIndex, forceObj in torqueList], dtype=np.float64)
+
+        # Contacts between points and lines or circles
+        if len(contactList) > 0:
+            self.contactEngine = DapContactMod.DapContactC(self, contactList)
+        else:
+            self.contactEngine = None
+
+        # The magnitudes of the constant loads never change
+        self.forceValueNp[self.localForceIndexNp] = np.hypot(self.localForceXiEtaNp[:, 0], self.localForceXiEtaNp[:, 1])
+        self.forceValueNp[self.worldForceIndexNp] = np.hypot(self.worldForceXYNp[:, 0], self.worldForceXYNp[:, 1])
+        self.forceValueNp[self.torqueForceIndexNp] = self.torqueValueNp
+
+        self.makeConstantLoads()
+    #  -------------------------------------------------------------------------
+    def compileForceLaws(self, elementList):
+        """Compile the ForceLaw expressions of the elements in elementList
+        Return a list of (positions in elementList, ForceLawC) with one entry per distinct expression
+        An invalid expression is reported and the element keeps its linear law"""
+        if Debug:
+            DT.Mess("DapMainC-compileForceLaws")
+        # The drive function of every driven joint may be used in a force law, by name or by label
+        driveColumnDict = {}
+        for jointObj in self.jointObjList:
+            if jointObj.FunctType != -1:
+                driveColumnDict[DapFunctionMod.FORCE_LAW_DRIVE_PREFIX + jointObj.Name] = jointObj.driverColumn
+                if jointObj.Label.isidentifier():
+                    driveColumnDict[DapFunctionMod.FORCE_LAW_DRIVE_PREFIX + jointObj.Label] = jointObj.driverColumn
+
+        lawDict = {}
+        for position in range(len(elementList)):
+            forceObj = elementList[position][1]
+            expression = getattr(forceObj, "ForceLaw", "").strip()
+            if expression == "" and forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Motor with Air Friction"]:
+                expression = AIR_FRICTION_MOTOR_LAW
+            if expression != "":
+                lawDict.setdefault(expression, []).append(position)
+
+        lawList = []
+        for expression, positionList in lawDict.items():
+            try:
+                forceLaw = DapFunctionMod.ForceLawC(expression, driveColumnDict)
+            except (SyntaxError, ValueError) as e:
+                CAD.Console.PrintError("Invalid ForceLaw '" + expression + "' - linear law used instead: " + str(e) + "\n")
+                continue
+            lawList.append((np.array(positionList, dtype=np.int64), forceLaw))
+        return lawList
+    #  -------------------------------------------------------------------------
+    def makeConstantLoads(self):
+        """Add up the loads which depend neither on the time nor on the state
+        (gravity, constant world forces and constant torques) once,
+        as the starting point for the force array of every makeForceArray call
+        Must be called again whenever a body weight or one of these forces changes"""
+        if Debug:
+            DT.Mess("DapMainC-makeConstantLoads")
+        self.constantForcesNp = np.zeros((self.numBodies, 2,), dtype=np.float64)
+        self.constantMomentsNp = np.zeros((self.numBodies,), dtype=np.float64)
+
+        # ==================================
+        # Matlab Code from Nikravesh: DAP_BC
+        # ==================================
+        #        case {'weight'}
+        #            for Bi=1:nB
+        #                Bodies(Bi).f = Bodies(Bi).f + Bodies(Bi).wgt;
+        #            end
+        # ==================================
+        self.constantForcesNp[1:] += self.gravityCountNp[0] * self.WeightNp[1:]
+
+        # ==================================
+        # Matlab Code from Nikravesh: DAP_BC
+        # ==================================
+        #        case {'f'}
+        #            Bi = Forces(Fi).iBindex;
+        #            Bodies(Bi).f = Bodies(Bi).f + Forces(Fi).f;
+        # ==================================
+        np.add.at(self.constantForcesNp, self.worldForceBodyNp, self.worldForceXYNp)
+
+        # ==================================
+        # Matlab Code from Nikravesh: DAP_BC
+        # ==================================
+        #        case {'T'}
+        #            Bi = Forces(Fi).iBindex;
+        #            Bodies(Bi).n = Bodies(Bi).n + Forces(Fi).T;
+        # ==================================
+        np.add.at(self.constantMomentsNp, self.torqueBodyNp, self.torqueValueNp)
+    #  -------------------------------------------------------------------------
+    def makeDriverFunction(self, jointObj):
+        """Return an initialised FunctionC instance for the driver function of the joint"""
+        return DapFunctionMod.FunctionC(self.driverParameterList(jointObj))
+    #  -------------------------------------------------------------------------
+    def driverParameterList(self, jointObj):
+        """Return the list of parameters with which FunctionC is initialised for the driver of the joint"""
+        return [jointObj.FunctType,
+                jointObj.startTimeDriveFunc, jointObj.endTimeDriveFunc,
+                jointObj.startValueDriveFunc, jointObj.endValueDriveFunc,
+                jointObj.endDerivativeDriveFunc,
+                jointObj.Coeff0, jointObj.Coeff1, jointObj.Coeff2, jointObj.Coeff3, jointObj.Coeff4, jointObj.Coeff5,
+                getattr(jointObj, "DriveTableFile", ""), getattr(jointObj, "DriveSplineDegree", 3)]
+    #  -------------------------------------------------------------------------
+    def makeDriverTable(self):
+        """Gather the driver functions in driverObjDict into one table
+        which evaluates all of them together, and give each driven joint its column in it"""
+        if Debug:
+            DT.Mess("DapMainC-makeDriverTable")
+        driverList = []
+        for jointObj in self.jointObjList:
+            if jointObj.FunctType != -1:
+                jointObj.driverColumn = len(driverList)
+                driverList.append(self.driverObjDict[jointObj.Name])
+        self.driverTable = DapFunctionMod.DriverTableC(driverList)
+        self.driverTick = None
+    #  -------------------------------------------------------------------------
+    def driverValues(self, jointObj, tick):
+        """Return [f, fDot, fDotDot] of the driver function of the joint at time tick
+        All the drivers are evaluated together, once for each new time"""
+        return self.allDriverValues(tick)[:, jointObj.driverColumn]
+    #  -------------------------------------------------------------------------
+    def allDriverValues(self, tick):
+        """Return [f, fDot, fDotDot] of all the driver functions (one column each) at time tick
+        The table is only evaluated again when the time changes"""
+        if tick != self.driverTick:
+            self.driverValuesNp = self.driverTable.evaluate(tick)
+            self.driverTick = tick
+        return self.driverValuesNp
+    #  -------------------------------------------------------------------------
+    def compileModel(self):
+        """Return a detached copy of everything the solution needs
+        i.e. all the NumPy arrays plus the body, joint and force records
+        It must be taken before the solution starts, and can be pickled"""
+        if Debug:
+            DT.Mess("DapMainC-compileModel")
+        compiledModel = {}
+        for attributeName, value in self.__dict__.items():
+            if attributeName.endswith("Np"):
+                compiledModel[attributeName] = value
+        for attributeName in COMPILED_MODEL_ATTRIBUTES:
+            compiledModel[attributeName] = getattr(self, attributeName)
+        return copy.deepcopy(compiledModel)
+    #  -------------------------------------------------------------------------
+    def restoreCompiledModel(self, compiledModel):
+        """Set up the solver from a model previously returned by compileModel"""
+        if Debug:
+            DT.Mess("DapMainC-restoreCompiledModel")
+        for attributeName, value in copy.deepcopy(compiledModel).items():
+            setattr(self, attributeName, value)
+    #  -------------------------------------------------------------------------
+    def computeModelHash(self):
+        """Return a hash of everything in the active DAP container which goes into the compiled model
+        i.e. the properties of the container and of its bodies, joints, forces and materials
+        plus the geometry and placement of the solids making up each body
+        The solver and animation objects do not influence the model and are left out"""
+        if Debug:
+            DT.Mess("DapMainC-computeModelHash")
+        containerObj = DT.getActiveContainerObject()
+        modelHash = hashlib.sha256(str(COMPILED_MODEL_VERSION).encode())
+        for dapObject in [containerObj] + containerObj.Group:
+            if "DapSolver" in dapObject.Name or "DapAnimation" in dapObject.Name:
+                continue
+            modelHash.update(dapObject.Name.encode())
+            for propertyName in sorted(dapObject.PropertiesList):
+                if propertyName in MODEL_HASH_IGNORED_PROPERTIES:
+                    continue
+                value = getattr(dapObject, propertyName)
+                # Linked objects are identified by their name only
+                if isinstance(value, (list, tuple)):
+                    value = [getattr(member, "Name", member) for member in value]
+                else:
+                    value = getattr(value, "Name", value)
+                modelHash.update((propertyName + "=" + repr(value)).encode())
+            # A tabulated driver depends on the content of its table file
+            if getattr(dapObject, "FunctType", -1) == 6 and os.path.isfile(dapObject.DriveTableFile):
+                with open(dapObject.DriveTableFile, "rb") as tableFILE:
+                    modelHash.update(hashlib.sha256(tableFILE.read()).hexdigest().encode())
+            # The mass properties depend on the geometry and placement of the solids
+            if hasattr(dapObject, "ass4SolidsNames"):
+                for solidName in dapObject.ass4SolidsNames:
+                    solidObj = dapObject.Document.getObject(solidName)
+                    if solidObj is not None:
+                        modelHash.update(DT.shapeContentHash(solidObj).encode())
+                        modelHash.update(repr(solidObj.Placement).encode())
+        return modelHash.hexdigest()
+    #  -------------------------------------------------------------------------
+    def compiledModelFileName(self):
+        """Return the file name of the persisted compiled model next to the document
+        or "" if the model is not to be persisted (or the document has not been saved)"""
+        if self.solverObj is None or self.solverObj.PersistModel is False:
+            return ""
+        if self.solverObj.Document.FileName == "":
+            return ""
+        return os.path.splitext(self.solverObj.Document.FileName)[0] + COMPILED_MODEL_FILE_SUFFIX
     #  -------------------------------------------------------------------------
-    def MainSolve(self):
+    def loadCompiledModel(self, modelHash):
+        """Return the compiled model with this hash from the cache in memory,
+        or from the file next to the document, or None if it has not been compiled before"""
+        if Debug:
+            DT.Mess("DapMainC-loadCompiledModel")
+        if modelHash in compiledModelCache:
+            return compiledModelCache[modelHash]
+        fileName = self.compiledModelFileName()
+        if fileName == "" or not os.path.isfile(fileName):
+            return None
+        try:
+            with open(fileName, "rb") as modelFILE:
+                persistedModel = pickle.load(modelFILE)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            CAD.Console.PrintError("Compiled model could not be read from " + fileName + " - rebuilding\n")
+            return None
+        if persistedModel.get("modelHash") != modelHash:
+            return None
+        compiledModelCache[modelHash] = persistedModel["compiledModel"]
+        return compiledModelCache[modelHash]
+    #  -------------------------------------------------------------------------
+    def storeCompiledModel(self, modelHash):
+        """Keep the freshly built model in the cache (and on disk if required) for the next solution"""
+        if Debug:
+            DT.Mess("DapMainC-storeCompiledModel")
+        while len(compiledModelCache) >= COMPILED_MODEL_CACHE_SIZE:
+            del compiledModelCache[next(iter(compiledModelCache))]
+        compiledModelCache[modelHash] = self.compileModel()
+        fileName = self.compiledModelFileName()
+        if fileName == "":
+            return
+        try:
+            with open(fileName, "wb") as modelFILE:
+                pickle.dump({"modelHash": modelHash, "compiledModel": compiledModelCache[modelHash]}, modelFILE)
+        except (OSError, pickle.PicklingError):
+            CAD.Console.PrintError("Compiled model could not be written to " + fileName + "\n")
+    #  -------------------------------------------------------------------------
+    def getParameter(self, parameterName):
+        """Return the value of a model parameter given as '<object name>.<property name>'
+        which can be changed with setParameter, or None if there is no such parameter"""
+        if "." not in parameterName:
+            return None
+        objectName, propertyName = parameterName.split(".", 1)
+        for bodyObj in self.bodyObjList:
+            if bodyObj.Name == objectName and propertyName in ["Mass", "momentInertia"]:
+                return getattr(bodyObj, propertyName)
+        for elementObj in self.jointObjList + self.forceObjList:
+            if elementObj.Name == objectName:
+                value = getattr(elementObj, propertyName, None)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    return value
+        return None
+    #  -------------------------------------------------------------------------
+    def setParameter(self, parameterName, value):
+        """Change one model parameter, given as '<object name>.<property name>'
+        and bring the arrays which depend on it up to date"""
+        if Debug:
+            DT.Mess("DapMainC-setParameter")
+        objectName, propertyName = parameterName.split(".", 1)
+
+        for bodyIndex in range(self.numBodies):
+            bodyObj = self.bodyObjList[bodyIndex]
+            if bodyObj.Name == objectName:
+                if propertyName == "Mass":
+                    bodyObj.Mass = value
+                    self.MassNp[bodyIndex] = value
+                    self.WeightNp[bodyIndex] = self.gravityNp * value
+                    self.makeConstantLoads()
+                    if bodyIndex != 0:
+                        self.massArrayNp[(bodyIndex-1)*3: (bodyIndex-1)*3+2] = value
+                elif propertyName == "momentInertia":
+                    bodyObj.momentInertia = value
+                    self.momentInertiaNp[bodyIndex] = value
+                    if bodyIndex != 0:
+                        self.massArrayNp[(bodyIndex-1)*3+2] = value
+                elif propertyName == "worldDot":
+                    # In mm/s in the movement plane
+                    self.worldDotNp[bodyIndex] = value[0], value[1]
+                elif propertyName == "phiDot":
+                    self.phiDotNp[bodyIndex] = value
+                else:
+                    CAD.Console.PrintError("Body parameter cannot be changed: " + parameterName + "\n")
+                return
+
+        for jointObj in self.jointObjList:
+            if jointObj.Name == objectName:
+                setattr(jointObj, propertyName, value)
+                # The driver function must be re-initialised with its new parameters
+                if jointObj.FunctType != -1:
+                    self.driverObjDict[jointObj.Name] = self.makeDriverFunction(jointObj)
+                    self.makeDriverTable()
+                return
+
+        for forceObj in self.forceObjList:
+            if forceObj.Name == objectName:
+                setattr(forceObj, propertyName, value)
+                # The per-type force arrays carry copies of the force parameters
+                self.compileForceElements()
+                return
+
+        CAD.Console.PrintError("Unknown parameter: " + parameterName + "\n")
+    #  -------------------------------------------------------------------------
+    def MainSolve(self, continueSolution=False):
+        """Run the complete solution in the calling thread
+        or carry on from the checkpoint of the previous solution if continueSolution is True"""
+        if Debug:
+            DT.Mess("DapMainC-MainSolve")
+        if continueSolution:
+            if self.prepareContinuation() is False:
+                return
+        elif self.prepareSolution() is False:
+            return
+        self.integrateSolution()
+        self.writeResults()
+        self.updateSolverObject()
+    #  -------------------------------------------------------------------------
+    def prepareSolution(self):
+        """Correct the initial conditions and pack them into uArray ready for integration
+        Returns False if the system cannot be solved"""
+        if Debug:
+            DT.Mess("DapMainC-prepareSolution")
         if self.numConstraints != 0 and self.correctInitial:
             # Correct for initial conditions consistency
-            if self.correctInitialConditions() is False:
-                CAD.Console.PrintError("Initial Conditions not successfully calculated")
-                return
+            startTime = time.perf_counter()
+            correctedOK = self.correctInitialConditions()
+            self.phaseTimes["correctInitialConditions"] += time.perf_counter() - startTime
+            if correctedOK is False:
+                CAD.Console.PrintError("Initial Conditions not successfully calculated\n")
+                return False
 
         # Determine any redundancy between constraints
+        startTime = time.perf_counter()
         Jacobian = self.GetJacobianF()
-        if True:
+        if Debug:
             DT.Mess("Jacobian calculated to determine rank of solution")
             DT.Np2D(Jacobian)
         redundant = np.linalg.matrix_rank(Jacobian)
+        self.phaseTimes["rankCheck"] += time.perf_counter() - startTime
         if redundant < self.numConstraints:
             CAD.Console.PrintError('The constraints exhibit Redundancy\n')
-            return
+            return False
 
         # Velocity correction
+        startTime = time.perf_counter()
         velCorrArrayNp = np.zeros((self.numMovBodiesx3,), dtype=np.float64)
         # Move velocities to the corrections array
         for bodyIndex in range(1, self.numBodies):
@@ -726,7 +1411,7 @@ class DapMainC:
         # RHSVel = [0,0,...]   (i.e. a list of zeros)
         solution = np.linalg.solve(Jacobian @ Jacobian.T, (Jacobian @ velCorrArrayNp) - self.RHSVel(0))
         deltaVel = -Jacobian.T @ solution
-        if True:
+        if Debug:
             DT.MessNoLF("Velocity Correction Array: ")
             DT.Np1D(True, velCorrArrayNp)
             DT.MessNoLF("Velocity Correction Solution: ")
@@ -738,6 +1423,7 @@ class DapMainC:
             self.worldDotNp[bodyIndex, 0] += deltaVel[(bodyIndex-1)*3]
             self.worldDotNp[bodyIndex, 1] += deltaVel[(bodyIndex-1)*3+1]
             self.phiDotNp[bodyIndex] += deltaVel[(bodyIndex-1)*3+2]
+        self.phaseTimes["velocityCorrection"] += time.perf_counter() - startTime
         # Report corrected coordinates and velocities
         if Debug:
             DT.Mess("Corrected Positions: [mm]")
@@ -747,83 +1433,581 @@ class DapMainC:
             DT.Np2D(self.worldDotNp)
             DT.Np1Ddeg(True, self.phiDotNp)
 
-        ##############################
-        # START OF THE SOLUTION PROPER
-        ##############################
         # Pack coordinates and velocities into the NumPy uArray
-        uArray = np.zeros((self.numMovBodiesx3 * 2,), dtype=np.float64)
+        self.uArray = np.zeros((self.numMovBodiesx3 * 2,), dtype=np.float64)
         index1 = 0
         index2 = self.numMovBodiesx3
         for bodyIndex in range(1, self.numBodies):
-            uArray[index1:index1+2] = self.worldNp[bodyIndex]
-            uArray[index1+2] = self.phiNp[bodyIndex]
-            uArray[index2:index2+2] = self.worldDotNp[bodyIndex]
-            uArray[index2+2] = self.phiDotNp[bodyIndex]
+            self.uArray[index1:index1+2] = self.worldNp[bodyIndex]
+            self.uArray[index1+2] = self.phiNp[bodyIndex]
+            self.uArray[index2:index2+2] = self.worldDotNp[bodyIndex]
+            self.uArray[index2+2] = self.phiDotNp[bodyIndex]
             index1 += 3
             index2 += 3
         if Debug:
             DT.Mess("uArray:")
-            DT.Np1D(True, uArray)
+            DT.Np1D(True, self.uArray)
         # Set up the list of time intervals over which to integrate
         self.Tspan = np.arange(0.0, self.simEnd, self.simDelta)
-
+        return True
+    #  -------------------------------------------------------------------------
+    def prepareContinuation(self):
+        """Set up the solution to carry on from the checkpoint of an earlier solution of the same model
+        (instead of from the initial conditions) and to add its results to the earlier results files"""
+        if Debug:
+            DT.Mess("DapMainC-prepareContinuation")
+        fileName = os.path.join(self.outputDirectory, CHECKPOINT_FILE_NAME)
+        if not os.path.isfile(fileName):
+            CAD.Console.PrintError("There is no checkpoint to continue from in " + self.outputDirectory + "\n")
+            return False
+        if len(self.sensitivityParameters) > 0:
+            CAD.Console.PrintError("Sensitivities are not kept in the checkpoint - the model must be solved from the start\n")
+            return False
+        with np.load(fileName) as checkpoint:
+            if str(checkpoint["modelHash"]) != self.modelHash:
+                CAD.Console.PrintError("The model has changed since the checkpoint was saved - it must be solved from the start\n")
+                return False
+            if "driverNames" not in checkpoint.files:
+                CAD.Console.PrintError("The checkpoint was saved by an earlier version - the model must be solved from the start\n")
+                return False
+            self.startTime = float(checkpoint["time"])
+            self.uArray = checkpoint["uArray"].copy()
+            checkpointDelta = float(checkpoint["simDelta"])
+            # The driver functions are made again from their parameters
+            self.driverObjDict = {}
+            for driverIndex, jointName in enumerate(checkpoint["driverNames"]):
+                self.driverObjDict[str(jointName)] = DapFunctionMod.FunctionC(
+                    [int(checkpoint["driverParameters"][driverIndex, 0])] +
+                    [float(value) for value in checkpoint["driverParameters"][driverIndex, 1:]] +
+                    [str(checkpoint["driverTableFiles"][driverIndex]),
+                     int(checkpoint["driverSplineDegrees"][driverIndex])])
+            self.makeDriverTable()
+            self.lastReportedTime = float(checkpoint["lastReportedTime"])
+            self.potEnergyZeroPointNp[:] = checkpoint["potEnergyZeroPointNp"]
+            if "energyAccountNp" in checkpoint.files:
+                self.energyAccountNp[:] = checkpoint["energyAccountNp"]
+            self.numWrittenRows = int(checkpoint["numWrittenRows"])
+            self.pendingTimeValues = checkpoint["pendingTimeValues"].copy()
+            self.pendingUResults = checkpoint["pendingUResults"].copy()
+        # The new steps are added to the dense solution of the earlier solution (if it is there)
+        solutionFileName = os.path.join(self.outputDirectory, DapSolutionMod.SOLUTION_FILE_NAME)
+        if os.path.isfile(solutionFileName):
+            self.denseSolution = DapSolutionMod.DapDenseSolutionC()
+            self.denseSolution.loadFromFile(solutionFileName)
+            if self.denseSolution.timeRange()[1] != self.startTime:
+                self.denseSolution = None
+        if self.startTime >= self.simEnd:
+            CAD.Console.PrintError("The solution has already reached t=" + str(self.startTime) +
+                                   " - increase the end time to continue it\n")
+            return False
+        # The reporting times must carry on from those of the earlier solution
+        if checkpointDelta != self.simDelta:
+            DT.Mess("Continuing with the reporting time of the earlier solution: " + str(checkpointDelta))
+            self.simDelta = checkpointDelta
+        # Carry on from the last reporting time already in the results, rather than counting
+        # rows in a fresh grid, so that no row is repeated or skipped through rounding
+        if np.isnan(self.lastReportedTime):
+            self.Tspan = np.arange(0.0, self.simEnd, self.simDelta)
+        else:
+            numRemaining = int(np.ceil((self.simEnd - self.lastReportedTime) / self.simDelta))
+            self.Tspan = self.lastReportedTime + self.simDelta * np.arange(1, numRemaining + 1)
+            self.Tspan = self.Tspan[self.Tspan < self.simEnd - 1.0e-9 * self.simDelta]
+        return True
+    #  -------------------------------------------------------------------------
+    def writeCheckpoint(self, tick, uArray, pendingTimeValues, pendingUResults):
+        """Save the state at time tick, together with the results which are not yet
+        in the results files, so that the solution can be continued from there later"""
+        if Debug:
+            DT.Mess("DapMainC-writeCheckpoint")
+        fileName = os.path.join(self.outputDirectory, CHECKPOINT_FILE_NAME)
+        # The driver functions are kept as plain arrays of their parameters
+        driverNames = [jointObj.Name for jointObj in self.jointObjList if jointObj.FunctType != -1]
+        driverParameterLists = [self.driverParameterList(jointObj) for jointObj in self.jointObjList
+                                if jointObj.FunctType != -1]
+        driverParameters = np.array([parameterList[:12] for parameterList in driverParameterLists],
+                                    dtype=np.float64).reshape((-1, 12))
+        driverTableFiles = np.array([str(parameterList[12]) for parameterList in driverParameterLists], dtype=str)
+        driverSplineDegrees = np.array([parameterList[13] for parameterList in driverParameterLists], dtype=np.int64)
+        # The last reporting time in the results, whether or not it has been written yet
+        if len(pendingTimeValues) > 0:
+            lastReportedTime = pendingTimeValues[-1]
+        else:
+            lastReportedTime = self.lastReportedTime
+        # Write to a temporary file first, so that a crash never leaves a half-written checkpoint
+        with open(fileName + ".tmp", "wb") as checkpointFILE:
+            np.savez(checkpointFILE,
+                     time=tick,
+                     uArray=uArray,
+                     simDelta=self.simDelta,
+                     modelHash=self.modelHash,
+                     driverNames=np.array(driverNames, dtype=str),
+                     driverParameters=driverParameters,
+                     driverTableFiles=driverTableFiles,
+                     driverSplineDegrees=driverSplineDegrees,
+                     lastReportedTime=lastReportedTime,
+                     potEnergyZeroPointNp=self.potEnergyZeroPointNp,
+                     energyAccountNp=self.energyAccountNp,
+                     numWrittenRows=self.numWrittenRows,
+                     pendingTimeValues=pendingTimeValues,
+                     pendingUResults=pendingUResults)
+        os.replace(fileName + ".tmp", fileName)
+    #  -------------------------------------------------------------------------
+    def integrateSolution(self):
+        """Integrate the equations of motion from startTime (normally zero) to simEnd
+        The integration is stepped here (rather than in solve_ivp) so that progress
+        can be reported and the solution can be cancelled with the partial results kept"""
+        if Debug:
+            DT.Mess("DapMainC-integrateSolution")
         # ###################################################################################
         # Matrix Integration Function
         # https://docs.scipy.org/doc/scipy/reference/generated/scipy.integrate.solve_ivp.html
         # ###################################################################################
-        # scipy.integrate.solve_ivp
-        # INPUTS:
+        # This is the same stepping loop which is inside scipy.integrate.solve_ivp
+        # INPUTS of the integrator (RK45 unless another INTEGRATOR_METHODS is selected):
         #       fun,                      Function name
-        #       t_span,                   (startTime, endTime)
+        #       t0,                       startTime
         #       y0,                       Initial values array [uArray]
-        #       method='RK45',            RK45 | RK23 | DOP853 | Radau | BDF | LSODA
-        #       t_eval=None,              times to evaluate at
-        #       dense_output=False,       continuous solution or not
-        #       events=None,              events to track
-        #       vectorized=False,         whether fun is vectorized (i.e. parallelized)
-        #       args=None,
+        #       t_bound,                  endTime
         #       first_step=None,          none means algorithm chooses
         #       max_step=inf,             default is inf
         #       rtol=1e-3, atol=1e-6      relative and absolute tolerances
-        #       jacobian,                 required for Radau, BDF and LSODA
-        #       jac_sparsity=None,        to help algorithm when it is sparse
-        #       lband=inf, uband=inf,     lower and upper bandwidth of Jacobian
-        #       min_step=0                minimum step (required for LSODA)
-        # RETURNS:
-        #       t                         time array
-        #       y                         values array
-        #       sol                       instance of ODESolution (when dense_output=True)
-        #       t_events                  array of event times
-        #       y_events                  array of values at the event_times
+        # ATTRIBUTES after each step():
+        #       t_old, t                  start and end of the step just taken
+        #       y                         values array at t
+        #       dense_output()            interpolant valid between t_old and t
+        #                                 (kept for every step in denseSolution)
         #       nfev                      number of times the rhs was evaluated
-        #       njev                      number of times the Jacobian was evaluated
-        #       nlu                       number of LU decompositions
-        #       status                    -1 integration step failure | +1 termination event | 0 Successful
-        #       message                   Human readable error message
-        #       success                   True if 0 or +1 above
+        #       status                    'running' | 'finished' | 'failed'
         # ###################################################################################
+        # The sensitivities (if any) are integrated as extra states after uArray
+        numStates = self.numMovBodiesx3 * 2
+        if len(self.sensitivityParameters) > 0:
+            solver = INTEGRATOR_METHODS[self.integratorMethod](self.AnalysisSensitivity,
+                                                               self.startTime,
+                                                               np.concatenate((self.uArray, self.sensitivityNp.reshape(-1))),
+                                                               self.simEnd,
+                                                               rtol=self.relativeTolerance,
+                                                               atol=self.absoluteTolerance)
+        else:
+            solver = INTEGRATOR_METHODS[self.integratorMethod](self.Analysis,
+                                                               self.startTime,
+                                                               self.uArray,
+                                                               self.simEnd,
+                                                               rtol=self.relativeTolerance,
+                                                               atol=self.absoluteTolerance)
+
+        timeValues = []
+        uResults = []
+        sensitivityResults = []
+        stepSizes = []
+        stepTimes = []
+        tEvalIndex = 0
+        self.solveStartTime = time.perf_counter()
+        lastReportTime = self.solveStartTime
+        lastCheckpointTime = self.solveStartTime
+        self.solveMessage = ""
+        self.eventLog = []
+        if len(self.eventList) > 0:
+            eventValuesOld = self.eventValues(self.startTime, self.uArray)
+        if self.denseSolution is None:
+            self.denseSolution = DapSolutionMod.DapDenseSolutionC(DENSE_OUTPUT_DEGREES[self.integratorMethod])
+        elif self.denseSolution.degree < DENSE_OUTPUT_DEGREES[self.integratorMethod]:
+            # Continuing with a different integrator, so keep the earlier solution and add to it
+            earlierSolution = self.denseSolution
+            self.denseSolution = DapSolutionMod.DapDenseSolutionC(DENSE_OUTPUT_DEGREES[self.integratorMethod])
+            self.denseSolution.append(earlierSolution)
+        while solver.status == "running":
+            message = solver.step()
+            if solver.status == "failed":
+                self.solveMessage = message
+                CAD.Console.PrintError("Integration failed at time " + str(solver.t) + " : " + str(message) + "\n")
+                break
+            # The contact impact state only changes between accepted steps
+            if self.contactEngine is not None:
+                self.unpackUArray(solver.y[:numStates])
+                self.updatePointPositions()
+                self.contactEngine.latchContacts(self)
+            # Keep the history of the accepted step sizes
+            stepSizes.append(solver.t - solver.t_old)
+            stepTimes.append(solver.t_old)
+            # The interpolant of the step
+            stepInterpolant = solver.dense_output()
+            # Everything except the results of the sensitivities only sees the states
+            if len(self.sensitivityParameters) > 0:
+                fullInterpolant = stepInterpolant
+                stepInterpolant = lambda tick, interpolant=fullInterpolant: interpolant(tick)[:numStates]
+            # Look for any events within this step - the step ends early at a terminal event
+            stepEnd = solver.t
+            terminalEvent = None
+            if len(self.eventList) > 0:
+                eventValuesNew = self.eventValues(solver.t, solver.y)
+                terminalEvent = self.locateEvents(stepInterpolant, solver.t_old, solver.t, eventValuesOld, eventValuesNew)
+                eventValuesOld = eventValuesNew
+                if terminalEvent is not None:
+                    stepEnd = terminalEvent["time"]
+            # The dense solution only goes as far as the step end (sampling the interpolant up to there)
+            self.denseSolution.addStep(stepInterpolant, solver.t_old, stepEnd)
+            # Interpolate the results at the reporting times which fall within this step
+            tEvalEnd = np.searchsorted(self.Tspan, stepEnd, side="right")
+            if tEvalEnd > tEvalIndex:
+                tEvalStep = self.Tspan[tEvalIndex:tEvalEnd]
+                timeValues.append(tEvalStep)
+                uResults.append(stepInterpolant(tEvalStep).T)
+                if len(self.sensitivityParameters) > 0:
+                    sensitivityResults.append(fullInterpolant(tEvalStep)[numStates:].T)
+                tEvalIndex = tEvalEnd
+            # Tell the progress queue how far we have got
+            if self.progressQueue is not None:
+                wallTime = time.perf_counter()
+                if wallTime - lastReportTime > PROGRESS_INTERVAL or solver.status != "running":
+                    self.progressQueue.put(self.progressReport(solver.t, wallTime))
+                    lastReportTime = wallTime
+            # Save a checkpoint now and then, so that a long solution can be resumed after a crash
+            wallTime = time.perf_counter()
+            if wallTime - lastCheckpointTime > CHECKPOINT_INTERVAL and solver.status == "running":
+                self.writeCheckpoint(solver.t, solver.y[:numStates],
+                                     np.concatenate([self.pendingTimeValues] + timeValues),
+                                     np.concatenate([self.pendingUResults] + uResults))
+                lastCheckpointTime = wallTime
+            # Stop at a terminal event
+            if terminalEvent is not None:
+                self.solveMessage = "Terminal event '" + terminalEvent["name"] + "' at time " + str(stepEnd)
+                DT.Mess(self.solveMessage)
+                break
+            # Stop here if a cancel has been requested, keeping what we have so far
+            if self.cancelEvent.is_set():
+                self.solveMessage = "Cancelled by the user at time " + str(solver.t)
+                DT.Mess(self.solveMessage)
+                break
+
+        self.phaseTimes["integration"] += time.perf_counter() - self.solveStartTime
+
+        # Any results from a checkpoint which have not yet been written go first
+        self.timeValues = np.concatenate([self.pendingTimeValues] + timeValues)
+        self.uResults = np.concatenate([self.pendingUResults] + uResults)
+        if len(self.sensitivityParameters) > 0:
+            self.sensitivityResults = np.concatenate(sensitivityResults).reshape((-1, numStates, len(self.sensitivityParameters)))
+        self.solveStatus = solver.status
+        # The event log ends with a terminal event only if the integration stopped there
+        if len(self.eventLog) > 0 and self.eventLog[-1]["terminal"]:
+            self.solveEndTime = self.eventLog[-1]["time"]
+            self.uFinal = self.eventLog[-1]["state"].copy()
+        else:
+            self.solveEndTime = solver.t
+            self.uFinal = solver.y[:numStates].copy()
+        self.makeIntegratorStats(solver, np.array(stepSizes), np.array(stepTimes))
+    #  -------------------------------------------------------------------------
+    def makeIntegratorStats(self, solver, stepSizes, stepTimes):
+        """Summarise the work done by the integrator and the history of its step sizes
+        The status code follows solve_ivp: -1 failed, 0 reached simEnd, 1 stopped early"""
+        if Debug:
+            DT.Mess("DapMainC-makeIntegratorStats")
+        if solver.status == "failed":
+            statusCode = -1
+        elif solver.status == "finished":
+            statusCode = 0
+        else:
+            statusCode = 1
+        # An explicit Runge-Kutta method does not count its rejected steps, but every attempt
+        # (accepted or not) costs n_stages evaluations after the two used to choose the first step
+        # plus those of the dense output, which is made once for every accepted step
+        # The implicit methods do not allow this, so their rejected steps are reported as -1
+        numAccepted = len(stepSizes)
+        if hasattr(solver, "n_stages"):
+            stepEvaluations = solver.nfev - 2 - DENSE_OUTPUT_EVALUATIONS.get(self.integratorMethod, 0) * numAccepted
+            numRejected = max(stepEvaluations // solver.n_stages - numAccepted, 0)
+        else:
+            numRejected = -1
+        stats = {"method": type(solver).__name__,
+                 "status": statusCode,
+                 "message": self.solveMessage if self.solveMessage else "The solver successfully reached the end of the integration interval.",
+                 "nfev": int(solver.nfev),
+                 "njev": int(solver.njev),
+                 "nlu": int(solver.nlu),
+                 "acceptedSteps": numAccepted,
+                 "rejectedSteps": numRejected,
+                 "endTime": float(solver.t)}
+        if statusCode == -1:
+            stats["failureTime"] = float(solver.t)
+        if numAccepted > 0:
+            stats["minStep"] = float(stepSizes.min())
+            stats["maxStep"] = float(stepSizes.max())
+            stats["meanStep"] = float(stepSizes.mean())
+            # Histogram with logarithmically spaced bins
+            counts, edges = np.histogram(np.log10(stepSizes), bins=STEP_HISTOGRAM_BINS)
+            stats["stepHistogramCounts"] = counts.tolist()
+            stats["stepHistogramEdges"] = (10.0 ** edges).tolist()
+            # The times at which the integrator had to take its smallest steps
+            smallest = np.argsort(stepSizes)[:NUM_SMALLEST_STEPS]
+            stats["smallestSteps"] = [{"time": float(stepTimes[index]), "step": float(stepSizes[index])}
+                                      for index in smallest]
+            stats["stepSizes"] = stepSizes.tolist()
+        self.integratorStats = stats
+        if Debug:
+            DT.Mess("Integrator: " + str(numAccepted) + " steps accepted, " +
+                    str(stats["rejectedSteps"]) + " rejected, " + str(stats["nfev"]) + " evaluations")
+    #  -------------------------------------------------------------------------
+    def setUpEvents(self, eventDefinitions):
+        """Set up the events to watch for while integrating, from a list of JSON strings such as
+        {"name": "Stop", "type": "bodyAngle", "body": "DapBody001", "angle": 90, "direction": 1, "terminal": true}
+        direction is +1 (rising), -1 (falling) or 0 (either), and a terminal event stops the integration
+        Lengths are in mm, angles in degrees and forces in the solver units (kg.mm/s^2)"""
+        if Debug:
+            DT.Mess("DapMainC-setUpEvents")
+        self.eventList = []
+        bodyNames = [bodyObj.Name for bodyObj in self.bodyObjList]
+        bodyLabels = [getattr(bodyObj, "Label", bodyObj.Name) for bodyObj in self.bodyObjList]
+        jointNames = [jointObj.Name for jointObj in self.jointObjList]
+        forceNames = [forceObj.Name for forceObj in self.forceObjList]
+        for eventString in eventDefinitions:
+            if eventString.strip() == "":
+                continue
+            try:
+                eventDef = json.loads(eventString)
+                eventType = eventDef["type"]
+                for parameterName in EVENT_PARAMETERS[eventType]:
+                    if parameterName not in eventDef:
+                        raise KeyError(parameterName)
+                event = {"name": eventDef.get("name", eventType),
+                         "type": eventType,
+                         "direction": int(eventDef.get("direction", 0)),
+                         "terminal": bool(eventDef.get("terminal", False))}
+                if "body" in eventDef:
+                    if eventDef["body"] in bodyNames:
+                        event["bodyIndex"] = bodyNames.index(eventDef["body"])
+                    else:
+                        event["bodyIndex"] = bodyLabels.index(eventDef["body"])
+                if eventType == "pointCrossesLine":
+                    event["pointIndex"] = self.pointDictList[event["bodyIndex"]][eventDef["point"]]
+                    event["linePointNp"] = np.array(eventDef["linePoint"], dtype=np.float64)
+                    event["lineNormalNp"] = DT.Rot90NumPy(np.array([math.cos(math.radians(eventDef["lineAngle"])),
+                                                                    math.sin(math.radians(eventDef["lineAngle"]))]))
+                elif eventType == "sliderStop":
+                    event["jointObj"] = self.jointObjList[jointNames.index(eventDef["joint"])]
+                    event["position"] = float(eventDef["position"])
+                elif eventType == "bodyAngle":
+                    event["angle"] = math.radians(eventDef["angle"])
+                elif eventType == "forceThreshold":
+                    event["forceIndex"] = forceNames.index(eventDef["force"])
+                    event["threshold"] = float(eventDef["threshold"])
+            except (ValueError, KeyError, TypeError) as e:
+                CAD.Console.PrintError("Event definition ignored: " + eventString + " [" + str(e) + "]\n")
+                continue
+            self.eventList.append(event)
+    #  -------------------------------------------------------------------------
+    def unpackUArray(self, uArray):
+        """Unpack uArray into the world coordinate and world velocity sub-arrays"""
+        index1 = 0
+        index2 = self.numMovBodiesx3
+        for bodyIndex in range(1, self.numBodies):
+            self.worldNp[bodyIndex, 0] = uArray[index1]
+            self.worldNp[bodyIndex, 1] = uArray[index1+1]
+            self.phiNp[bodyIndex] = uArray[index1+2]
+            self.worldDotNp[bodyIndex, 0] = uArray[index2]
+            self.worldDotNp[bodyIndex, 1] = uArray[index2+1]
+            self.phiDotNp[bodyIndex] = uArray[index2+2]
+            index1 += 3
+            index2 += 3
+    #  -------------------------------------------------------------------------
+    def eventValues(self, tick, uArray):
+        """Return the values of all the event functions at this time and state
+        An event occurs where its value passes through zero"""
+        self.unpackUArray(uArray)
+        self.updatePointPositions()
+        self.updatePointVelocities()
+        self.makeForceArray(tick)
+        return np.array([self.dictEventFunctions[event["type"]](event) for event in self.eventList])
+    #  -------------------------------------------------------------------------
+    def locateEvents(self, stepInterpolant, tOld, t, eventValuesOld, eventValuesNew):
+        """Find the times within the step from tOld to t at which the events occurred
+        and add them to the event log.  Return the first terminal event, or None"""
+        if Debug:
+            DT.Mess("DapMainC-locateEvents")
+        stepEvents = []
+        for eventIndex in range(len(self.eventList)):
+            event = self.eventList[eventIndex]
+            valueOld = eventValuesOld[eventIndex]
+            valueNew = eventValuesNew[eventIndex]
+            rising = valueOld < 0.0 <= valueNew
+            falling = valueOld > 0.0 >= valueNew
+            if (rising and event["direction"] >= 0) or (falling and event["direction"] <= 0):
+                eventTime = brentq(lambda tick: self.eventValues(tick, stepInterpolant(tick))[eventIndex],
+                                   tOld, t, xtol=EVENT_TIME_TOLERANCE)
+                stepEvents.append({"name": event["name"],
+                                   "type": event["type"],
+                                   "time": eventTime,
+                                   "direction": 1 if rising else -1,
+                                   "terminal": event["terminal"],
+                                   "state": stepInterpolant(eventTime)})
+        # Events are logged in time order, up to and including the first terminal one
+        stepEvents.sort(key=lambda stepEvent: stepEvent["time"])
+        for stepEvent in stepEvents:
+            self.eventLog.append(stepEvent)
+            if stepEvent["terminal"]:
+                return stepEvent
+        return None
+    #  -------------------------------------------------------------------------
+    def writeEvents(self):
+        """Write the time and the state at each event to the events file in the output directory"""
+        if Debug:
+            DT.Mess("DapMainC-writeEvents")
+        fileName = os.path.join(self.outputDirectory, EVENTS_FILE_NAME)
+        # When continuing from a checkpoint, the events are added to those of the earlier solution
+        if self.numWrittenRows > 0 and os.path.isfile(fileName):
+            EventsFILE = open(fileName, 'a')
+        else:
+            EventsFILE = open(fileName, 'w')
+            EventsFILE.write("Event Type Time Direction Terminal")
+            for bodyIndex in range(1, self.numBodies):
+                EventsFILE.write(" Body" + str(bodyIndex) + "x Body" + str(bodyIndex) + "y Body" + str(bodyIndex) + "phi")
+            for bodyIndex in range(1, self.numBodies):
+                EventsFILE.write(" Body" + str(bodyIndex) + "dx/dt Body" + str(bodyIndex) + "dy/dt Body" + str(bodyIndex) + "dphi/dt")
+            EventsFILE.write("\n")
+        for stepEvent in self.eventLog:
+            EventsFILE.write(stepEvent["name"].replace(" ", "_") + " " + stepEvent["type"] + " " +
+                             str(stepEvent["time"]) + " " + str(stepEvent["direction"]) + " " +
+                             str(stepEvent["terminal"]) + " " + " ".join(str(value) for value in stepEvent["state"]) + "\n")
+        EventsFILE.close()
+    #  -------------------------------------------------------------------------
+    def setUpSensitivities(self, parameterNames):
+        """Set up the parameters, given as '<object name>.<property name>' (see setParameter), whose
+        sensitivities d(uArray)/d(parameter) are integrated alongside the states
+        The sensitivities start at zero, i.e. the initial conditions are taken as independent of the parameters
+        Returns False if any of the parameters is unknown"""
+        if Debug:
+            DT.Mess("DapMainC-setUpSensitivities")
+        self.sensitivityParameters = []
+        self.sensitivityPerturbations = []
+        for parameterName in parameterNames:
+            value = self.getParameter(parameterName)
+            if value is None:
+                CAD.Console.PrintError("Unknown sensitivity parameter - ignored: " + parameterName + "\n")
+                continue
+            step = SENSITIVITY_RELATIVE_STEP * max(1.0, abs(value))
+            edits = self.sensitivityEdits(parameterName, value + step)
+            if edits is None:
+                CAD.Console.PrintError("No sensitivity can be found for this parameter - ignored: " + parameterName + "\n")
+                continue
+            self.sensitivityParameters.append(parameterName)
+            self.sensitivityPerturbations.append((step, edits))
+        self.sensitivityNp = np.zeros((self.numMovBodiesx3 * 2, len(self.sensitivityParameters)), dtype=np.float64)
+        return len(self.sensitivityParameters) == len(parameterNames)
+    #  -------------------------------------------------------------------------
+    def writeSensitivities(self):
+        """Save the sensitivities at the reporting times, as an array (time, state, parameter)
+        together with the times and the parameter names"""
+        if Debug:
+            DT.Mess("DapMainC-writeSensitivities")
+        np.savez(os.path.join(self.outputDirectory, SENSITIVITY_FILE_NAME),
+                 timeValues=self.timeValues,
+                 parameters=np.array(self.sensitivityParameters),
+                 sensitivities=self.sensitivityResults)
+    #  -------------------------------------------------------------------------
+    def progressReport(self, tick, wallTime):
+        """Return a dictionary summarising how far the integration has progressed"""
+        fraction = min(tick / self.simEnd, 1.0) if self.simEnd > 0.0 else 1.0
+        elapsed = wallTime - self.solveStartTime
+        if fraction > 0.0:
+            remaining = elapsed * (1.0 - fraction) / fraction
+        else:
+            remaining = -1.0
+        return {"time": tick,
+                "fraction": fraction,
+                "evaluations": self.Counter,
+                "elapsed": elapsed,
+                "remaining": remaining}
+    #  -------------------------------------------------------------------------
+    def cancelSolution(self):
+        """Ask the integration to stop at the end of its current step"""
+        if Debug:
+            DT.Mess("DapMainC-cancelSolution")
+        self.cancelEvent.set()
+    #  -------------------------------------------------------------------------
+    def backgroundSolve(self):
+        """Integrate and write the results files - this is the target of the background solve thread
+        It does not touch the FreeCAD document; updateSolverObject must be called on the GUI thread"""
+        if Debug:
+            DT.Mess("DapMainC-backgroundSolve")
+        self.backgroundError = ""
+        try:
+            self.integrateSolution()
+            self.writeResults()
+        except Exception as e:
+            self.backgroundError = str(e)
+    #  -------------------------------------------------------------------------
+    def writeResults(self):
+        """Write the animation file and (if requested) the full results file"""
+        if Debug:
+            DT.Mess("DapMainC-writeResults")
+        startTime = time.perf_counter()
+        self.writeAnimationFile()
+
+        if self.outputFileName != "-" and len(self.timeValues) > 0:
+            self.outputResults(self.timeValues, self.uResults)
+        if len(self.eventList) > 0:
+            self.writeEvents()
+        if len(self.sensitivityParameters) > 0:
+            self.writeSensitivities()
+        self.numWrittenRows += len(self.timeValues)
+        if len(self.timeValues) > 0:
+            self.lastReportedTime = self.timeValues[-1]
+        self.phaseTimes["output"] += time.perf_counter() - startTime
+
+        self.writeSolveStats()
+
+        # The dense solution, from which the states can be found at any time
+        if self.denseSolution is not None and self.denseSolution.numSteps() > 0:
+            self.denseSolution.saveToFile(os.path.join(self.outputDirectory, DapSolutionMod.SOLUTION_FILE_NAME))
 
-        # Solve the equations: <analysis function> (<start time>, <end time>) <pos & vel array> <times at which to evaluate>
-        solution = solve_ivp(self.Analysis,
-                             (0.0, self.simEnd),
-                             uArray,
-                             t_eval=self.Tspan,
-                             rtol=self.relativeTolerance,
-                             atol=self.absoluteTolerance)
-
-        # Output the positions/angles results file
-        self.PosFILE = open(os.path.join(self.solverObj.Directory, "DapAnimation.csv"), 'w')
-        Sol = solution.y.T
-        for tick in range(len(solution.t)):
-            self.PosFILE.write(str(solution.t[tick])+" ")
+        # The final state is where the solution carries on from if it is continued later
+        if self.solveStatus != "failed":
+            self.pendingTimeValues = self.timeValues[:0]
+            self.pendingUResults = self.uResults[:0]
+            self.writeCheckpoint(self.solveEndTime, self.uFinal, self.pendingTimeValues, self.pendingUResults)
+    #  -------------------------------------------------------------------------
+    def writeAnimationFile(self):
+        """Write the positions/angles at each of the timeValues to the animation file
+        (adding to the earlier one when continuing from a checkpoint)"""
+        if Debug:
+            DT.Mess("DapMainC-writeAnimationFile")
+        self.PosFILE = open(os.path.join(self.outputDirectory, "DapAnimation.csv"), 'a' if self.numWrittenRows > 0 else 'w')
+        for tick in range(len(self.timeValues)):
+            self.PosFILE.write(str(self.timeValues[tick])+" ")
             for body in range(self.numBodies-1):
-                self.PosFILE.write(str(Sol[tick, body * 3]) + " ")
-                self.PosFILE.write(str(Sol[tick, body * 3 + 1]) + " ")
-                self.PosFILE.write(str(Sol[tick, body * 3 + 2]) + " ")
+                self.PosFILE.write(str(self.uResults[tick, body * 3]) + " ")
+                self.PosFILE.write(str(self.uResults[tick, body * 3 + 1]) + " ")
+                self.PosFILE.write(str(self.uResults[tick, body * 3 + 2]) + " ")
             self.PosFILE.write("\n")
         self.PosFILE.close()
-
-        # Save the most important stuff into the solver object
+    #  -------------------------------------------------------------------------
+    def solveStats(self):
+        """Return a dictionary of the statistics of the solution"""
+        return {"evaluations": self.Counter,
+                "profile": self.phaseTimes,
+                "integrator": self.integratorStats,
+                "events": [{"name": stepEvent["name"], "time": stepEvent["time"]} for stepEvent in self.eventLog]}
+    #  -------------------------------------------------------------------------
+    def writeSolveStats(self):
+        """Write the statistics of the solution to a JSON sidecar file in the output directory"""
+        if Debug:
+            DT.Mess("DapMainC-writeSolveStats")
+        with open(os.path.join(self.outputDirectory, SOLVE_STATS_FILE_NAME), "w") as statsFILE:
+            json.dump(self.solveStats(), statsFILE, indent=1)
+    #  -------------------------------------------------------------------------
+    def updateSolverObject(self):
+        """Save the most important stuff into the solver object"""
+        if Debug:
+            DT.Mess("DapMainC-updateSolverObject")
+        if self.solverObj is None:
+            return
+        # The time spent in each phase [s] (a PropertyMap only holds strings)
+        self.solverObj.SolveProfile = {phase: "{:.6f}".format(self.phaseTimes[phase]) for phase in self.phaseTimes}
+        # The integrator statistics, without the full step size history which is in the JSON file
+        # These are kept even when the solution failed, since that is when they are most needed
+        self.solverObj.IntegratorStats = {key: str(self.integratorStats[key]) for key in self.integratorStats
+                                          if key != "stepSizes"}
+        if len(self.timeValues) == 0:
+            return
         BodyNames = []
         BodyCoG = []
         for bodyIndex in range(1, len(self.bodyObjList)):
@@ -832,11 +2016,325 @@ class DapMainC:
         self.solverObj.BodyNames = BodyNames
         self.solverObj.BodyCoG = BodyCoG
         self.solverObj.DeltaTime = self.simDelta
+        if len(self.maxConstraintViolations) > 0:
+            self.solverObj.MaxConstraintViolations = self.maxConstraintViolations
         # Flag that the results are valid
         self.solverObj.DapResultsValid = True
+    #  -------------------------------------------------------------------------
+    def StaticSolve(self, tick=0.0):
+        """Find the rest position of the mechanism at time tick instead of integrating to it
+        and write it as a single-state result, together with the joint reactions
+        Returns False if no equilibrium was found"""
+        if Debug:
+            DT.Mess("DapMainC-StaticSolve")
+        self.solveStartTime = time.perf_counter()
+        self.eventLog = []
+        converged = self.solveStaticEquilibrium(tick)
+        self.phaseTimes["staticEquilibrium"] += time.perf_counter() - self.solveStartTime
 
-        if self.solverObj.FileName != "-":
-            self.outputResults(solution.t, solution.y.T)
+        # The single state is written exactly as one reporting time of a dynamic solution
+        self.uFinal = np.zeros((self.numMovBodiesx3 * 2,), dtype=np.float64)
+        self.uFinal[:self.numMovBodiesx3] = np.column_stack((self.worldNp[1:], self.phiNp[1:])).reshape(-1)
+        self.uArray = self.uFinal.copy()
+        self.timeValues = np.array([tick], dtype=np.float64)
+        self.uResults = self.uFinal[np.newaxis, :].copy()
+        self.solveEndTime = tick
+        if converged:
+            self.solveStatus = "finished"
+            self.solveMessage = "Static equilibrium found"
+        else:
+            self.solveStatus = "failed"
+            self.solveMessage = "No static equilibrium found"
+        self.writeStaticReactions()
+        self.writeResults()
+        self.updateSolverObject()
+        return converged
+    #  -------------------------------------------------------------------------
+    def solveStaticEquilibrium(self, tick):
+        """Newton-Raphson solution of   forceArray + Jacobian^T lambda = 0   and   constraints = 0
+        for the body coordinates and the Lagrange multipliers, with all the velocities zero
+        The tangent matrix is the analytic stiffness of the force elements plus the change of
+        Jacobian^T lambda with the coordinates (found by differencing the Jacobian)
+        Returns False if it does not converge"""
+        if Debug:
+            DT.Mess("DapMainC-solveStaticEquilibrium")
+        n3 = self.numMovBodiesx3
+        numUnknowns = n3 + self.numConstraints
+        self.worldDotNp[:] = 0.0
+        self.phiDotNp[:] = 0.0
+        qNp = np.column_stack((self.worldNp[1:], self.phiNp[1:])).reshape(-1).copy()
+        lambdaNp = np.zeros((self.numConstraints,), dtype=np.float64)
+        residualNp, Jacobian = self.staticResidual(tick, qNp, lambdaNp)
+        # Start from the multipliers which best balance the applied forces where we are
+        if self.numConstraints > 0:
+            lambdaNp = np.linalg.lstsq(Jacobian.T, -self.forceArrayNp, rcond=None)[0]
+            residualNp, Jacobian = self.staticResidual(tick, qNp, lambdaNp)
+        forceScale = max(1.0, np.linalg.norm(self.forceArrayNp))
+
+        self.staticStats = {"method": "Static", "converged": False, "iterations": 0}
+        self.integratorStats = self.staticStats
+        damping = 0.0
+        for iteration in range(STATIC_MAX_ITERATIONS + 1):
+            forceResidual = np.linalg.norm(residualNp[:n3])
+            constraintResidual = np.linalg.norm(residualNp[n3:]) if self.numConstraints > 0 else 0.0
+            self.staticStats.update({"iterations": iteration,
+                                     "forceResidual": forceResidual,
+                                     "constraintResidual": constraintResidual})
+            if forceResidual < STATIC_FORCE_TOLERANCE * forceScale and constraintResidual < STATIC_CONSTRAINT_TOLERANCE:
+                self.staticStats["converged"] = True
+                break
+            if iteration == STATIC_MAX_ITERATIONS:
+                break
+
+            # The tangent matrix of the equilibrium equations
+            # [ -K + d(J^T lambda)/dq    J^T ]
+            # [          J                0  ]
+            tangentNp = np.zeros((numUnknowns, numUnknowns), dtype=np.float64)
+            tangentNp[:n3, :n3] = -self.stiffnessMatrix()
+            if self.numConstraints > 0:
+                tangentNp[:n3, :n3] += self.constraintStiffness(qNp, lambdaNp, Jacobian)
+                tangentNp[:n3, n3:] = Jacobian.T
+                tangentNp[n3:, :n3] = Jacobian
+            dampingScale = np.abs(np.diag(tangentNp[:n3, :n3])).max(initial=1.0)
+
+            # Halve the step until it reduces the residual - if no halving does, the step is rejected
+            # and the tangent matrix is damped (which turns the step towards the out-of-balance forces)
+            residualNorm = np.linalg.norm(residualNp)
+            accepted = False
+            while not accepted and damping <= STATIC_MAX_DAMPING:
+                dampedTangentNp = tangentNp.copy()
+                dampedTangentNp[np.arange(n3), np.arange(n3)] -= damping * dampingScale
+                try:
+                    deltaNp = np.linalg.solve(dampedTangentNp, -residualNp)
+                except np.linalg.LinAlgError:
+                    deltaNp = None
+                if deltaNp is not None:
+                    # A nearly singular tangent matrix can give a huge step, so the rotations are limited
+                    largestRotation = np.abs(deltaNp[2:n3:3]).max(initial=0.0)
+                    if largestRotation > STATIC_MAX_ROTATION:
+                        deltaNp *= STATIC_MAX_ROTATION / largestRotation
+                    stepFraction = 1.0
+                    for halving in range(STATIC_MAX_HALVINGS):
+                        newQNp = qNp + stepFraction * deltaNp[:n3]
+                        newLambdaNp = lambdaNp + stepFraction * deltaNp[n3:]
+                        newResidualNp, newJacobian = self.staticResidual(tick, newQNp, newLambdaNp)
+                        if np.linalg.norm(newResidualNp) < residualNorm:
+                            accepted = True
+                            break
+                        stepFraction *= 0.5
+                if not accepted:
+                    damping = STATIC_INITIAL_DAMPING if damping == 0.0 else damping * 10.0
+            if not accepted:
+                # Leave the bodies where the last accepted step put them
+                self.staticResidual(tick, qNp, lambdaNp)
+                CAD.Console.PrintError("Static equilibrium: no step reduces the out-of-balance forces - "
+                                       "the mechanism may not be held in every direction\n")
+                self.staticStats["stalled"] = True
+                break
+            # The damping is relaxed again after every accepted step
+            damping = 0.0 if damping <= STATIC_INITIAL_DAMPING else damping / 10.0
+            qNp, lambdaNp, residualNp, Jacobian = newQNp, newLambdaNp, newResidualNp, newJacobian
+            if Debug:
+                DT.Mess("Static iteration " + str(iteration) + " force residual: " + str(forceResidual) +
+                        " constraint residual: " + str(constraintResidual) + " step: " + str(stepFraction) +
+                        " damping: " + str(damping))
+
+        self.staticLambdaNp = lambdaNp
+        self.staticStats["forceScale"] = forceScale
+        if self.staticStats["converged"] is False:
+            if "stalled" not in self.staticStats:
+                CAD.Console.PrintError("Static equilibrium not found in " + str(STATIC_MAX_ITERATIONS) + " iterations\n")
+            return False
+        return True
+    #  -------------------------------------------------------------------------
+    def staticResidual(self, tick, qNp, lambdaNp):
+        """Move the bodies to the coordinates qNp (at rest) and return the residual of the
+        static equilibrium equations there, together with the Jacobian"""
+        self.unpackUArray(np.concatenate((qNp, np.zeros_like(qNp))))
+        self.updatePointPositions()
+        self.updatePointVelocities()
+        self.makeForceArray(tick)
+        if self.numConstraints == 0:
+            return self.forceArrayNp.copy(), None
+        Jacobian = self.GetJacobianF()
+        return np.concatenate((self.forceArrayNp + Jacobian.T @ lambdaNp, self.GetconstraintsF(tick))), Jacobian
+    #  -------------------------------------------------------------------------
+    def constraintStiffness(self, qNp, lambdaNp, Jacobian):
+        """Return d(Jacobian^T lambda)/dq at the coordinates qNp by forward differences of the Jacobian
+        The bodies are left at qNp"""
+        if Debug:
+            DT.Mess("DapMainC-constraintStiffness")
+        zerosNp = np.zeros_like(qNp)
+        reactionNp = Jacobian.T @ lambdaNp
+        resultNp = np.zeros((len(qNp), len(qNp)), dtype=np.float64)
+        for column in range(len(qNp)):
+            step = STATIC_DIFFERENCE_STEP * max(1.0, abs(qNp[column]))
+            shiftedNp = qNp.copy()
+            shiftedNp[column] += step
+            self.unpackUArray(np.concatenate((shiftedNp, zerosNp)))
+            self.updatePointPositions()
+            resultNp[:, column] = (self.GetJacobianF().T @ lambdaNp - reactionNp) / step
+        self.unpackUArray(np.concatenate((qNp, zerosNp)))
+        self.updatePointPositions()
+        return resultNp
+    #  -------------------------------------------------------------------------
+    def writeStaticReactions(self):
+        """Write the force and moment (about the CoG) which each joint exerts on its two bodies
+        at the static equilibrium, in N and Nm"""
+        if Debug:
+            DT.Mess("DapMainC-writeStaticReactions")
+        with open(os.path.join(self.outputDirectory, STATIC_REACTIONS_FILE_NAME), "w") as ReactionsFILE:
+            ReactionsFILE.write("Joint BodyI Fx(N) Fy(N) M(Nm) BodyJ Fx(N) Fy(N) M(Nm)\n")
+            for jointObj in self.jointObjList:
+                lambdaNp = self.staticLambdaNp[jointObj.rowStart: jointObj.rowEnd]
+                JacobianHead, JacobianTail = self.dictJacobianFunctions[jointObj.JointType](jointObj)
+                ReactionsFILE.write(jointObj.Label.replace(" ", "_"))
+                for bodyIndex, JacobianBody in [(jointObj.body_I_Index, JacobianHead), (jointObj.body_J_Index, JacobianTail)]:
+                    reactionNp = JacobianBody.T @ lambdaNp
+                    ReactionsFILE.write(" " + self.bodyObjList[bodyIndex].Label.replace(" ", "_") + " " +
+                                        str(reactionNp[0] * 1e-3) + " " + str(reactionNp[1] * 1e-3) + " " +
+                                        str(reactionNp[2] * 1e-6))
+                ReactionsFILE.write("\n")
+    #  -------------------------------------------------------------------------
+    def ModalSolve(self, modalState="Initial", tick=0.0, animateMode=0, modeAmplitude=10.0):
+        """Linearise the equations of motion about an operating point and find the natural frequencies,
+        damping ratios and mode shapes.  The operating point (modalState) is one of:
+            "Initial"             the initial conditions (corrected as for a dynamic solution)
+            "Static Equilibrium"  the rest position at time tick
+            "Result"              the state at time tick of the previous dynamic solution
+        If animateMode is a mode number (1 = lowest), the animation file shows that mode
+        with a largest displacement of modeAmplitude, otherwise the operating point
+        Returns False if there is no operating point"""
+        if Debug:
+            DT.Mess("DapMainC-ModalSolve")
+        self.solveStartTime = time.perf_counter()
+        self.eventLog = []
+        self.integratorStats = {"method": "Modal", "operatingPoint": modalState, "time": tick}
+        if modalState == "Static Equilibrium":
+            if self.solveStaticEquilibrium(tick) is False:
+                return False
+            uArray = np.zeros((self.numMovBodiesx3 * 2,), dtype=np.float64)
+            uArray[:self.numMovBodiesx3] = np.column_stack((self.worldNp[1:], self.phiNp[1:])).reshape(-1)
+            self.integratorStats = {"method": "Modal", "operatingPoint": modalState, "time": tick}
+        elif modalState == "Result":
+            solutionFileName = os.path.join(self.outputDirectory, DapSolutionMod.SOLUTION_FILE_NAME)
+            if not os.path.isfile(solutionFileName):
+                CAD.Console.PrintError("There is no dynamic solution in " + self.outputDirectory + " to take the state from\n")
+                return False
+            denseSolution = DapSolutionMod.DapDenseSolutionC()
+            denseSolution.loadFromFile(solutionFileName)
+            uArray = denseSolution.sample(tick)
+        else:
+            if self.prepareSolution() is False:
+                return False
+            tick = 0.0
+            uArray = self.uArray
+
+        frequenciesNp, dampingRatiosNp, shapesNp = self.modalAnalysis(tick, uArray)
+        self.modeFrequenciesNp = frequenciesNp
+        self.modeDampingRatiosNp = dampingRatiosNp
+        self.modeShapesNp = shapesNp
+        self.integratorStats["modes"] = len(frequenciesNp)
+        self.phaseTimes["modal"] += time.perf_counter() - self.solveStartTime
+        self.writeModes()
+
+        # The animation shows one period of the selected mode, or else just the operating point
+        if 0 < animateMode <= len(frequenciesNp):
+            frequency = frequenciesNp[animateMode - 1]
+            period = 1.0 / frequency if frequency > 0.0 else 1.0
+            fractionNp = np.arange(MODE_ANIMATION_FRAMES + 1) / MODE_ANIMATION_FRAMES
+            self.timeValues = tick + fractionNp * period
+            self.uResults = np.tile(uArray, (len(fractionNp), 1))
+            self.uResults[:, :self.numMovBodiesx3] += modeAmplitude * np.outer(np.sin(2.0 * np.pi * fractionNp),
+                                                                                shapesNp[animateMode - 1])
+        else:
+            self.timeValues = np.array([tick], dtype=np.float64)
+            self.uResults = uArray[np.newaxis, :].copy()
+        self.solveStatus = "finished"
+        self.solveEndTime = tick
+        self.solveMessage = str(len(frequenciesNp)) + " modes found"
+        self.writeAnimationFile()
+        self.writeSolveStats()
+        self.updateSolverObject()
+        if self.solverObj is not None:
+            self.solverObj.ModeFrequencies = [float(frequency) for frequency in frequenciesNp]
+            self.solverObj.ModeDampingRatios = [float(ratio) for ratio in dampingRatiosNp]
+        return True
+    #  -------------------------------------------------------------------------
+    def modalAnalysis(self, tick, uArray):
+        """Linearise about the state uArray at time tick and return the undamped natural frequencies [Hz],
+        the damping ratios and the mode shapes (one row of body coordinates per mode, largest value one)
+        The oscillating modes come first, sorted from the lowest frequency up, followed by the motions
+        which do not oscillate (rigid body or overdamped), with frequency zero and damping ratio NaN
+        The linearised equations  M q'' + C q' + K q = J^T lambda  are projected onto the independent
+        coordinates with a null-space basis N of the Jacobian (so that J N = 0 and lambda drops out)"""
+        if Debug:
+            DT.Mess("DapMainC-modalAnalysis")
+        # Analysis leaves the positions, forces and Lagrange multipliers at the operating point
+        self.Analysis(tick, uArray)
+        n3 = self.numMovBodiesx3
+        qNp = uArray[:n3].copy()
+        stiffnessNp = self.stiffnessMatrix()
+        dampingNp = self.dampingMatrix()
+        if self.numConstraints > 0:
+            Jacobian = self.GetJacobianF()
+            stiffnessNp -= self.constraintStiffness(qNp, self.Lambda, Jacobian)
+            singularValuesNp, rightVectorsNp = np.linalg.svd(Jacobian)[1:]
+            rank = int(np.sum(singularValuesNp > MODAL_RANK_TOLERANCE * singularValuesNp[0]))
+            nullSpaceNp = rightVectorsNp[rank:].T
+        else:
+            nullSpaceNp = np.eye(n3)
+        numDoF = nullSpaceNp.shape[1]
+        if numDoF == 0:
+            CAD.Console.PrintError("The mechanism has no degrees of freedom - there are no modes\n")
+            return np.zeros((0,)), np.zeros((0,)), np.zeros((0, n3))
+
+        # The reduced matrices, and the first order (state space) form of the reduced equations
+        massReducedNp = nullSpaceNp.T @ (self.massArrayNp[:, np.newaxis] * nullSpaceNp)
+        stiffnessReducedNp = nullSpaceNp.T @ stiffnessNp @ nullSpaceNp
+        dampingReducedNp = nullSpaceNp.T @ dampingNp @ nullSpaceNp
+        stateMatrixNp = np.zeros((2 * numDoF, 2 * numDoF), dtype=np.float64)
+        stateMatrixNp[:numDoF, numDoF:] = np.eye(numDoF)
+        stateMatrixNp[numDoF:, :numDoF] = -np.linalg.solve(massReducedNp, stiffnessReducedNp)
+        stateMatrixNp[numDoF:, numDoF:] = -np.linalg.solve(massReducedNp, dampingReducedNp)
+        eigenValuesNp, eigenVectorsNp = np.linalg.eig(stateMatrixNp)
+
+        # The eigenvalues of an oscillating mode come in conjugate pairs, of which only one is kept
+        # Each real eigenvalue is a motion which does not oscillate, and is kept on its own
+        realNp = np.abs(eigenValuesNp.imag) <= MODAL_REAL_TOLERANCE * np.maximum(np.abs(eigenValuesNp), 1.0)
+        oscillatingNp = ~realNp & (eigenValuesNp.imag > 0.0)
+        oscillatingOrderNp = np.flatnonzero(oscillatingNp)[np.argsort(np.abs(eigenValuesNp[oscillatingNp]))]
+        realOrderNp = np.flatnonzero(realNp)[np.argsort(np.abs(eigenValuesNp[realNp]))]
+        orderNp = np.concatenate((oscillatingOrderNp, realOrderNp))
+        numOscillating = len(oscillatingOrderNp)
+        eigenValuesNp = eigenValuesNp[orderNp]
+        eigenVectorsNp = eigenVectorsNp[:numDoF, orderNp]
+
+        omegaNp = np.abs(eigenValuesNp[:numOscillating])
+        frequenciesNp = np.zeros((len(orderNp),), dtype=np.float64)
+        frequenciesNp[:numOscillating] = omegaNp / (2.0 * np.pi)
+        dampingRatiosNp = np.full((len(orderNp),), np.nan)
+        dampingRatiosNp[:numOscillating] = -eigenValuesNp.real[:numOscillating] / omegaNp
+        # Turn each complex shape so that its largest component is real, and scale that to one
+        shapesNp = (nullSpaceNp @ eigenVectorsNp).T
+        largestNp = shapesNp[np.arange(len(shapesNp)), np.argmax(np.abs(shapesNp), axis=1)]
+        shapesNp = (shapesNp / largestNp[:, np.newaxis]).real
+        return frequenciesNp, dampingRatiosNp, shapesNp
+    #  -------------------------------------------------------------------------
+    def writeModes(self):
+        """Write the natural frequencies, damping ratios and mode shapes to the modes file
+        The motions which do not oscillate have frequency 0 and damping ratio nan"""
+        if Debug:
+            DT.Mess("DapMainC-writeModes")
+        with open(os.path.join(self.outputDirectory, MODES_FILE_NAME), "w") as ModesFILE:
+            ModesFILE.write("Mode Frequency(Hz) DampingRatio")
+            for bodyIndex in range(1, self.numBodies):
+                ModesFILE.write(" Body" + str(bodyIndex) + "x Body" + str(bodyIndex) + "y Body" + str(bodyIndex) + "phi")
+            ModesFILE.write("\n")
+            for modeIndex in range(len(self.modeFrequenciesNp)):
+                ModesFILE.write(str(modeIndex + 1) + " " + str(self.modeFrequenciesNp[modeIndex]) + " " +
+                                str(self.modeDampingRatiosNp[modeIndex]) + " " +
+                                " ".join(str(value) for value in self.modeShapesNp[modeIndex]) + "\n")
     ##########################################
     #   This is the end of the actual solution
     #    The rest are all called subroutines
@@ -849,38 +2347,41 @@ class DapMainC:
             DT.Mess("Input to 'Analysis'")
             DT.Np1D(True, uArray)
 
+        phaseTimes = self.phaseTimes
+        clock0 = time.perf_counter()
         # Unpack uArray into world coordinate and world velocity sub-arrays
-        index1 = 0
-        index2 = self.numMovBodiesx3
-        for bodyIndex in range(1, self.numBodies):
-            self.worldNp[bodyIndex, 0] = uArray[index1]
-            self.worldNp[bodyIndex, 1] = uArray[index1+1]
-            self.phiNp[bodyIndex] = uArray[index1+2]
-            self.worldDotNp[bodyIndex, 0] = uArray[index2]
-            self.worldDotNp[bodyIndex, 1] = uArray[index2+1]
-            self.phiDotNp[bodyIndex] = uArray[index2+2]
-            index1 += 3
-            index2 += 3
+        self.unpackUArray(uArray)
         if Debug:
             DT.Np2D(self.worldNp)
             DT.Np1Ddeg(True, self.phiNp)
             DT.Np2D(self.worldDotNp)
             DT.Np1Ddeg(True, self.phiDotNp)
 
+        clock1 = time.perf_counter()
+        phaseTimes["unpack"] += clock1 - clock0
+
         # Update the point stuff accordingly
         self.updatePointPositions()
+        clock0 = time.perf_counter()
+        phaseTimes["updatePointPositions"] += clock0 - clock1
         self.updatePointVelocities()
+        clock1 = time.perf_counter()
+        phaseTimes["updatePointVelocities"] += clock1 - clock0
 
         # array of applied forces
-        self.makeForceArray()
+        self.makeForceArray(tick)
+        clock0 = time.perf_counter()
+        phaseTimes["makeForceArray"] += clock0 - clock1
         # find the accelerations ( a = F / m )
-        accel = []
         if self.numConstraints == 0:
-            for index in range(self.numMovBodiesx3):
-                accel.append = self.massInvArray[index] * self.forceArrayNp[index]
+            accel = self.forceArrayNp / self.massArrayNp
         # We go through this if we have any constraints
         else:
             Jacobian = self.GetJacobianF()
+            clock1 = time.perf_counter()
+            phaseTimes["GetJacobianF"] += clock1 - clock0
+            # The linear solve phase includes assembling the matrix (but not RHSAcc)
+            clock0 = clock1
             if Debug:
                 DT.Mess("Jacobian")
                 DT.Np2D(Jacobian)
@@ -899,7 +2400,11 @@ class DapMainC:
                 DT.Np2D(JacMasJac)
 
             # get r-h-s of acceleration constraints at this time
+            clockRHS = time.perf_counter()
             rhsAccel = self.RHSAcc(tick)
+            clockRHS = time.perf_counter() - clockRHS
+            phaseTimes["RHSAcc"] += clockRHS
+            clock0 += clockRHS
             if Debug:
                 DT.Mess("rhsAccel")
                 DT.Np1D(True, rhsAccel)
@@ -911,7 +2416,12 @@ class DapMainC:
                 DT.Mess("rhs")
                 DT.Np1D(True, rhs)
             # Solve the JacMasJac augmented with the rhs
-            solvedVector = np.linalg.solve(JacMasJac, rhs)
+            # keeping its factorisation for the sensitivity equations if there are any
+            if len(self.sensitivityParameters) > 0:
+                self.JacMasJacLU = lu_factor(JacMasJac)
+                solvedVector = lu_solve(self.JacMasJacLU, rhs)
+            else:
+                solvedVector = np.linalg.solve(JacMasJac, rhs)
             # First half of solution are the acceleration values
             accel = solvedVector[: self.numMovBodiesx3]
             # Second half is Lambda which is reported in the output results routine
@@ -919,9 +2429,11 @@ class DapMainC:
             if Debug:
                 DT.MessNoLF("Accelerations: ")
                 DT.Np1D(True, accel)
-            if True:
+            if Debug:
                 DT.MessNoLF("Lambda: ")
                 DT.Np1D(True, self.Lambda)
+        clock1 = time.perf_counter()
+        phaseTimes["linearSolve"] += clock1 - clock0
 
         # Transfer the accelerations back into the worldDotDot/phiDotDot and uDot/uDotDot Arrays
         for bodyIndex in range(1, self.numBodies):
@@ -932,17 +2444,505 @@ class DapMainC:
         index1 = 0
         index2 = self.numMovBodiesx3
         for bodyIndex in range(1, self.numBodies):
-            uDotArray[index1:index1+2] = self.worldDotNp[bodyIndex]
-            uDotArray[index1+2] = self.phiDotNp[bodyIndex]
-            uDotArray[index2:index2+2] = self.worldDotDotNp[bodyIndex]
-            uDotArray[index2+2] = self.phiDotDotNp[bodyIndex]
-            index1 += 3
-            index2 += 3
+            uDotArray[index1:index1+2] = self.worldDotNp[bodyIndex]
+            uDotArray[index1+2] = self.phiDotNp[bodyIndex]
+            uDotArray[index2:index2+2] = self.worldDotDotNp[bodyIndex]
+            uDotArray[index2+2] = self.phiDotDotNp[bodyIndex]
+            index1 += 3
+            index2 += 3
+        phaseTimes["pack"] += time.perf_counter() - clock1
+
+        # Increment number of function evaluations
+        self.Counter += 1
+
+        return uDotArray
+    #  -------------------------------------------------------------------------
+    def AnalysisSensitivity(self, tick, yArray):
+        """The Analysis function for the states followed by their sensitivities to the sensitivityParameters
+        yArray holds uArray and then the sensitivities S = d(uArray)/d(parameter) (one column per parameter)
+        The sensitivity of the accelerations follows from differentiating
+            [ M  -J^T ] [ accel  ]   [ forces ]
+            [ J    0  ] [ lambda ] = [ gamma  ]
+        with the same matrix as in Analysis (whose factorisation is reused) and a right-hand side which is
+        the change of the residual of these equations in the direction of S and the parameter"""
+        if Debug:
+            DT.Mess("DapMainC-AnalysisSensitivity")
+        numStates = self.numMovBodiesx3 * 2
+        uArray = yArray[:numStates]
+        sensitivityNp = yArray[numStates:].reshape((numStates, len(self.sensitivityParameters)))
+        uDotArray = self.Analysis(tick, uArray)
+        accelNp = uDotArray[self.numMovBodiesx3:]
+        lambdaNp = self.Lambda if self.numConstraints > 0 else None
+        sensitivityDotNp = np.zeros_like(sensitivityNp)
+
+        baseResidualNp = self.dynamicResidual(tick, uArray, accelNp, lambdaNp)
+        for parameterIndex in range(len(self.sensitivityParameters)):
+            # Only the parameter entries of the model arrays are changed, and changed back
+            step, edits = self.sensitivityPerturbations[parameterIndex]
+            self.applySensitivityEdits(edits, True)
+            residualNp = self.dynamicResidual(tick, uArray + step * sensitivityNp[:, parameterIndex], accelNp, lambdaNp)
+            self.applySensitivityEdits(edits, False)
+            deltaResidualNp = (residualNp - baseResidualNp) / step
+            if self.numConstraints > 0:
+                deltaAccelNp = lu_solve(self.JacMasJacLU, deltaResidualNp)[:self.numMovBodiesx3]
+            else:
+                deltaAccelNp = deltaResidualNp / self.massArrayNp
+            # The sensitivity of the positions changes with that of the velocities
+            sensitivityDotNp[:self.numMovBodiesx3, parameterIndex] = sensitivityNp[self.numMovBodiesx3:, parameterIndex]
+            sensitivityDotNp[self.numMovBodiesx3:, parameterIndex] = deltaAccelNp
+
+        return np.concatenate((uDotArray, sensitivityDotNp.reshape(-1)))
+    #  -------------------------------------------------------------------------
+    def sensitivityEdits(self, parameterName, value):
+        """Return the edits of the model arrays which change a parameter to value, as a list of
+        (owner, attribute name, index or None, value now, changed value), or None if there are none
+        Unlike setParameter nothing is rebuilt, so the edits can be applied and undone within Analysis"""
+        if Debug:
+            DT.Mess("DapMainC-sensitivityEdits")
+        objectName, propertyName = parameterName.split(".", 1)
+
+        for bodyIndex in range(1, self.numBodies):
+            if self.bodyObjList[bodyIndex].Name == objectName:
+                row = (bodyIndex-1)*3
+                if propertyName == "Mass":
+                    weightNp = self.gravityNp * value
+                    deltaWeightNp = self.gravityCountNp[0] * (weightNp - self.WeightNp[bodyIndex])
+                    return [(self, "MassNp", bodyIndex, self.MassNp[bodyIndex], value),
+                            (self, "WeightNp", bodyIndex, self.WeightNp[bodyIndex].copy(), weightNp),
+                            (self, "constantForcesNp", bodyIndex, self.constantForcesNp[bodyIndex].copy(),
+                             self.constantForcesNp[bodyIndex] + deltaWeightNp),
+                            (self, "massArrayNp", slice(row, row+2), self.massArrayNp[row:row+2].copy(), value)]
+                if propertyName == "momentInertia":
+                    return [(self, "momentInertiaNp", bodyIndex, self.momentInertiaNp[bodyIndex], value),
+                            (self, "massArrayNp", row+2, self.massArrayNp[row+2], value)]
+                return None
 
-        # Increment number of function evaluations
+        for jointObj in self.jointObjList:
+            if jointObj.Name == objectName:
+                # The integer properties of a joint (e.g. its type or body indices) cannot be perturbed
+                if not isinstance(getattr(jointObj, propertyName), float):
+                    return None
+                edits = [(jointObj, propertyName, None, getattr(jointObj, propertyName), value)]
+                if jointObj.FunctType != -1:
+                    # A second driver table with the changed driver function, which is swapped in
+                    setattr(jointObj, propertyName, value)
+                    changedFunction = self.makeDriverFunction(jointObj)
+                    setattr(jointObj, propertyName, edits[0][3])
+                    driverList = [changedFunction if driverObj is jointObj else self.driverObjDict[driverObj.Name]
+                                  for driverObj in self.jointObjList if driverObj.FunctType != -1]
+                    edits.append((self, "driverTable", None, self.driverTable, DapFunctionMod.DriverTableC(driverList)))
+                    edits.append((self, "driverTick", None, None, None))
+                return edits
+
+        for forceIndex in range(len(self.forceObjList)):
+            if self.forceObjList[forceIndex].Name != objectName:
+                continue
+            # The per-type arrays which hold copies of each force parameter
+            arrayNames = {"springForceIndexNp": {"Stiffness": "springStiffnessNp",
+                                                 "DampingCoeff": "springDampingNp",
+                                                 "LengthAngle0": "springLength0Np",
+                                                 "ForceMagnitude": "springActuatorNp"},
+                          "rotSpringForceIndexNp": {"Stiffness": "rotSpringStiffnessNp",
+                                                    "DampingCoeff": "rotSpringDampingNp",
+                                                    "LengthAngle0": "rotSpringAngle0Np",
+                                                    "TorqueMagnitude": "rotSpringActuatorNp"},
+                          "torqueForceIndexNp": {"constTorque": "torqueValueNp"}}
+            for indexArrayName, propertyArrays in arrayNames.items():
+                positionNp = np.flatnonzero(getattr(self, indexArrayName) == forceIndex)
+                if len(positionNp) == 0:
+                    continue
+                if propertyName not in propertyArrays:
+                    return None
+                arrayName = propertyArrays[propertyName]
+                edits = [(self, arrayName, positionNp, getattr(self, arrayName)[positionNp].copy(), value)]
+                if indexArrayName == "torqueForceIndexNp":
+                    # The constant torques are already added up in the constant loads
+                    bodyIndex = self.torqueBodyNp[positionNp[0]]
+                    edits.append((self, "constantMomentsNp", bodyIndex, self.constantMomentsNp[bodyIndex],
+                                  self.constantMomentsNp[bodyIndex] + value - self.torqueValueNp[positionNp[0]]))
+                return edits
+            if self.contactEngine is not None:
+                pairsNp = np.flatnonzero(self.contactEngine.forceIndexNp == forceIndex)
+                contactArrays = {"ContactStiffness": "stiffnessNp",
+                                 "Restitution": "restitutionNp",
+                                 "FrictionStatic": "muStaticNp",
+                                 "FrictionDynamic": "muDynamicNp",
+                                 "ContactPointRadius": "pointRadiusNp"}
+                if len(pairsNp) > 0 and propertyName in contactArrays:
+                    arrayName = contactArrays[propertyName]
+                    return [(self.contactEngine, arrayName, pairsNp,
+                             getattr(self.contactEngine, arrayName)[pairsNp].copy(), value)]
+            return None
+        return None
+    #  -------------------------------------------------------------------------
+    def applySensitivityEdits(self, edits, changed):
+        """Apply the changed values of the edits from sensitivityEdits, or put back the values before them"""
+        for owner, attributeName, index, valueNow, changedValue in edits:
+            newValue = changedValue if changed else valueNow
+            if index is None:
+                setattr(owner, attributeName, newValue)
+            else:
+                getattr(owner, attributeName)[index] = newValue
+    #  -------------------------------------------------------------------------
+    def dynamicResidual(self, tick, uArray, accelNp, lambdaNp):
+        """Return the residual of the equations which Analysis solves, at the state uArray
+        for the given accelerations and Lagrange multipliers (which make it zero at their own state)"""
+        self.unpackUArray(uArray)
+        self.updatePointPositions()
+        self.updatePointVelocities()
+        self.makeForceArray(tick)
+        if self.numConstraints == 0:
+            return self.forceArrayNp - self.massArrayNp * accelNp
+        Jacobian = self.GetJacobianF()
+        return np.concatenate((self.forceArrayNp - self.massArrayNp * accelNp + Jacobian.T @ lambdaNp,
+                               self.RHSAcc(tick) - Jacobian @ accelNp))
+    #  -------------------------------------------------------------------------
+    def setUpScenarios(self, scenarioOverrides):
+        """Prepare K scenarios which share the topology of this model but differ in
+        their parameters or initial conditions, for evaluation by AnalysisBatch
+        Returns False if any scenario cannot be solved"""
+        if Debug:
+            DT.Mess("DapMainC-setUpScenarios")
+        compiledModel = self.compileModel()
+        self.scenarioList = []
+        for overrides in scenarioOverrides:
+            scenario = DapMainC(self.simEnd, self.simDelta, self.Accuracy, self.correctInitial, compiledModel=compiledModel)
+            for parameterName, value in overrides.items():
+                scenario.setParameter(parameterName, value)
+            if scenario.prepareSolution() is False:
+                return False
+            self.scenarioList.append(scenario)
+        self.Tspan = np.arange(0.0, self.simEnd, self.simDelta)
+
+        # Stack the state arrays of all the scenarios - shape (K, numBodies, ...)
+        # Each scenario's own arrays are then replaced by views into the stacked arrays,
+        # so the joint and force functions of each scenario see the batched state directly
+        for arrayName in BATCHED_STATE_ARRAYS:
+            stackedNp = np.stack([getattr(scenario, arrayName) for scenario in self.scenarioList])
+            setattr(self, arrayName.replace("Np", "BatchNp"), stackedNp)
+            for scenarioIndex in range(len(self.scenarioList)):
+                setattr(self.scenarioList[scenarioIndex], arrayName, stackedNp[scenarioIndex])
+        self.massArrayBatchNp = np.stack([scenario.massArrayNp for scenario in self.scenarioList])
+        self.uBatchNp = np.stack([scenario.uArray for scenario in self.scenarioList])
+
+        # The joint parameters of each scenario - shape (K, numJoints, ...) - for the batched Jacobian
+        self.jointUnit_I_WorldBatchNp = np.stack([scenario.jointUnit_I_WorldNp for scenario in self.scenarioList])
+        self.jointUnit_I_WorldRotBatchNp = np.stack([scenario.jointUnit_I_WorldRotNp for scenario in self.scenarioList])
+        self.jointUnit_J_WorldBatchNp = np.stack([scenario.jointUnit_J_WorldNp for scenario in self.scenarioList])
+        self.jointUnit_J_WorldRotBatchNp = np.stack([scenario.jointUnit_J_WorldRotNp for scenario in self.scenarioList])
+        self.jointLengthBatchNp = np.array([[getattr(jointObj, "lengthLink", 0.0) for jointObj in scenario.jointObjList]
+                                            for scenario in self.scenarioList], dtype=np.float64).reshape((-1, self.numJoints))
+        self.jointRadiusBatchNp = np.array([[getattr(jointObj, "Radius", 0.0) for jointObj in scenario.jointObjList]
+                                            for scenario in self.scenarioList], dtype=np.float64).reshape((-1, self.numJoints))
+        self.jointD0BatchNp = np.zeros((len(self.scenarioList), self.numJoints, 2), dtype=np.float64)
+        for scenarioIndex in range(len(self.scenarioList)):
+            for jointObj in self.scenarioList[scenarioIndex].jointObjList:
+                if hasattr(jointObj, "d0"):
+                    self.jointD0BatchNp[scenarioIndex, jointObj.JointNumber] = DT.CADVecToNumPyF(jointObj.d0)
+        # The number of function evaluations of each scenario while it is being integrated
+        self.scenarioCounterNp = np.zeros((len(self.scenarioList),), dtype=np.int64)
+        return True
+    #  -------------------------------------------------------------------------
+    def AnalysisBatch(self, tick, uBatchNp):
+        """The Analysis function for K scenarios at once
+        uBatchNp has shape (K, 6 x numMovBodies) and tick is either one time for all
+        the scenarios or an array of K times.  Returns uDot with the same shape"""
+        if Debug:
+            DT.Mess("DapMainC-AnalysisBatch")
+        numScenarios = len(self.scenarioList)
+        tickNp = np.broadcast_to(tick, (numScenarios,))
+        n3 = self.numMovBodiesx3
+
+        # Unpack all the scenarios into the stacked world coordinate and velocity arrays
+        # The ground (body 0) is never moved
+        positionsNp = uBatchNp[:, :n3].reshape(numScenarios, self.numBodies-1, 3)
+        velocitiesNp = uBatchNp[:, n3:].reshape(numScenarios, self.numBodies-1, 3)
+        self.worldBatchNp[:, 1:] = positionsNp[:, :, 0:2]
+        self.phiBatchNp[:, 1:] = positionsNp[:, :, 2]
+        self.worldDotBatchNp[:, 1:] = velocitiesNp[:, :, 0:2]
+        self.phiDotBatchNp[:, 1:] = velocitiesNp[:, :, 2]
+
+        # Update the point positions and velocities of all scenarios in one go
+        cosPhiNp = np.cos(self.phiBatchNp[:, 1:])
+        sinPhiNp = np.sin(self.phiBatchNp[:, 1:])
+        self.RotMatPhiBatchNp[:, 1:, 0, 0] = cosPhiNp
+        self.RotMatPhiBatchNp[:, 1:, 0, 1] = -sinPhiNp
+        self.RotMatPhiBatchNp[:, 1:, 1, 0] = sinPhiNp
+        self.RotMatPhiBatchNp[:, 1:, 1, 1] = cosPhiNp
+        self.pointXYrelCoGBatchNp[:, 1:] = np.einsum("kbij,bpj->kbpi", self.RotMatPhiBatchNp[:, 1:], self.pointXiEtaNp[1:])
+        self.pointXYrelCoGrotBatchNp[:, 1:, :, 0] = -self.pointXYrelCoGBatchNp[:, 1:, :, 1]
+        self.pointXYrelCoGrotBatchNp[:, 1:, :, 1] = self.pointXYrelCoGBatchNp[:, 1:, :, 0]
+        self.pointXYWorldBatchNp[:, 1:] = self.worldBatchNp[:, 1:, np.newaxis, :] + self.pointXYrelCoGBatchNp[:, 1:]
+        self.pointXYrelCoGdotBatchNp[:, 1:] = self.pointXYrelCoGrotBatchNp[:, 1:] * self.phiDotBatchNp[:, 1:, np.newaxis, np.newaxis]
+        self.pointWorldDotBatchNp[:, 1:] = self.worldDotBatchNp[:, 1:, np.newaxis, :] + self.pointXYrelCoGdotBatchNp[:, 1:]
+
+        # The Jacobian is built for all the scenarios at once from the stacked arrays
+        # The forces and gamma are evaluated per scenario on their views of the stacked arrays
+        forceBatchNp = np.zeros((numScenarios, n3), dtype=np.float64)
+        rhsAccelBatchNp = np.zeros((numScenarios, self.numConstraints), dtype=np.float64)
+        if self.numConstraints > 0:
+            JacobianBatchNp = self.GetJacobianBatchF()
+        for scenarioIndex in range(numScenarios):
+            scenario = self.scenarioList[scenarioIndex]
+            scenario.makeForceArray(tickNp[scenarioIndex])
+            forceBatchNp[scenarioIndex] = scenario.forceArrayNp
+            if self.numConstraints > 0:
+                rhsAccelBatchNp[scenarioIndex] = scenario.RHSAcc(tickNp[scenarioIndex])
+
+        # Solve all the scenarios' Jacobian-Mass-Jacobian systems with one batched solve
+        if self.numConstraints == 0:
+            accelBatchNp = forceBatchNp / self.massArrayBatchNp
+        else:
+            numBodPlusConstr = n3 + self.numConstraints
+            JacMasJacBatchNp = np.zeros((numScenarios, numBodPlusConstr, numBodPlusConstr), dtype=np.float64)
+            diagonalIndex = np.arange(n3)
+            JacMasJacBatchNp[:, diagonalIndex, diagonalIndex] = self.massArrayBatchNp
+            JacMasJacBatchNp[:, n3:, :n3] = JacobianBatchNp
+            JacMasJacBatchNp[:, :n3, n3:] = -JacobianBatchNp.transpose(0, 2, 1)
+            rhsBatchNp = np.concatenate((forceBatchNp, rhsAccelBatchNp), axis=1)
+            solvedBatchNp = np.linalg.solve(JacMasJacBatchNp, rhsBatchNp[:, :, np.newaxis])[:, :, 0]
+            accelBatchNp = solvedBatchNp[:, :n3]
+            self.LambdaBatchNp = solvedBatchNp[:, n3:]
+
+        # Increment number of (batched) function evaluations
         self.Counter += 1
 
-        return uDotArray
+        return np.concatenate((uBatchNp[:, n3:], accelBatchNp), axis=1)
+    #  -------------------------------------------------------------------------
+    def integrateScenarios(self, fixedStep=False, subSteps=10):
+        """Integrate all the scenarios together, either with a fixed step RK4 scheme
+        (subSteps steps per reporting interval) or with an adaptive Dormand-Prince
+        RK5(4) scheme which keeps a separate step size for each scenario"""
+        if Debug:
+            DT.Mess("DapMainC-integrateScenarios")
+        numScenarios = len(self.scenarioList)
+        numTicks = len(self.Tspan)
+        self.uBatchResults = np.zeros((numScenarios, numTicks, self.numMovBodiesx3 * 2), dtype=np.float64)
+        self.uBatchResults[:, 0] = self.uBatchNp
+        uNp = self.uBatchNp.copy()
+        tNp = np.zeros((numScenarios,), dtype=np.float64)
+
+        if fixedStep:
+            # Classic fourth order Runge-Kutta with a common step for all scenarios
+            stepSize = self.simDelta / subSteps
+            for tickIndex in range(1, numTicks):
+                for subStep in range(subSteps):
+                    self.scenarioCounterNp += 4
+                    k1 = self.AnalysisBatch(tNp, uNp)
+                    k2 = self.AnalysisBatch(tNp + stepSize/2.0, uNp + k1 * stepSize/2.0)
+                    k3 = self.AnalysisBatch(tNp + stepSize/2.0, uNp + k2 * stepSize/2.0)
+                    k4 = self.AnalysisBatch(tNp + stepSize, uNp + k3 * stepSize)
+                    uNp = uNp + (k1 + 2.0*k2 + 2.0*k3 + k4) * stepSize / 6.0
+                    tNp = tNp + stepSize
+                self.uBatchResults[:, tickIndex] = uNp
+                if self.cancelEvent.is_set():
+                    break
+            self.scenarioStatus = ["finished"] * numScenarios
+        else:
+            self.integrateScenariosAdaptive(uNp, tNp)
+
+        # Hand each scenario its own results so that it can write its own files
+        for scenarioIndex in range(numScenarios):
+            scenario = self.scenarioList[scenarioIndex]
+            scenario.timeValues = self.Tspan
+            scenario.uResults = self.uBatchResults[scenarioIndex]
+            scenario.solveStatus = self.scenarioStatus[scenarioIndex]
+            scenario.solveEndTime = self.Tspan[-1]
+            scenario.uFinal = self.uBatchResults[scenarioIndex, -1]
+    #  -------------------------------------------------------------------------
+    def integrateScenariosAdaptive(self, uNp, tNp):
+        """Dormand-Prince RK5(4) with first-same-as-last and per-scenario error control
+        The reporting times are filled in by cubic Hermite interpolation across each step"""
+        if Debug:
+            DT.Mess("DapMainC-integrateScenariosAdaptive")
+        numScenarios = len(self.scenarioList)
+        stepNp = np.full((numScenarios,), min(self.simDelta, self.simEnd) / 10.0)
+        nextTickNp = np.ones((numScenarios,), dtype=np.int64)
+        statusList = ["running"] * numScenarios
+        fNp = self.AnalysisBatch(tNp, uNp)
+        self.scenarioCounterNp += 1
+        K = np.zeros((7,) + uNp.shape, dtype=np.float64)
+        while "running" in statusList and not self.cancelEvent.is_set():
+            runningNp = np.array([status == "running" for status in statusList])
+            # Scenarios which have finished are carried along with a zero step
+            hNp = np.where(runningNp, np.minimum(stepNp, self.simEnd - tNp), 0.0)
+            K[0] = fNp
+            for stage in range(1, 6):
+                du = np.tensordot(DP_A[stage][:stage], K[:stage], axes=(0, 0))
+                K[stage] = self.AnalysisBatch(tNp + DP_C[stage] * hNp, uNp + hNp[:, np.newaxis] * du)
+            uNewNp = uNp + hNp[:, np.newaxis] * np.tensordot(DP_B, K[:6], axes=(0, 0))
+            fNewNp = self.AnalysisBatch(tNp + hNp, uNewNp)
+            K[6] = fNewNp
+            self.scenarioCounterNp[runningNp] += 6
+
+            # Scaled RMS error norm for each scenario
+            errorNp = hNp[:, np.newaxis] * np.tensordot(DP_E, K, axes=(0, 0))
+            scaleNp = self.absoluteTolerance + self.relativeTolerance * np.maximum(np.abs(uNp), np.abs(uNewNp))
+            errorNormNp = np.sqrt(np.mean((errorNp / scaleNp) ** 2, axis=1))
+            acceptedNp = runningNp & (errorNormNp < 1.0)
+
+            for scenarioIndex in np.nonzero(acceptedNp)[0]:
+                # Interpolate any reporting times which fall within this step
+                tOld = tNp[scenarioIndex]
+                tNew = tOld + hNp[scenarioIndex]
+                tickEnd = np.searchsorted(self.Tspan, tNew, side="right")
+                tickStart = nextTickNp[scenarioIndex]
+                if tickEnd > tickStart:
+                    x = ((self.Tspan[tickStart:tickEnd] - tOld) / hNp[scenarioIndex])[:, np.newaxis]
+                    h00 = 2*x**3 - 3*x**2 + 1
+                    h10 = x**3 - 2*x**2 + x
+                    h01 = -2*x**3 + 3*x**2
+                    h11 = x**3 - x**2
+                    self.uBatchResults[scenarioIndex, tickStart:tickEnd] = \
+                        h00 * uNp[scenarioIndex] + h10 * hNp[scenarioIndex] * fNp[scenarioIndex] + \
+                        h01 * uNewNp[scenarioIndex] + h11 * hNp[scenarioIndex] * fNewNp[scenarioIndex]
+                    nextTickNp[scenarioIndex] = tickEnd
+                if tNew >= self.simEnd:
+                    statusList[scenarioIndex] = "finished"
+            tNp = np.where(acceptedNp, tNp + hNp, tNp)
+            uNp = np.where(acceptedNp[:, np.newaxis], uNewNp, uNp)
+            fNp = np.where(acceptedNp[:, np.newaxis], fNewNp, fNp)
+
+            # New step sizes (the usual safety factor and limits on the change)
+            with np.errstate(divide="ignore"):
+                factorNp = np.clip(0.9 * errorNormNp ** -0.2, 0.2, 10.0)
+            stepNp = np.where(runningNp, hNp * factorNp, stepNp)
+            # Only the scenarios which are still running can fail (not one which has just finished on a short last step)
+            stillRunningNp = np.array([status == "running" for status in statusList])
+            for scenarioIndex in np.nonzero(stillRunningNp & (stepNp < 1e-12 * max(self.simEnd, 1.0)))[0]:
+                statusList[scenarioIndex] = "failed"
+                CAD.Console.PrintError("Scenario " + str(scenarioIndex) + " failed at time " +
+                                       str(tNp[scenarioIndex]) + " : step size too small\n")
+        self.scenarioStatus = statusList
+    #  -------------------------------------------------------------------------
+    def GetJacobianBatchF(self):
+        """Returns the Jacobian matrices of all the scenarios, K X numConstraints X (3 x numMovBodies)
+        Each joint's Head and Tail blocks are found for all the scenarios at once from the stacked arrays"""
+        if Debug:
+            DT.Mess("DapMainC-GetJacobianBatchF")
+        JacobianBatchNp = np.zeros((len(self.scenarioList), self.numConstraints, self.numMovBodiesx3), dtype=np.float64)
+        # All the scenarios have the joints of the first one, with their own parameters
+        for jointObj in self.scenarioList[0].jointObjList:
+            if jointObj.JointType == DT.JOINT_TYPE_DICTIONARY['Revolute'] and jointObj.FunctType != -1:
+                jointObj.JointType = DT.JOINT_TYPE_DICTIONARY['Driven-Revolute']
+            JacobianHead, JacobianTail = self.dictJacobianBatchFunctions[jointObj.JointType](jointObj)
+            if jointObj.body_I_Index != 0:
+                JacobianBatchNp[:, jointObj.rowStart: jointObj.rowEnd,
+                                (jointObj.body_I_Index-1) * 3: jointObj.body_I_Index * 3] = JacobianHead
+            if jointObj.body_J_Index != 0:
+                JacobianBatchNp[:, jointObj.rowStart: jointObj.rowEnd,
+                                (jointObj.body_J_Index-1) * 3: jointObj.body_J_Index * 3] = JacobianTail
+        return JacobianBatchNp
+    #  -------------------------------------------------------------------------
+    def Revolute_JacobianBatch(self, jointObj):
+        """Revolute_Jacobian for all the scenarios - shape (K, rows, 3)"""
+        numRows = 3 if jointObj.fixDof else 2
+        JacobianHead = np.zeros((len(self.scenarioList), numRows, 3), dtype=np.float64)
+        JacobianTail = np.zeros((len(self.scenarioList), numRows, 3), dtype=np.float64)
+        JacobianHead[:, 0, 0] = JacobianHead[:, 1, 1] = 1.0
+        JacobianTail[:, 0, 0] = JacobianTail[:, 1, 1] = -1.0
+        JacobianHead[:, 0:2, 2] = self.pointXYrelCoGrotBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index]
+        JacobianTail[:, 0:2, 2] = -self.pointXYrelCoGrotBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index]
+        if jointObj.fixDof:
+            JacobianHead[:, 2, 2] = 1.0
+            JacobianTail[:, 2, 2] = -1.0
+        return JacobianHead, JacobianTail
+    #  -------------------------------------------------------------------------
+    def Revolute_Revolute_JacobianBatch(self, jointObj):
+        """Revolute_Revolute_Jacobian for all the scenarios - shape (K, 1, 3)"""
+        diffNp = self.pointXYWorldBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index] - \
+            self.pointXYWorldBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index]
+        unitNp = diffNp / self.jointLengthBatchNp[:, jointObj.JointNumber, np.newaxis]
+        JacobianHead = np.zeros((len(self.scenarioList), 1, 3), dtype=np.float64)
+        JacobianTail = np.zeros((len(self.scenarioList), 1, 3), dtype=np.float64)
+        JacobianHead[:, 0, 0:2] = unitNp
+        JacobianHead[:, 0, 2] = np.einsum("ki,ki->k", unitNp,
+                                          self.pointXYrelCoGrotBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index])
+        JacobianTail[:, 0, 0:2] = -unitNp
+        JacobianTail[:, 0, 2] = -np.einsum("ki,ki->k", unitNp,
+                                           self.pointXYrelCoGrotBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index])
+        return JacobianHead, JacobianTail
+    #  -------------------------------------------------------------------------
+    def Rigid_JacobianBatch(self, jointObj):
+        """Rigid_Jacobian for all the scenarios - shape (K, 3, 3)"""
+        JacobianHead = np.tile(np.eye(3), (len(self.scenarioList), 1, 1))
+        JacobianTail = -JacobianHead
+        if jointObj.body_J_Index != 0:
+            tailVectorNp = np.einsum("kij,kj->ki", self.RotMatPhiBatchNp[:, jointObj.body_J_Index],
+                                     self.jointD0BatchNp[:, jointObj.JointNumber])
+            # The tail vector rotated by 90 degrees
+            JacobianTail[:, 0, 2] = tailVectorNp[:, 1]
+            JacobianTail[:, 1, 2] = -tailVectorNp[:, 0]
+        return JacobianHead, JacobianTail
+    #  -------------------------------------------------------------------------
+    def Translational_JacobianBatch(self, jointObj):
+        """Translational_Jacobian for all the scenarios - shape (K, rows, 3)"""
+        unitJNp = self.jointUnit_J_WorldBatchNp[:, jointObj.JointNumber]
+        unitJRotNp = self.jointUnit_J_WorldRotBatchNp[:, jointObj.JointNumber]
+        diffNp = self.pointXYWorldBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index] - \
+            self.pointXYWorldBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index]
+        numRows = 3 if jointObj.fixDof else 2
+        JacobianHead = np.zeros((len(self.scenarioList), numRows, 3), dtype=np.float64)
+        JacobianTail = np.zeros((len(self.scenarioList), numRows, 3), dtype=np.float64)
+        JacobianHead[:, 0, 0:2] = unitJRotNp
+        JacobianHead[:, 0, 2] = np.einsum("ki,ki->k", unitJNp,
+                                          self.pointXYrelCoGBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index])
+        JacobianHead[:, 1, 2] = 1.0
+        JacobianTail[:, 0, 0:2] = -unitJRotNp
+        JacobianTail[:, 0, 2] = -np.einsum("ki,ki->k", unitJNp,
+                                           self.pointXYrelCoGBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index] + diffNp)
+        JacobianTail[:, 1, 2] = -1.0
+        if jointObj.fixDof:
+            JacobianHead[:, 2, 0:2] = unitJNp
+            JacobianHead[:, 2, 2] = np.einsum("ki,ki->k", unitJNp,
+                                              self.pointXYrelCoGrotBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index])
+            JacobianTail[:, 2, 0:2] = -unitJNp
+            JacobianTail[:, 2, 2] = -np.einsum("ki,ki->k", unitJNp,
+                                               self.pointXYrelCoGrotBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index])
+        return JacobianHead, JacobianTail
+    #  -------------------------------------------------------------------------
+    def Translational_Revolute_JacobianBatch(self, jointObj):
+        """Translational_Revolute_Jacobian for all the scenarios - shape (K, 1, 3)"""
+        unitNp = self.jointUnit_I_WorldBatchNp[:, jointObj.JointNumber]
+        diffNp = self.pointXYWorldBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index] - \
+            self.pointXYWorldBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index]
+        JacobianHead = np.zeros((len(self.scenarioList), 1, 3), dtype=np.float64)
+        JacobianTail = np.zeros((len(self.scenarioList), 1, 3), dtype=np.float64)
+        JacobianHead[:, 0, 0:2] = self.jointUnit_I_WorldRotBatchNp[:, jointObj.JointNumber]
+        JacobianHead[:, 0, 2] = np.einsum("ki,ki->k", unitNp,
+                                          self.pointXYrelCoGBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index] - diffNp)
+        JacobianTail[:, 0, 0:2] = -self.jointUnit_I_WorldRotBatchNp[:, jointObj.JointNumber]
+        JacobianTail[:, 0, 2] = -np.einsum("ki,ki->k", unitNp,
+                                           self.pointXYrelCoGBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index])
+        return JacobianHead, JacobianTail
+    #  -------------------------------------------------------------------------
+    def Driven_Revolute_JacobianBatch(self, jointObj):
+        """Driven_Revolute_Jacobian for all the scenarios - shape (K, 1, 3)"""
+        JacobianHead = np.zeros((len(self.scenarioList), 1, 3), dtype=np.float64)
+        JacobianHead[:, 0, 2] = 1.0
+        return JacobianHead, -JacobianHead
+    #  -------------------------------------------------------------------------
+    def Driven_Translational_JacobianBatch(self, jointObj):
+        """Driven_Translational_Jacobian for all the scenarios - shape (K, 1, 3)"""
+        diffNp = self.pointXYWorldBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index] - \
+            self.pointXYWorldBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index]
+        JacobianHead = np.zeros((len(self.scenarioList), 1, 3), dtype=np.float64)
+        JacobianTail = np.zeros((len(self.scenarioList), 1, 3), dtype=np.float64)
+        JacobianHead[:, 0, 0:2] = diffNp
+        JacobianHead[:, 0, 2] = np.einsum("ki,ki->k", diffNp,
+                                          self.pointXYrelCoGrotBatchNp[:, jointObj.body_I_Index, jointObj.point_I_i_Index])
+        JacobianTail[:, 0, 0:2] = -diffNp
+        JacobianTail[:, 0, 2] = -np.einsum("ki,ki->k", diffNp,
+                                           self.pointXYrelCoGrotBatchNp[:, jointObj.body_J_Index, jointObj.point_J_i_Index])
+        return JacobianHead, JacobianTail
+    #  -------------------------------------------------------------------------
+    def Disc_JacobianBatch(self, jointObj):
+        """Disc_Jacobian for all the scenarios - shape (K, 2, 3)"""
+        JacobianHead = np.zeros((len(self.scenarioList), 2, 3), dtype=np.float64)
+        JacobianHead[:, 0, 1] = 1.0
+        JacobianHead[:, 1, 0] = 1.0
+        JacobianHead[:, 1, 2] = self.jointRadiusBatchNp[:, jointObj.JointNumber]
+        return JacobianHead, JacobianHead
     #  -------------------------------------------------------------------------
     def correctInitialConditions(self):
         """This function corrects the supplied initial conditions by making
@@ -1170,12 +3170,13 @@ class DapMainC:
         rhsVelNp = np.zeros((self.numConstraints,), dtype=np.float64)
         for jointObj in self.jointObjList:
             if jointObj.JointType == DT.JOINT_TYPE_DICTIONARY['Revolute'] and jointObj.FunctType != -1:
-                jointObj.JointType = DT.JOINT_TYPE_DICTIONARY['Driven-Rotation']
-                [func, funcDot, funcDotDot] = self.driverObjDict[jointObj.Name].getFofT(jointObj.FunctType, tick)
-                rhsVelNp[jointObj.rowStart: jointObj.rowEnd] = func * funcDot
-            elif jointObj.JointType == DT.JOINT_TYPE_DICTIONARY['Driven-Translation']:
-                [func, funcDot, funcDotDot] = self.driverObjDict[jointObj.Name].getFofT(jointObj.FunctType, tick)
+                jointObj.JointType = DT.JOINT_TYPE_DICTIONARY['Driven-Revolute']
+            if jointObj.JointType == DT.JOINT_TYPE_DICTIONARY['Driven-Revolute']:
+                [func, funcDot, funcDotDot] = self.driverValues(jointObj, tick)
                 rhsVelNp[jointObj.rowStart: jointObj.rowEnd] = funcDot
+            elif jointObj.JointType == DT.JOINT_TYPE_DICTIONARY['Driven-Translation']:
+                [func, funcDot, funcDotDot] = self.driverValues(jointObj, tick)
+                rhsVelNp[jointObj.rowStart: jointObj.rowEnd] = func * funcDot
         return rhsVelNp
     #  =========================================================================
     def Revolute_constraint(self, jointObj, tick):
@@ -1680,7 +3681,7 @@ class DapMainC:
         #    d  = Points(Pi).rP - Points(Pj).rP;
         #        f = ui_r'*d - Joints(Ji).L;
         # ==================================
-        jointUnitVecRot = self.jointUnitVecRotNp[jointObj.body_I_Index]
+        jointUnitVecRot = self.jointUnit_I_WorldRotNp[jointObj.JointNumber]
         diff = self.pointXYWorldNp[jointObj.body_I_Index, jointObj.point_I_i_Index] - \
                self.pointXYWorldNp[jointObj.body_J_Index, jointObj.point_J_i_Index]
         return np.array([jointUnitVecRot.dot(diff) - jointObj.lengthLink])
@@ -1779,7 +3780,7 @@ class DapMainC:
         #        f =  Bodies(Bi).p - Bodies(Bj).p - fun;
         #    end
         # ==================================
-        [func, funcDot, funcDotDot] = self.driverObjDict[jointObj.Name].getFofT(jointObj.FunctType, tick)
+        [func, funcDot, funcDotDot] = self.driverValues(jointObj, tick)
         if jointObj.body_I_Index == 0:
             f = -self.phiNp[jointObj.body_J_Index] - func
         elif jointObj.body_J_Index == 0:
@@ -1811,7 +3812,7 @@ class DapMainC:
         # ==================================
         #    [fun, fun_d, fun_dd] = functs(Joints(Ji).iFunct, t);
         #    f = fun_dd;
-        [func, funcDot, funcDotDot] = self.driverObjDict[jointObj.Name].getFofT(jointObj.FunctType, tick)
+        [func, funcDot, funcDotDot] = self.driverValues(jointObj, tick)
         return funcDotDot
     #  =========================================================================
     def Driven_Translational_constraint(self, jointObj, tick):
@@ -1827,7 +3828,7 @@ class DapMainC:
         #    [fun, fun_d, fun_dd] = functs(Joints(Ji).iFunct, t);
         #        f = (d'*d - fun^2)/2;
         # ==================================
-        [func, funcDot, funcDotDot] = self.driverObjDict[jointObj.Name].getFofT(jointObj.FunctType, tick)
+        [func, funcDot, funcDotDot] = self.driverValues(jointObj, tick)
         diff = self.pointXYWorldNp[jointObj.body_I_Index, jointObj.point_I_i_Index] - \
                self.pointXYWorldNp[jointObj.body_J_Index, jointObj.point_J_i_Index]
         return np.array([(diff.dot(diff) - func ** 2) / 2])
@@ -1880,7 +3881,7 @@ class DapMainC:
         #              - d'*s_rot(Points(Pi).sP_d)*Bodies(Bi).p_d - d_d'*d_d;
         #    end
         # ==================================
-        [func, funcDot, funcDotDot] = self.driverObjDict[jointObj.Name].getFofT(jointObj.FunctType, tick)
+        [func, funcDot, funcDotDot] = self.driverValues(jointObj, tick)
         diff = self.pointXYWorldNp[jointObj.body_I_Index, jointObj.point_I_i_Index] - \
                self.pointXYWorldNp[jointObj.body_J_Index, jointObj.point_J_i_Index]
         diffDot = self.pointWorldDotNp[jointObj.body_I_Index, jointObj.point_I_i_Index] - \
@@ -1941,16 +3942,257 @@ class DapMainC:
         # ==================================
         return np.array([0.0, 0.0])
     #  =========================================================================
+    def pointCrossesLine_Event(self, event):
+        """Distance of a point from a line fixed in the world (positive to the left of the line)"""
+        pointWorld = self.pointXYWorldNp[event["bodyIndex"], event["pointIndex"]]
+        return event["lineNormalNp"].dot(pointWorld - event["linePointNp"])
+    #  -------------------------------------------------------------------------
+    def sliderStop_Event(self, event):
+        """Position of the slider of a translational joint along the line of the joint
+        (from the first point of the line on body I) relative to the position of the stop"""
+        jointObj = event["jointObj"]
+        lineStart = self.pointXYWorldNp[jointObj.body_I_Index, jointObj.point_I_i_Index]
+        lineUnit = DT.NormalizeNpVec(self.pointXYWorldNp[jointObj.body_I_Index, jointObj.point_I_j_Index] - lineStart)
+        return lineUnit.dot(self.pointXYWorldNp[jointObj.body_J_Index, jointObj.point_J_i_Index] - lineStart) - event["position"]
+    #  -------------------------------------------------------------------------
+    def bodyAngle_Event(self, event):
+        """Angle of a body relative to the event angle"""
+        return self.phiNp[event["bodyIndex"]] - event["angle"]
+    #  -------------------------------------------------------------------------
+    def forceThreshold_Event(self, event):
+        """Magnitude of a force (or torque) relative to the threshold"""
+        return abs(self.forceValueNp[event["forceIndex"]]) - event["threshold"]
+    #  =========================================================================
+    def postProcessResults(self, timeValues, uResults):
+        """Do the analysis once at every reporting time and keep the accelerations, Lagrange
+        multipliers, joint Jacobians and applied forces from which the results are written
+        and, if they are monitored, the constraint violations of every joint"""
+        if Debug:
+            DT.Mess("DapMainC-postProcessResults")
+        numTicks = len(timeValues)
+        self.accelResults = np.zeros((numTicks, self.numMovBodiesx3), dtype=np.float64)
+        self.LambdaResults = np.zeros((numTicks, self.numConstraints), dtype=np.float64)
+        # The Head and Tail Jacobian blocks of each constraint row, i.e. for the bodies I and J of its joint
+        self.jointJacobianResults = np.zeros((numTicks, self.numConstraints, 2, 3), dtype=np.float64)
+        self.forceArrayResults = np.zeros((numTicks, self.numMovBodiesx3), dtype=np.float64)
+        # The constraints and the right hand sides of their velocity and acceleration equations, when they are monitored
+        if self.constraintViolationOutput:
+            constraintResultsNp = np.zeros((numTicks, self.numConstraints), dtype=np.float64)
+            rhsVelResultsNp = np.zeros((numTicks, self.numConstraints), dtype=np.float64)
+            rhsAccResultsNp = np.zeros((numTicks, self.numConstraints), dtype=np.float64)
+        for timeIndex in range(numTicks):
+            uDotArray = self.Analysis(timeValues[timeIndex], uResults[timeIndex])
+            self.accelResults[timeIndex] = uDotArray[self.numMovBodiesx3:]
+            self.forceArrayResults[timeIndex] = self.forceArrayNp
+            if self.numConstraints > 0:
+                self.LambdaResults[timeIndex] = self.Lambda
+                for jointObj in self.jointObjList:
+                    JacobianHead, JacobianTail = self.dictJacobianFunctions[jointObj.JointType](jointObj)
+                    self.jointJacobianResults[timeIndex, jointObj.rowStart: jointObj.rowEnd, 0] = JacobianHead
+                    self.jointJacobianResults[timeIndex, jointObj.rowStart: jointObj.rowEnd, 1] = JacobianTail
+                if self.constraintViolationOutput:
+                    constraintResultsNp[timeIndex] = self.GetconstraintsF(timeValues[timeIndex])
+                    rhsVelResultsNp[timeIndex] = self.RHSVel(timeValues[timeIndex])
+                    rhsAccResultsNp[timeIndex] = self.RHSAcc(timeValues[timeIndex])
+        self.jointReactionResults = self.jointReactions(uResults)
+        if self.constraintViolationOutput and self.numConstraints > 0:
+            self.constraintViolationResults = self.constraintViolations(
+                constraintResultsNp,
+                self.jacobianProduct(uResults[:, self.numMovBodiesx3:]) - rhsVelResultsNp,
+                self.jacobianProduct(self.accelResults) - rhsAccResultsNp)
+    #  -------------------------------------------------------------------------
+    def jointReactions(self, uResults):
+        """Return the reaction which each joint exerts on its bodies I and J at every reporting time
+        as an array [tick, joint, body I/J, Fx Fy M Fxi Feta] in N and Nm, i.e. the J-transpose times
+        Lambda of its constraint rows, as the world force, the moment about the CoG and the force
+        in the body local frame.  Needs postProcessResults to have been done"""
+        if Debug:
+            DT.Mess("DapMainC-jointReactions")
+        numTicks = len(uResults)
+        reactionsNp = np.zeros((numTicks, len(self.jointObjList), 2, 5), dtype=np.float64)
+        # The angles of all the bodies at all the reporting times (the ground stays at its initial angle)
+        phiNp = np.zeros((numTicks, self.numBodies), dtype=np.float64)
+        phiNp[:, 0] = self.phiNp[0]
+        phiNp[:, 1:] = uResults[:, 2: self.numMovBodiesx3: 3]
+        for jointIndex in range(len(self.jointObjList)):
+            jointObj = self.jointObjList[jointIndex]
+            rows = slice(jointObj.rowStart, jointObj.rowEnd)
+            # Forces in mm-kg-s units are in N * 1e3 and moments in Nm * 1e6
+            worldNp = np.einsum("trsk,tr->tsk", self.jointJacobianResults[:, rows], self.LambdaResults[:, rows])
+            reactionsNp[:, jointIndex, :, 0:2] = worldNp[:, :, 0:2] * 1e-3
+            reactionsNp[:, jointIndex, :, 2] = worldNp[:, :, 2] * 1e-6
+            # Rotate the world force into the frame of each body
+            cosPhiNp = np.cos(phiNp[:, [jointObj.body_I_Index, jointObj.body_J_Index]])
+            sinPhiNp = np.sin(phiNp[:, [jointObj.body_I_Index, jointObj.body_J_Index]])
+            reactionsNp[:, jointIndex, :, 3] = cosPhiNp * reactionsNp[:, jointIndex, :, 0] + sinPhiNp * reactionsNp[:, jointIndex, :, 1]
+            reactionsNp[:, jointIndex, :, 4] = -sinPhiNp * reactionsNp[:, jointIndex, :, 0] + cosPhiNp * reactionsNp[:, jointIndex, :, 1]
+        return reactionsNp
+    #  -------------------------------------------------------------------------
+    def resultsPointKinematics(self, uResults, bodyNp, pointNp):
+        """Return the world positions and velocities [tick, n, x y] of the points
+        (bodyNp[n], pointNp[n]) at every reporting time"""
+        if Debug:
+            DT.Mess("DapMainC-resultsPointKinematics")
+        numTicks = len(uResults)
+        positionsNp = uResults[:, :self.numMovBodiesx3].reshape((numTicks, self.numBodies-1, 3))
+        velocitiesNp = uResults[:, self.numMovBodiesx3:].reshape((numTicks, self.numBodies-1, 3))
+        # The ground (body 0) stays where it started
+        worldNp = np.zeros((numTicks, self.numBodies, 2), dtype=np.float64)
+        worldNp[:, 0] = self.worldNp[0]
+        worldNp[:, 1:] = positionsNp[:, :, 0:2]
+        worldDotNp = np.zeros((numTicks, self.numBodies, 2), dtype=np.float64)
+        worldDotNp[:, 1:] = velocitiesNp[:, :, 0:2]
+        phiNp = np.zeros((numTicks, self.numBodies), dtype=np.float64)
+        phiNp[:, 0] = self.phiNp[0]
+        phiNp[:, 1:] = positionsNp[:, :, 2]
+        phiDotNp = np.zeros((numTicks, self.numBodies), dtype=np.float64)
+        phiDotNp[:, 1:] = velocitiesNp[:, :, 2]
+
+        cosPhiNp = np.cos(phiNp[:, bodyNp])
+        sinPhiNp = np.sin(phiNp[:, bodyNp])
+        xiEtaNp = self.pointXiEtaNp[bodyNp, pointNp]
+        relCoGNp = np.stack((cosPhiNp * xiEtaNp[:, 0] - sinPhiNp * xiEtaNp[:, 1],
+                             sinPhiNp * xiEtaNp[:, 0] + cosPhiNp * xiEtaNp[:, 1]), axis=2)
+        relCoGDotNp = np.stack((-relCoGNp[:, :, 1], relCoGNp[:, :, 0]), axis=2) * phiDotNp[:, bodyNp, np.newaxis]
+        return worldNp[:, bodyNp] + relCoGNp, worldDotNp[:, bodyNp] + relCoGDotNp
+    #  -------------------------------------------------------------------------
+    def jacobianProduct(self, ratesNp):
+        """Return J times the body coordinate rates [tick, 3 x numMovBodies] (e.g. the velocities
+        or the accelerations) for every constraint row at every reporting time [tick, row]
+        from the joint Jacobians kept by postProcessResults"""
+        if Debug:
+            DT.Mess("DapMainC-jacobianProduct")
+        numTicks = len(ratesNp)
+        bodyRatesNp = np.zeros((numTicks, self.numBodies, 3), dtype=np.float64)
+        bodyRatesNp[:, 1:] = ratesNp.reshape((numTicks, self.numBodies-1, 3))
+        rowBodyINp = np.zeros((self.numConstraints,), dtype=np.int64)
+        rowBodyJNp = np.zeros((self.numConstraints,), dtype=np.int64)
+        for jointObj in self.jointObjList:
+            rowBodyINp[jointObj.rowStart: jointObj.rowEnd] = jointObj.body_I_Index
+            rowBodyJNp[jointObj.rowStart: jointObj.rowEnd] = jointObj.body_J_Index
+        return np.einsum("tck,tck->tc", self.jointJacobianResults[:, :, 0], bodyRatesNp[:, rowBodyINp]) + \
+            np.einsum("tck,tck->tc", self.jointJacobianResults[:, :, 1], bodyRatesNp[:, rowBodyJNp])
+    #  -------------------------------------------------------------------------
+    def constraintViolations(self, positionNp, velocityNp, accelerationNp):
+        """Return the norms of the position, velocity and acceleration constraint violations [tick, row]
+        over the rows of every joint [tick, joint, position velocity acceleration] in mm or rad (and their
+        rates), and keep the largest of each (and the joint where it occurred) for the solver object"""
+        if Debug:
+            DT.Mess("DapMainC-constraintViolations")
+        violationsNp = np.zeros((len(positionNp), len(self.jointObjList), 3), dtype=np.float64)
+        for jointIndex in range(len(self.jointObjList)):
+            jointObj = self.jointObjList[jointIndex]
+            rows = slice(jointObj.rowStart, jointObj.rowEnd)
+            violationsNp[:, jointIndex, 0] = np.linalg.norm(positionNp[:, rows], axis=1)
+            violationsNp[:, jointIndex, 1] = np.linalg.norm(velocityNp[:, rows], axis=1)
+            violationsNp[:, jointIndex, 2] = np.linalg.norm(accelerationNp[:, rows], axis=1)
+        # The largest over all the parts of the solution written so far
+        jointMaximaNp = violationsNp.max(axis=0)
+        for column, name in enumerate(["Position", "Velocity", "Acceleration"]):
+            jointIndex = int(np.argmax(jointMaximaNp[:, column]))
+            if name not in self.maxConstraintViolations or \
+                    jointMaximaNp[jointIndex, column] > float(self.maxConstraintViolations[name]):
+                self.maxConstraintViolations[name] = "{:.6g}".format(jointMaximaNp[jointIndex, column])
+                self.maxConstraintViolations[name + "Joint"] = self.jointObjList[jointIndex].Label
+        return violationsNp
+    #  -------------------------------------------------------------------------
+    def energyChannels(self, timeValues, uResults, appendRows):
+        """Return the kinetic and gravitational energy of every body [tick, body], and the elastic energy of the
+        springs, the energy dissipated by the dampers, the work done by everything else (actuators, motors, ForceLaw
+        elements, other forces, contacts and joint drivers) and the energy balance residual [tick], all in J
+        The works are integrated over the reporting times with the trapezium rule, so the residual shows the
+        error of the solution plus that of the integration.  Needs postProcessResults to have been done"""
+        if Debug:
+            DT.Mess("DapMainC-energyChannels")
+        numTicks = len(timeValues)
+        positionsNp = uResults[:, :self.numMovBodiesx3].reshape((numTicks, self.numBodies-1, 3))
+        velocitiesNp = uResults[:, self.numMovBodiesx3:].reshape((numTicks, self.numBodies-1, 3))
+
+        # Energies in kg mm^2/s^2 are in J * 1e6
+        kineticNp = 0.5e-6 * np.einsum("bk,tbk->tb", self.massArrayNp.reshape((-1, 3)), velocitiesNp ** 2)
+        gravityNp = -1e-6 * self.gravityCountNp[0] * np.einsum("bk,tbk->tb", self.WeightNp[1:], positionsNp[:, :, 0:2])
+        if not appendRows:
+            self.potEnergyZeroPointNp[1:] = gravityNp[0]
+        gravityNp -= self.potEnergyZeroPointNp[1:]
+
+        # The power of all the applied forces and of the joint drivers (the other constraints do no work)
+        # less that of gravity, which is in the potential energy
+        externalPowerNp = np.einsum("ti,ti->t", self.forceArrayResults, uResults[:, self.numMovBodiesx3:])
+        if self.numConstraints > 0:
+            externalPowerNp += np.einsum("tc,tc->t", self.LambdaResults, self.jacobianProduct(uResults[:, self.numMovBodiesx3:]))
+        externalPowerNp -= self.gravityCountNp[0] * np.einsum("bk,tbk->t", self.WeightNp[1:], velocitiesNp[:, :, 0:2])
+
+        # The elastic energy and the damping power of the springs and dampers with the linear law
+        # whose power (-k delta L dot - c L dot^2) is also taken out of the external power
+        elasticNp = np.zeros((numTicks,), dtype=np.float64)
+        dampingPowerNp = np.zeros((numTicks,), dtype=np.float64)
+        if len(self.springForceIndexNp) > 0:
+            linearNp = np.ones((len(self.springForceIndexNp),), dtype=np.float64)
+            for positionNp, forceLaw in self.springLawList:
+                linearNp[positionNp] = 0.0
+            pointINp, pointDotINp = self.resultsPointKinematics(uResults, self.springBodyINp, self.springPointINp)
+            pointJNp, pointDotJNp = self.resultsPointKinematics(uResults, self.springBodyJNp, self.springPointJNp)
+            diffNp = pointINp - pointJNp
+            lengthNp = np.sqrt(np.einsum("tni,tni->tn", diffNp, diffNp))
+            lengthDotNp = np.einsum("tni,tni->tn", diffNp, pointDotINp - pointDotJNp) / lengthNp * linearNp
+            deltaNp = (lengthNp - self.springLength0Np) * linearNp
+            elasticNp += 0.5 * deltaNp ** 2 @ self.springStiffnessNp
+            dampingPowerNp += lengthDotNp ** 2 @ self.springDampingNp
+            externalPowerNp += (deltaNp * lengthDotNp) @ self.springStiffnessNp
+        if len(self.rotSpringForceIndexNp) > 0:
+            linearNp = np.ones((len(self.rotSpringForceIndexNp),), dtype=np.float64)
+            for positionNp, forceLaw in self.rotSpringLawList:
+                linearNp[positionNp] = 0.0
+            phiNp = np.zeros((numTicks, self.numBodies), dtype=np.float64)
+            phiNp[:, 1:] = positionsNp[:, :, 2]
+            phiDotNp = np.zeros((numTicks, self.numBodies), dtype=np.float64)
+            phiDotNp[:, 1:] = velocitiesNp[:, :, 2]
+            thetaNp = self.rotSpringMaskINp * phiNp[:, self.rotSpringBodyINp] - \
+                self.rotSpringMaskJNp * phiNp[:, self.rotSpringBodyJNp]
+            thetaDotNp = (self.rotSpringMaskINp * phiDotNp[:, self.rotSpringBodyINp] -
+                          self.rotSpringMaskJNp * phiDotNp[:, self.rotSpringBodyJNp]) * linearNp
+            deltaNp = (thetaNp - self.rotSpringAngle0Np) * linearNp
+            elasticNp += 0.5 * deltaNp ** 2 @ self.rotSpringStiffnessNp
+            dampingPowerNp += thetaDotNp ** 2 @ self.rotSpringDampingNp
+            externalPowerNp += (deltaNp * thetaDotNp) @ self.rotSpringStiffnessNp
+        externalPowerNp += dampingPowerNp
+        elasticNp *= 1e-6
+        dampingPowerNp *= 1e-6
+        externalPowerNp *= 1e-6
+
+        # energyAccountNp carries the time, the two powers, the two works and the initial total energy
+        # from the end of one part of the solution to the start of the next
+        if not appendRows:
+            self.energyAccountNp[:] = [timeValues[0], dampingPowerNp[0], externalPowerNp[0], 0.0, 0.0,
+                                       kineticNp[0].sum() + elasticNp[0]]
+        intervalNp = np.diff(np.concatenate(([self.energyAccountNp[0]], timeValues)))
+        dissipatedNp = self.energyAccountNp[3] + np.cumsum(
+            0.5 * intervalNp * (np.concatenate(([self.energyAccountNp[1]], dampingPowerNp[:-1])) + dampingPowerNp))
+        externalNp = self.energyAccountNp[4] + np.cumsum(
+            0.5 * intervalNp * (np.concatenate(([self.energyAccountNp[2]], externalPowerNp[:-1])) + externalPowerNp))
+        balanceNp = kineticNp.sum(axis=1) + gravityNp.sum(axis=1) + elasticNp - self.energyAccountNp[5] + \
+            dissipatedNp - externalNp
+        self.energyAccountNp[0:5] = [timeValues[-1], dampingPowerNp[-1], externalPowerNp[-1], dissipatedNp[-1], externalNp[-1]]
+
+        return kineticNp, gravityNp, elasticNp, dissipatedNp, externalNp, balanceNp
+    #  -------------------------------------------------------------------------
     def outputResults(self, timeValues, uResults):
         if Debug:
             DT.Mess("DapMainMod-outputResults")
 
-        # Compute body accelerations, Lagrange multipliers, coordinates and
+        # Compute body accelerations, joint reactions, coordinates and
         #    velocity of all points, kinetic and potential energies,
         #             at every reporting time interval
-        self.solverObj = CAD.ActiveDocument.findObjects(Name="^DapSolver$")[0]
-        fileName = self.solverObj.Directory+"/"+self.solverObj.FileName+".csv"
-        DapResultsFILE = open(fileName, 'w')
+        fileName = os.path.join(self.outputDirectory, self.outputFileName + ".csv")
+        # When continuing from a checkpoint, the rows are added to the file of the earlier solution
+        appendRows = self.numWrittenRows > 0 and os.path.isfile(fileName)
+        if appendRows:
+            DapResultsFILE = open(fileName, 'a')
+            # The headings are still needed for the vertical names, but are not written again
+            HeadingsFILE = io.StringIO()
+        else:
+            DapResultsFILE = open(fileName, 'w')
+            HeadingsFILE = DapResultsFILE
         numTicks = len(timeValues)
 
         # Create the vertical headings list
@@ -1962,81 +4204,128 @@ class DapMainC:
         # Write the column headers horizontally
         for twice in range(2):
             ColumnCounter = 0
-            DapResultsFILE.write("Time: ")
+            HeadingsFILE.write("Time: ")
             # Bodies Headings
             for bodyIndex in range(1, self.numBodies):
                 if twice == 0:
                     VerticalHeaders.append(self.bodyObjList[bodyIndex].Label)
-                    DapResultsFILE.write("Body" + str(bodyIndex))
-                    DapResultsFILE.write(" x y phi(r) phi(d) dx/dt dy/dt dphi/dt(r) dphi/dt(d) d2x/dt2 d2y/dt2 d2phi/dt2(r) d2phi/dt2(d) ")
+                    HeadingsFILE.write("Body" + str(bodyIndex))
+                    HeadingsFILE.write(" x y phi(r) phi(d) dx/dt dy/dt dphi/dt(r) dphi/dt(d) d2x/dt2 d2y/dt2 d2phi/dt2(r) d2phi/dt2(d) ")
                 else:
-                    DapResultsFILE.write(VerticalHeaders[ColumnCounter] + " -"*12 + " ")
+                    HeadingsFILE.write(VerticalHeaders[ColumnCounter] + " -"*12 + " ")
                 ColumnCounter += 1
                 # Points Headings
                 for index in range(len(self.pointDictList[bodyIndex])):
                     if twice == 0:
                         VerticalHeaders.append(self.bodyObjList[bodyIndex].pointLabels[index])
-                        DapResultsFILE.write("Point" + str(index+1) + " x y dx/dt dy/dt ")
+                        HeadingsFILE.write("Point" + str(index+1) + " x y dx/dt dy/dt ")
                     else:
-                        DapResultsFILE.write(VerticalHeaders[ColumnCounter] + " -"*4 + " ")
+                        HeadingsFILE.write(VerticalHeaders[ColumnCounter] + " -"*4 + " ")
                     ColumnCounter += 1
-            # Lambda Headings
+            # Joint Reaction Headings
             if self.numConstraints > 0:
-                for bodyIndex in range(1, self.numBodies):
+                for jointIndex in range(len(self.jointObjList)):
                     if twice == 0:
-                        VerticalHeaders.append(self.bodyObjList[bodyIndex].Label)
-                        DapResultsFILE.write("Lam" + str(bodyIndex) + " x y ")
+                        VerticalHeaders.append(self.jointObjList[jointIndex].Label)
+                        HeadingsFILE.write("Joint" + str(jointIndex+1))
+                        HeadingsFILE.write(" Fx_I(N) Fy_I(N) M_I(Nm) Fxi_I(N) Feta_I(N) Fx_J(N) Fy_J(N) M_J(Nm) Fxi_J(N) Feta_J(N) ")
+                    else:
+                        HeadingsFILE.write(VerticalHeaders[ColumnCounter] + " -"*10 + " ")
+                    ColumnCounter += 1
+            # Constraint Violation Headings
+            if self.constraintViolationOutput and self.numConstraints > 0:
+                for jointIndex in range(len(self.jointObjList)):
+                    if twice == 0:
+                        VerticalHeaders.append(self.jointObjList[jointIndex].Label)
+                        HeadingsFILE.write("Violation" + str(jointIndex+1) + " Position Velocity Acceleration ")
                     else:
-                        DapResultsFILE.write(VerticalHeaders[ColumnCounter] + " - - ")
+                        HeadingsFILE.write(VerticalHeaders[ColumnCounter] + " -"*3 + " ")
                     ColumnCounter += 1
             # Kinetic Energy Headings
             for bodyIndex in range(1, self.numBodies):
                 if twice == 0:
                     VerticalHeaders.append(self.bodyObjList[bodyIndex].Label)
-                    DapResultsFILE.write("Kin" + str(bodyIndex) + " - ")
+                    HeadingsFILE.write("Kin" + str(bodyIndex) + " - ")
                 else:
-                    DapResultsFILE.write(VerticalHeaders[ColumnCounter] + " - ")
+                    HeadingsFILE.write(VerticalHeaders[ColumnCounter] + " - ")
                 ColumnCounter += 1
 
             # Potential Energy Headings
-            for forceIndex in range(self.numForces):
-                forceObj = self.forceObjList[forceIndex]
-                if forceObj.actuatorType == 0:
-                    for bodyIndex in range(1, self.numBodies):
-                        if twice == 0:
-                            VerticalHeaders.append(self.bodyObjList[bodyIndex].Label)
-                            DapResultsFILE.write("Pot" + str(bodyIndex) + " - ")
-                        else:
-                            DapResultsFILE.write(VerticalHeaders[ColumnCounter] + " - ")
-                        ColumnCounter += 1
+            if self.gravityCountNp[0] > 0.0:
+                for bodyIndex in range(1, self.numBodies):
+                    if twice == 0:
+                        VerticalHeaders.append(self.bodyObjList[bodyIndex].Label)
+                        HeadingsFILE.write("Pot" + str(bodyIndex) + " - ")
+                    else:
+                        HeadingsFILE.write(VerticalHeaders[ColumnCounter] + " - ")
+                    ColumnCounter += 1
 
             # Energy Totals Headings
             if twice == 0:
-                DapResultsFILE.write("TotKin TotPot Total\n")
+                HeadingsFILE.write("TotKin TotPot TotElastic Total Dissipated External Balance\n")
             else:
-                DapResultsFILE.write("\n")
-
-        # Do the calculations for each point in time
-        # Plus an extra one at time=0 (with no printing)
-        VerticalCounter = 0
-        TickRange = [0]
-        TickRange += range(numTicks)
-        for timeIndex in TickRange:
+                HeadingsFILE.write("\n")
+
+        # Do the analysis at every point in time once, for the accelerations and the joint reactions
+        self.postProcessResults(timeValues, uResults)
+
+        # The energies at every point in time, with the zero of the potential energy at the first time
+        # which is already known when the rows are added to those of an earlier solution
+        kineticNp, gravityNp, elasticNp, dissipatedNp, externalNp, balanceNp = \
+            self.energyChannels(timeValues, uResults, appendRows)
+
+        # Write the results for each point in time
+        VerticalCounter = self.numWrittenRows if appendRows else 0
+        for timeIndex in range(numTicks):
             tick = timeValues[timeIndex]
             ColumnCounter = 0
-            potEnergy = 0
 
-            # Do the analysis on the stored uResults
-            self.Analysis(tick, uResults[timeIndex])
+            # Restore the state and the accelerations found in postProcessResults
+            self.unpackUArray(uResults[timeIndex])
+            self.updatePointPositions()
+            self.updatePointVelocities()
+            accelNp = self.accelResults[timeIndex].reshape((self.numBodies-1, 3))
+            self.worldDotDotNp[1:] = accelNp[:, 0:2]
+            self.phiDotDotNp[1:] = accelNp[:, 2]
 
             # Write Time
-            if timeIndex != 0:
-                DapResultsFILE.write(str(tick) + " ")
+            DapResultsFILE.write(str(tick) + " ")
 
             # Write All the Bodies position, positionDot, positionDotDot
             for bodyIndex in range(1, self.numBodies):
-                if timeIndex != 0:
-                    # Write Body Name vertically
+                # Write Body Name vertically
+                if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
+                    character = VerticalHeaders[ColumnCounter][VerticalCounter]
+                    if character in "0123456789":
+                        DapResultsFILE.write("'" + character + "' ")
+                    else:
+                        DapResultsFILE.write(character + " ")
+                else:
+                    DapResultsFILE.write("- ")
+
+                ColumnCounter += 1
+                # X Y
+                DapResultsFILE.write(str(self.worldNp[bodyIndex]*1e-3)[1:-1:] + " ")
+                # Phi (rad)
+                DapResultsFILE.write(str(self.phiNp[bodyIndex])[1:-1:] + " ")
+                # Phi (deg)
+                DapResultsFILE.write(str(self.phiNp[bodyIndex] * 180.0 / math.pi)[1:-1:] + " ")
+                # Xdot Ydot
+                DapResultsFILE.write(str(self.worldDotNp[bodyIndex]*1e-3)[1:-1:] + " ")
+                # PhiDot (rad)
+                DapResultsFILE.write(str(self.phiDotNp[bodyIndex])[1:-1:] + " ")
+                # PhiDot (deg)
+                DapResultsFILE.write(str(self.phiDotNp[bodyIndex] * 180.0 / math.pi)[1:-1:] + " ")
+                # Xdotdot Ydotdot
+                DapResultsFILE.write(str(self.worldDotDotNp[bodyIndex]*1e-3)[1:-1:] + " ")
+                # PhiDotDot (rad)
+                DapResultsFILE.write(str(self.phiDotDotNp[bodyIndex])[1:-1:] + " ")
+                # PhiDotDot (deg)
+                DapResultsFILE.write(str(self.phiDotDotNp[bodyIndex] * 180.0 / math.pi)[1:-1:] + " ")
+
+                # Write all the points position and positionDot in the body
+                for index in range(len(self.pointDictList[bodyIndex])):
+                    # Write Point Name vertically
                     if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
                         character = VerticalHeaders[ColumnCounter][VerticalCounter]
                         if character in "0123456789":
@@ -2047,72 +4336,58 @@ class DapMainC:
                         DapResultsFILE.write("- ")
 
                     ColumnCounter += 1
-                    # X Y
-                    DapResultsFILE.write(str(self.worldNp[bodyIndex]*1e-3)[1:-1:] + " ")
-                    # Phi (rad)
-                    DapResultsFILE.write(str(self.phiNp[bodyIndex])[1:-1:] + " ")
-                    # Phi (deg)
-                    DapResultsFILE.write(str(self.phiNp[bodyIndex] * 180.0 / math.pi)[1:-1:] + " ")
-                    # Xdot Ydot
-                    DapResultsFILE.write(str(self.worldDotNp[bodyIndex]*1e-3)[1:-1:] + " ")
-                    # PhiDot (rad)
-                    DapResultsFILE.write(str(self.phiDotNp[bodyIndex])[1:-1:] + " ")
-                    # PhiDot (deg)
-                    DapResultsFILE.write(str(self.phiDotNp[bodyIndex] * 180.0 / math.pi)[1:-1:] + " ")
-                    # Xdotdot Ydotdot
-                    DapResultsFILE.write(str(self.worldDotDotNp[bodyIndex]*1e-3)[1:-1:] + " ")
-                    # PhiDotDot (rad)
-                    DapResultsFILE.write(str(self.phiDotDotNp[bodyIndex])[1:-1:] + " ")
-                    # PhiDotDot (deg)
-                    DapResultsFILE.write(str(self.phiDotDotNp[bodyIndex] * 180.0 / math.pi)[1:-1:] + " ")
+                    # Point X Y
+                    DapResultsFILE.write(str(self.pointXYWorldNp[bodyIndex, index]*1e-3)[1:-1:] + " ")
+                    # Point Xdot Ydot
+                    DapResultsFILE.write(str(self.pointWorldDotNp[bodyIndex, index]*1e-3)[1:-1:] + " ")
 
-                # Write all the points position and positionDot in the body
-                for index in range(len(self.pointDictList[bodyIndex])):
-                    if timeIndex != 0:
-                        # Write Point Name vertically
-                        if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
-                            character = VerticalHeaders[ColumnCounter][VerticalCounter]
-                            if character in "0123456789":
-                                DapResultsFILE.write("'" + character + "' ")
-                            else:
-                                DapResultsFILE.write(character + " ")
+            # Write the joint reactions
+            if self.numConstraints > 0:
+                for jointIndex in range(len(self.jointObjList)):
+                    # Write the Joint Name vertically
+                    if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
+                        character = VerticalHeaders[ColumnCounter][VerticalCounter]
+                        if character in "0123456789":
+                            DapResultsFILE.write("'" + character + "' ")
                         else:
-                            DapResultsFILE.write("- ")
+                            DapResultsFILE.write(character + " ")
+                    else:
+                        DapResultsFILE.write("- ")
 
-                        ColumnCounter += 1
-                        # Point X Y
-                        DapResultsFILE.write(str(self.pointXYWorldNp[bodyIndex, index]*1e-3)[1:-1:] + " ")
-                        # Point Xdot Ydot
-                        DapResultsFILE.write(str(self.pointWorldDotNp[bodyIndex, index]*1e-3)[1:-1:] + " ")
+                    ColumnCounter += 1
+                    DapResultsFILE.write(" ".join(str(value) for value in self.jointReactionResults[timeIndex, jointIndex].flatten()) + " ")
 
-            # Write the Lambdas
-            if self.numConstraints > 0:
-                if timeIndex != 0:
-                    # Lambda
-                    for bodyIndex in range(self.numBodies-1):
-                        # Write the Body Name vertically
-                        if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
-                            character = VerticalHeaders[ColumnCounter][VerticalCounter]
-                            if character in "0123456789":
-                                DapResultsFILE.write("'" + character + "' ")
-                            else:
-                                DapResultsFILE.write(character + " ")
+            # Write the constraint violations
+            if self.constraintViolationOutput and self.numConstraints > 0:
+                for jointIndex in range(len(self.jointObjList)):
+                    # Write the Joint Name vertically
+                    if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
+                        character = VerticalHeaders[ColumnCounter][VerticalCounter]
+                        if character in "0123456789":
+                            DapResultsFILE.write("'" + character + "' ")
                         else:
-                            DapResultsFILE.write("- ")
+                            DapResultsFILE.write(character + " ")
+                    else:
+                        DapResultsFILE.write("- ")
 
-                        ColumnCounter += 1
-                        DapResultsFILE.write(str(self.Lambda[bodyIndex*2] * 1e-3)[1:-1:] + " " + str(self.Lambda[bodyIndex*2 + 1] * 1e-3)[1:-1:] + " ")
+                    ColumnCounter += 1
+                    DapResultsFILE.write(" ".join(str(value) for value in self.constraintViolationResults[timeIndex, jointIndex]) + " ")
 
-            # Compute kinetic and potential energies in Joules
-            totKinEnergy = 0
+            # Kinetic and potential energies in Joules
             for bodyIndex in range(1, self.numBodies):
-                kinEnergy = 0.5e-6 * (
-                        (self.massArrayNp[(bodyIndex-1) * 3] *
-                         (self.worldDotNp[bodyIndex, 0] ** 2 + self.worldDotNp[bodyIndex, 1] ** 2)) +
-                        (self.massArrayNp[(bodyIndex - 1) * 3 + 2] * (self.phiDotNp[bodyIndex] ** 2)))
-
-                # Kinetic Energy (m^2 = mm^2 * 1e-6)
-                if timeIndex != 0:
+                # Body Name vertically
+                if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
+                    character = VerticalHeaders[ColumnCounter][VerticalCounter]
+                    if character in "0123456789":
+                        DapResultsFILE.write("'" + character + "' ")
+                    else:
+                        DapResultsFILE.write(character + " ")
+                else:
+                    DapResultsFILE.write("- ")
+                ColumnCounter += 1
+                DapResultsFILE.write(str(kineticNp[timeIndex, bodyIndex-1]) + " ")
+            if self.gravityCountNp[0] > 0.0:
+                for bodyIndex in range(1, self.numBodies):
                     # Body Name vertically
                     if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
                         character = VerticalHeaders[ColumnCounter][VerticalCounter]
@@ -2123,251 +4398,131 @@ class DapMainC:
                     else:
                         DapResultsFILE.write("- ")
                     ColumnCounter += 1
-                    DapResultsFILE.write(str(kinEnergy)[1:-1:] + " ")
-                totKinEnergy += kinEnergy
-
-            # Currently, calculate only gravitational potential energy
-            totPotEnergy = 0
-            for forceIndex in range(self.numForces):
-                forceObj = self.forceObjList[forceIndex]
-                # Potential Energy
-                potEnergy = 0
-                if forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Gravity"]:
-                    for bodyIndex in range(1, self.numBodies):
-                        potEnergy = -self.WeightNp[bodyIndex].dot(self.worldNp[bodyIndex]) * 1e-6 - self.potEnergyZeroPointNp[bodyIndex]
-                        totPotEnergy += potEnergy
-                        if timeIndex == 0:
-                            self.potEnergyZeroPointNp[bodyIndex] = potEnergy
-                        else:
-                            # Body Name vertically
-                            if VerticalCounter < len(VerticalHeaders[ColumnCounter]):
-                                character = VerticalHeaders[ColumnCounter][VerticalCounter]
-                                if character in "0123456789":
-                                    DapResultsFILE.write("'" + character + "' ")
-                                else:
-                                    DapResultsFILE.write(character + " ")
-                            else:
-                                DapResultsFILE.write("- ")
-                            ColumnCounter += 1
-                            DapResultsFILE.write(str(potEnergy) + " ")
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Spring"] or \
-                    forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Linear Spring Damper"]:
-                    # potEnergy += 0.5 * forceObj.k * delta**2
-                    pass
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Rotational Spring"] or \
-                        forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Rotational Spring Damper"]:
-                    pass
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Force Local to Body"]:
-                    pass
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Global Force"]:
-                    pass
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Torque about a Point"]:
-                    pass
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Contact Friction"]:
-                    pass
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Unilateral Spring Damper"]:
-                    pass
+                    DapResultsFILE.write(str(gravityNp[timeIndex, bodyIndex-1]) + " ")
 
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Motor"]:
-                    pass
-
-                elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Motor with Air Friction"]:
-                    pass
-
-            if timeIndex == 0:
-                VerticalCounter = 0
-            else:
-                DapResultsFILE.write(str(totKinEnergy) + " ")
-                DapResultsFILE.write(str(totPotEnergy) + " ")
-                DapResultsFILE.write(str(totKinEnergy + totPotEnergy) + " ")
-                DapResultsFILE.write("\n")
-                VerticalCounter += 1
+            # Energy totals and the work of the dampers and of everything else
+            totKinEnergy = kineticNp[timeIndex].sum()
+            totPotEnergy = gravityNp[timeIndex].sum()
+            DapResultsFILE.write(str(totKinEnergy) + " ")
+            DapResultsFILE.write(str(totPotEnergy) + " ")
+            DapResultsFILE.write(str(elasticNp[timeIndex]) + " ")
+            DapResultsFILE.write(str(totKinEnergy + totPotEnergy + elasticNp[timeIndex]) + " ")
+            DapResultsFILE.write(str(dissipatedNp[timeIndex]) + " ")
+            DapResultsFILE.write(str(externalNp[timeIndex]) + " ")
+            DapResultsFILE.write(str(balanceNp[timeIndex]) + " ")
+            DapResultsFILE.write("\n")
+            VerticalCounter += 1
         # Next timeIndex
 
         DapResultsFILE.close()
     #  -------------------------------------------------------------------------
-    def makeForceArray(self):
+    def makeForceArray(self, tick):
+        """Add up the forces and moments of all the force elements on each body at time tick
+        Every state dependent force type is evaluated for all its elements at once
+        from the arrays set up by compileForceElements"""
         if Debug:
             DT.Mess("DapMainC - makeForceArray")
 
-        # Reset all forces and moments to zero
-        for bodyIndex in range(1, self.numBodies):
-            self.sumForcesNp[bodyIndex] = np.zeros((2,), dtype=np.float64)
-            self.sumMomentsNp[bodyIndex] = np.zeros((1,), dtype=np.float64)
+        # Start from the loads which depend neither on the time nor on the state
+        # i.e. gravity, constant world forces and constant torques
+        # Anything accumulated on the ground (body 0) is never used
+        self.sumForcesNp[:] = self.constantForcesNp
+        self.sumMomentsNp[:] = self.constantMomentsNp
 
-        # Add up all the body force vectors for all the bodies
-        for forceIndex in range(self.numForces):
-            forceObj = self.forceObjList[forceIndex]
-            if forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Gravity"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                #        case {'weight'}
-                #            for Bi=1:nB
-                #                Bodies(Bi).f = Bodies(Bi).f + Bodies(Bi).wgt;
-                #            end
-                for bodyIndex in range(1, self.numBodies):
-                    self.sumForcesNp[bodyIndex] += self.WeightNp[bodyIndex]
+        # ==================================
+        # Matlab Code from Nikravesh: DAP_BC
+        # ==================================
+        #        case {'ptp'}
+        # % Point-to-point spring-damper-actuator
+        #  d  = Points(Pi).rP - Points(Pj).rP;
+        #  d_dot = Points(Pi).rP_d - Points(Pj).rP_d;
+        #  L  = sqrt(d'*d);
+        #  L_dot = d'*d_dot/L;
+        #  del = L - Forces(Fi).L0;
+        #  u = d/L;
+        #  f = Forces(Fi).k*del + Forces(Fi).dc*L_dot + Forces(Fi).f_a;
+        #  fi = f*u;
+        #  Bodies(Bi).f = Bodies(Bi).f - fi;
+        #  Bodies(Bi).n = Bodies(Bi).n - Points(Pi).sP_r'*fi;
+        #  Bodies(Bj).f = Bodies(Bj).f + fi;
+        #  Bodies(Bj).n = Bodies(Bj).n + Points(Pj).sP_r'*fi;
+        # ==================================
+        if len(self.springForceIndexNp) > 0:
+            diffNp = self.pointXYWorldNp[self.springBodyINp, self.springPointINp] - \
+                     self.pointXYWorldNp[self.springBodyJNp, self.springPointJNp]
+            diffDotNp = self.pointWorldDotNp[self.springBodyINp, self.springPointINp] - \
+                        self.pointWorldDotNp[self.springBodyJNp, self.springPointJNp]
+            lengthNp = np.sqrt(np.einsum("ij,ij->i", diffNp, diffNp))
+            lengthDotNp = np.einsum("ij,ij->i", diffNp, diffDotNp) / lengthNp
+            # Find the component of the force in the direction of
+            # the vector between the head and the tail of the force
+            forceNp = self.springStiffnessNp * (lengthNp - self.springLength0Np) + \
+                      self.springDampingNp * lengthDotNp + self.springActuatorNp
+            # Elements with a ForceLaw replace the linear law with their own
+            for positionNp, forceLaw in self.springLawList:
+                bodyNp = self.springBodyINp[positionNp]
+                forceNp[positionNp] = forceLaw.evaluate(
+                    [tick, lengthNp[positionNp] - self.springLength0Np[positionNp], lengthDotNp[positionNp],
+                     lengthNp[positionNp], self.phiNp[bodyNp], self.phiDotNp[bodyNp],
+                     self.springStiffnessNp[positionNp], self.springDampingNp[positionNp],
+                     self.springLength0Np[positionNp], self.springActuatorNp[positionNp]],
+                    self.allDriverValues(tick)[0] if len(forceLaw.driveColumns) > 0 else None)
+            self.forceValueNp[self.springForceIndexNp] = forceNp
+            forceUnitNp = diffNp * (forceNp / lengthNp)[:, np.newaxis]
+            np.add.at(self.sumForcesNp, self.springBodyINp, -forceUnitNp)
+            np.add.at(self.sumForcesNp, self.springBodyJNp, forceUnitNp)
+            np.add.at(self.sumMomentsNp, self.springBodyINp,
+                      -np.einsum("ij,ij->i", self.pointXYrelCoGrotNp[self.springBodyINp, self.springPointINp], forceUnitNp))
+            np.add.at(self.sumMomentsNp, self.springBodyJNp,
+                      np.einsum("ij,ij->i", self.pointXYrelCoGrotNp[self.springBodyJNp, self.springPointJNp], forceUnitNp))
 
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Spring"] or \
-                    forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Linear Spring Damper"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                #        case {'ptp'}
-                # % Point-to-point spring-damper-actuator
-                #  Pi = Forces(Fi).iPindex;
-                #  Pj = Forces(Fi).jPindex;
-                #  Bi = Forces(Fi).iBindex;
-                #  Bj = Forces(Fi).jBindex;
-                #  d  = Points(Pi).rP - Points(Pj).rP;
-                #  d_dot = Points(Pi).rP_d - Points(Pj).rP_d;
-                #  L  = sqrt(d'*d);
-                #  L_dot = d'*d_dot/L;
-                #  del = L - Forces(Fi).L0;
-                #  u = d/L;
-                #
-                #  f = Forces(Fi).k*del + Forces(Fi).dc*L_dot + Forces(Fi).f_a;
-                #  fi = f*u;
-                #  if Bi ~= 0
-                #    Bodies(Bi).f = Bodies(Bi).f - fi;
-                #    Bodies(Bi).n = Bodies(Bi).n - Points(Pi).sP_r'*fi;
-                #  end
-                #  if Bj ~= 0
-                #    Bodies(Bj).f = Bodies(Bj).f + fi;
-                #    Bodies(Bj).n = Bodies(Bj).n + Points(Pj).sP_r'*fi;
-                #  end
-
-                diffNp = self.pointXYWorldNp[forceObj.body_I_Index, forceObj.point_i_Index] - \
-                       self.pointXYWorldNp[forceObj.body_J_Index, forceObj.point_j_Index]
-                diffDotNp = self.pointWorldDotNp[forceObj.body_I_Index, forceObj.point_i_Index] - \
-                       self.pointWorldDotNp[forceObj.body_J_Index, forceObj.point_j_Index]
-                length = np.sqrt(diffNp.dot(diffNp))
-                lengthDot = (diffNp.dot(diffDotNp))/length
-                delta = length - forceObj.LengthAngle0
-                unitVecNp = diffNp/length
-                # Find the component of the force in the direction of
-                # the vector between the head and the tail of the force
-                force = forceObj.Stiffness * delta + forceObj.DampingCoeff * lengthDot + forceObj.ForceMagnitude
-                forceUnitNp = unitVecNp * force
-                if forceObj.body_I_Index != 0:
-                    self.sumForcesNp[forceObj.body_I_Index] -= forceUnitNp
-                    self.sumMomentsNp[forceObj.body_I_Index] -= (self.pointXYrelCoGrotNp[forceObj.body_I_Index, forceObj.point_i_Index]).dot(forceUnitNp)
-                if forceObj.body_J_Index != 0:
-                    self.sumForcesNp[forceObj.body_J_Index] += forceUnitNp
-                    self.sumMomentsNp[forceObj.body_J_Index] += self.pointXYrelCoGrotNp[forceObj.body_J_Index, forceObj.point_j_Index].dot(forceUnitNp)
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Rotational Spring"] or \
-                    forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Rotational Spring Damper"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                #        case {'rot-sda'}
-                # % Rotational spring-damper-actuator
-                #
-                #  Bi = Forces(Fi).iBindex;
-                #  Bj = Forces(Fi).jBindex;
-                #
-                #    if Bi == 0
-                #        theta   = -Bodies(Bj).p;
-                #        theta_d = -Bodies(Bj).p_d;
-                #        T = Forces(Fi).k*(theta - Forces(Fi).theta0) + ...
-                #            Forces(Fi).dc*theta_d + Forces(Fi).T_a;
-                #        Bodies(Bj).n = Bodies(Bj).n + T;
-                #    elseif Bj == 0
-                #        theta   = Bodies(Bi).p;
-                #        theta_d = Bodies(Bi).p_d;
-                #        T = Forces(Fi).k*(theta - Forces(Fi).theta0) + ...
-                #            Forces(Fi).dc*theta_d + Forces(Fi).T_a;
-                #        Bodies(Bi).n = Bodies(Bi).n - T;
-                #    else
-                #        theta   = Bodies(Bi).p - Bodies(Bj).p;
-                #        theta_d = Bodies(Bi).p_d - Bodies(Bj).p_d;
-                #        T = Forces(Fi).k*(theta - Forces(Fi).theta0) + ...
-                #            Forces(Fi).dc*theta_d + Forces(Fi).T_a;
-                #        Bodies(Bi).n = Bodies(Bi).n - T;
-                #        Bodies(Bj).n = Bodies(Bj).n + T;
-                #    end
-                if forceObj.body_I_Index == 0:
-                    theta = -self.phiNp[forceObj.body_J_Index]
-                    thetaDot = -self.phiDotNp[forceObj.body_J_Index]
-                    Torque = forceObj.Stiffness * (theta - forceObj.LengthAngle0) + \
-                             forceObj.DampingCoeff * thetaDot + \
-                             forceObj.TorqueMagnitude
-                    self.sumMomentsNp[forceObj.body_J_Index] += Torque
-                elif forceObj.body_J_Index == 0:
-                    theta = self.phiNp[forceObj.body_I_Index]
-                    thetaDot = self.phiDotNp[forceObj.body_I_Index]
-                    Torque = forceObj.Stiffness * (theta - forceObj.LengthAngle0) + \
-                             forceObj.DampingCoeff * thetaDot + \
-                             forceObj.TorqueMagnitude
-                    self.sumMomentsNp[forceObj.body_I_Index] -= Torque
-                else:
-                    theta = self.phiNp[forceObj.body_I_Index] - self.phiNp[forceObj.body_J_Index]
-                    thetaDot = self.phiDotNp[forceObj.body_I_Index] - self.phiDotNp[forceObj.body_J_Index]
-                    Torque = forceObj.Stiffness * (theta - forceObj.LengthAngle0) + \
-                             forceObj.DampingCoeff * thetaDot + \
-                             forceObj.TorqueMagnitude
-                    self.sumMomentsNp[forceObj.body_I_Index] -= Torque
-                    self.sumMomentsNp[forceObj.body_J_Index] += Torque
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Unilateral Spring Damper"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                # TODO: Future implementation - not explicitly handled by Nikravesh
-                DT.Console.PrintError("Still in development\n")
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Force Local to Body"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                #        case {'flocal'}
-                #            Bi = Forces(Fi).iBindex;
-                #            Bodies(Bi).f = Bodies(Bi).f + Bodies(Bi).A*Forces(Fi).flocal;
-                self.sumForcesNp[forceObj.body_I_Index] += self.RotMatPhiNp[forceObj.body_I_Index] @ forceObj.constLocalForce
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Global Force"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                #        case {'f'}
-                #            Bi = Forces(Fi).iBindex;
-                #            Bodies(Bi).f = Bodies(Bi).f + Forces(Fi).f;
-                self.sumForcesNp[forceObj.body_I_Index, 0] += forceObj.constWorldForce[0]
-                self.sumForcesNp[forceObj.body_I_Index, 1] += forceObj.constWorldForce[1]
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Constant Torque about a Point"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                #        case {'T'}
-                #            Bi = Forces(Fi).iBindex;
-                #            Bodies(Bi).n = Bodies(Bi).n + Forces(Fi).T;
-                self.sumMomentsNp[forceObj.body_I_Index] += forceObj.constTorque
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Contact Friction"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                # TODO: Future implementation - not explicitly handled by Nikravesh
-                DT.Console.PrintError("Still in development\n")
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Motor"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                # TODO: Future implementation - not explicitly handled by Nikravesh
-                DT.Console.PrintError("Still in development\n")
-            elif forceObj.actuatorType == DT.FORCE_TYPE_DICTIONARY["Motor with Air Friction"]:
-                # ==================================
-                # Matlab Code from Nikravesh: DAP_BC
-                # ==================================
-                # TODO: Future implementation - not explicitly handled by Nikravesh
-                CAD.Console.PrintError("Still in development\n")
-            else:
-                CAD.Console.PrintError("Unknown Force type - this should never occur\n")
-        # Next forceIndex
+        # ==================================
+        # Matlab Code from Nikravesh: DAP_BC
+        # ==================================
+        #        case {'rot-sda'}
+        # % Rotational spring-damper-actuator
+        #        theta   = Bodies(Bi).p - Bodies(Bj).p;
+        #        theta_d = Bodies(Bi).p_d - Bodies(Bj).p_d;
+        #        T = Forces(Fi).k*(theta - Forces(Fi).theta0) + ...
+        #            Forces(Fi).dc*theta_d + Forces(Fi).T_a;
+        #        Bodies(Bi).n = Bodies(Bi).n - T;
+        #        Bodies(Bj).n = Bodies(Bj).n + T;
+        # ==================================
+        # The masks take care of the cases where Bi or Bj is the ground
+        if len(self.rotSpringForceIndexNp) > 0:
+            thetaNp = self.rotSpringMaskINp * self.phiNp[self.rotSpringBodyINp] - \
+                      self.rotSpringMaskJNp * self.phiNp[self.rotSpringBodyJNp]
+            thetaDotNp = self.rotSpringMaskINp * self.phiDotNp[self.rotSpringBodyINp] - \
+                         self.rotSpringMaskJNp * self.phiDotNp[self.rotSpringBodyJNp]
+            torqueNp = self.rotSpringStiffnessNp * (thetaNp - self.rotSpringAngle0Np) + \
+                       self.rotSpringDampingNp * thetaDotNp + self.rotSpringActuatorNp
+            # Elements with a ForceLaw (and the motors) replace the linear law with their own
+            for positionNp, forceLaw in self.rotSpringLawList:
+                bodyNp = self.rotSpringBodyINp[positionNp]
+                torqueNp[positionNp] = forceLaw.evaluate(
+                    [tick, thetaNp[positionNp] - self.rotSpringAngle0Np[positionNp], thetaDotNp[positionNp],
+                     thetaNp[positionNp], self.phiNp[bodyNp], self.phiDotNp[bodyNp],
+                     self.rotSpringStiffnessNp[positionNp], self.rotSpringDampingNp[positionNp],
+                     self.rotSpringAngle0Np[positionNp], self.rotSpringActuatorNp[positionNp]],
+                    self.allDriverValues(tick)[0] if len(forceLaw.driveColumns) > 0 else None)
+            self.forceValueNp[self.rotSpringForceIndexNp] = torqueNp
+            np.add.at(self.sumMomentsNp, self.rotSpringBodyINp, -torqueNp)
+            np.add.at(self.sumMomentsNp, self.rotSpringBodyJNp, torqueNp)
+
+        # ==================================
+        # Matlab Code from Nikravesh: DAP_BC
+        # ==================================
+        #        case {'flocal'}
+        #            Bi = Forces(Fi).iBindex;
+        #            Bodies(Bi).f = Bodies(Bi).f + Bodies(Bi).A*Forces(Fi).flocal;
+        # ==================================
+        if len(self.localForceIndexNp) > 0:
+            np.add.at(self.sumForcesNp, self.localForceBodyNp,
+                      np.einsum("nij,nj->ni", self.RotMatPhiNp[self.localForceBodyNp], self.localForceXiEtaNp))
+
+        # Contact and friction forces - see DapContactMod
+        if self.contactEngine is not None:
+            self.contactEngine.addContactForces(self)
 
         # ==================================
         # Matlab Code from Nikravesh: DAP_BC
@@ -2380,13 +4535,110 @@ class DapMainC:
         # ==================================
         # The force array has three values for every body
         # x and y are the sum of forces and z is the sum of moments
-        for bodyIndex in range(1, self.numBodies):
-            self.forceArrayNp[(bodyIndex - 1) * 3: bodyIndex * 3 - 1] = self.sumForcesNp[bodyIndex]
-            self.forceArrayNp[bodyIndex * 3 - 1] = self.sumMomentsNp[bodyIndex]
+        forceArrayRowsNp = self.forceArrayNp.reshape((-1, 3))
+        forceArrayRowsNp[:, 0:2] = self.sumForcesNp[1:]
+        forceArrayRowsNp[:, 2] = self.sumMomentsNp[1:]
         if Debug:
             DT.MessNoLF("Force Array:  ")
             DT.Np1D(True, self.forceArrayNp)
     #  =========================================================================
+    def stiffnessMatrix(self):
+        """Return the stiffness matrix K = -d(forceArray)/dq of the force elements, with respect to the
+        coordinates of the moving bodies, at the current positions (with the bodies at rest)
+        makeForceArray must have been called at these positions
+        Springs with a ForceLaw are taken as having their Stiffness as dF/dL, and contacts are not included"""
+        if Debug:
+            DT.Mess("DapMainC-stiffnessMatrix")
+        # d(force)/d(coordinates) for all the bodies including the ground, whose rows and columns are dropped at the end
+        gradientNp = np.zeros((self.numBodies * 3, self.numBodies * 3), dtype=np.float64)
+
+        # Point-to-point springs: the force vector f = F(L) d/L on the tail and -f on the head
+        # d(f)/d(d) = k u u^T + F/L (I - u u^T)  and  d(d)/d(q) = [I | s_rotated] for the head (minus that for the tail)
+        if len(self.springForceIndexNp) > 0:
+            diffNp = self.pointXYWorldNp[self.springBodyINp, self.springPointINp] - \
+                     self.pointXYWorldNp[self.springBodyJNp, self.springPointJNp]
+            lengthNp = np.sqrt(np.einsum("ij,ij->i", diffNp, diffNp))
+            unitNp = diffNp / lengthNp[:, np.newaxis]
+            forceNp = self.forceValueNp[self.springForceIndexNp]
+            outerNp = np.einsum("ni,nj->nij", unitNp, unitNp)
+            forceGradientNp = self.springStiffnessNp[:, np.newaxis, np.newaxis] * outerNp + \
+                              (forceNp / lengthNp)[:, np.newaxis, np.newaxis] * (np.eye(2) - outerNp)
+            self.addSpringGradient(gradientNp, forceGradientNp)
+            # The moment arms turn with the bodies
+            forceVectorNp = unitNp * forceNp[:, np.newaxis]
+            np.add.at(gradientNp, (3 * self.springBodyINp + 2, 3 * self.springBodyINp + 2),
+                      np.einsum("ij,ij->i", self.pointXYrelCoGNp[self.springBodyINp, self.springPointINp], forceVectorNp))
+            np.add.at(gradientNp, (3 * self.springBodyJNp + 2, 3 * self.springBodyJNp + 2),
+                      -np.einsum("ij,ij->i", self.pointXYrelCoGNp[self.springBodyJNp, self.springPointJNp], forceVectorNp))
+
+        # Rotational springs: the torque is k (phi_i - phi_j - theta0) + ...
+        if len(self.rotSpringForceIndexNp) > 0:
+            rowINp = 3 * self.rotSpringBodyINp + 2
+            rowJNp = 3 * self.rotSpringBodyJNp + 2
+            np.add.at(gradientNp, (rowINp, rowINp), -self.rotSpringStiffnessNp)
+            np.add.at(gradientNp, (rowINp, rowJNp), self.rotSpringStiffnessNp)
+            np.add.at(gradientNp, (rowJNp, rowINp), self.rotSpringStiffnessNp)
+            np.add.at(gradientNp, (rowJNp, rowJNp), -self.rotSpringStiffnessNp)
+
+        # Constant forces local to a body turn with the body
+        if len(self.localForceIndexNp) > 0:
+            forceWorldNp = np.einsum("nij,nj->ni", self.RotMatPhiNp[self.localForceBodyNp], self.localForceXiEtaNp)
+            np.add.at(gradientNp, (3 * self.localForceBodyNp, 3 * self.localForceBodyNp + 2), -forceWorldNp[:, 1])
+            np.add.at(gradientNp, (3 * self.localForceBodyNp + 1, 3 * self.localForceBodyNp + 2), forceWorldNp[:, 0])
+
+        return -gradientNp[3:, 3:]
+    #  =========================================================================
+    def dampingMatrix(self):
+        """Return the damping matrix C = -d(forceArray)/d(q dot) of the dampers, with respect to the
+        velocities of the moving bodies, at the current positions
+        Springs with a ForceLaw are taken as having their DampingCoeff as dF/d(L dot), and friction is not included"""
+        if Debug:
+            DT.Mess("DapMainC-dampingMatrix")
+        gradientNp = np.zeros((self.numBodies * 3, self.numBodies * 3), dtype=np.float64)
+
+        # Point-to-point dampers: d(f)/d(d dot) = c u u^T
+        if len(self.springForceIndexNp) > 0:
+            diffNp = self.pointXYWorldNp[self.springBodyINp, self.springPointINp] - \
+                     self.pointXYWorldNp[self.springBodyJNp, self.springPointJNp]
+            unitNp = diffNp / np.sqrt(np.einsum("ij,ij->i", diffNp, diffNp))[:, np.newaxis]
+            self.addSpringGradient(gradientNp,
+                                   self.springDampingNp[:, np.newaxis, np.newaxis] * np.einsum("ni,nj->nij", unitNp, unitNp))
+
+        # Rotational dampers: the torque is c (phi_i dot - phi_j dot) + ...
+        if len(self.rotSpringForceIndexNp) > 0:
+            rowINp = 3 * self.rotSpringBodyINp + 2
+            rowJNp = 3 * self.rotSpringBodyJNp + 2
+            np.add.at(gradientNp, (rowINp, rowINp), -self.rotSpringDampingNp)
+            np.add.at(gradientNp, (rowINp, rowJNp), self.rotSpringDampingNp)
+            np.add.at(gradientNp, (rowJNp, rowINp), self.rotSpringDampingNp)
+            np.add.at(gradientNp, (rowJNp, rowJNp), -self.rotSpringDampingNp)
+
+        return -gradientNp[3:, 3:]
+    #  =========================================================================
+    def addSpringGradient(self, gradientNp, forceGradientNp):
+        """Add the derivatives of the point-to-point spring forces on their two bodies to gradientNp
+        given the derivative forceGradientNp (one 2x2 matrix per spring) of each spring's force vector
+        with respect to the vector between its points, or its rate of change
+        That vector changes by [I | s_rotated] times the change of the head body's coordinates
+        (minus the same for the tail body)"""
+        if Debug:
+            DT.Mess("DapMainC-addSpringGradient")
+        GINp = np.zeros((len(forceGradientNp), 2, 3), dtype=np.float64)
+        GINp[:, :, 0:2] = np.eye(2)
+        GINp[:, :, 2] = self.pointXYrelCoGrotNp[self.springBodyINp, self.springPointINp]
+        GJNp = GINp.copy()
+        GJNp[:, :, 2] = self.pointXYrelCoGrotNp[self.springBodyJNp, self.springPointJNp]
+        rowsINp = (3 * self.springBodyINp)[:, np.newaxis] + np.arange(3)
+        rowsJNp = (3 * self.springBodyJNp)[:, np.newaxis] + np.arange(3)
+        np.add.at(gradientNp, (rowsINp[:, :, np.newaxis], rowsINp[:, np.newaxis, :]),
+                  -np.einsum("nki,nkl,nlj->nij", GINp, forceGradientNp, GINp))
+        np.add.at(gradientNp, (rowsINp[:, :, np.newaxis], rowsJNp[:, np.newaxis, :]),
+                  np.einsum("nki,nkl,nlj->nij", GINp, forceGradientNp, GJNp))
+        np.add.at(gradientNp, (rowsJNp[:, :, np.newaxis], rowsINp[:, np.newaxis, :]),
+                  np.einsum("nki,nkl,nlj->nij", GJNp, forceGradientNp, GINp))
+        np.add.at(gradientNp, (rowsJNp[:, :, np.newaxis], rowsJNp[:, np.newaxis, :]),
+                  -np.einsum("nki,nkl,nlj->nij", GJNp, forceGradientNp, GJNp))
+    #  =========================================================================
     def initNumPyArrays(self, maxNumPoints):
         # Initialize all the NumPy arrays with zeros
 
@@ -2406,6 +4658,8 @@ class DapMainC:
         self.phiDotDotNp = np.zeros((self.numBodies,), dtype=np.float64)
         self.RotMatPhiNp = np.zeros((self.numBodies, 2, 2,), dtype=np.float64)
         self.potEnergyZeroPointNp = np.zeros((self.numBodies,), dtype=np.float64)
+        # Carried from one part of the solution to the next - see energyChannels
+        self.energyAccountNp = np.zeros((6,), dtype=np.float64)
 
         # Parameters for each point within a body, for each body
         # Vector from CoG to the point in body local coordinates
@@ -2435,6 +4689,8 @@ class DapMainC:
         self.jointUnit_J_WorldDotRotNp = np.zeros((self.numJoints, 2,), dtype=np.float64)
 
         self.forceArrayNp = np.zeros((self.numMovBodiesx3,), dtype=np.float64)
+        # The magnitude of each force (or torque) as last calculated by makeForceArray
+        self.forceValueNp = np.zeros((self.numForces,), dtype=np.float64)
     #  -------------------------------------------------------------------------
     def dumps(self):
         if Debug:
@@ -2448,3 +4704,36 @@ class DapMainC:
             self.Type = state
         return None
     #  =========================================================================
+# =============================================================================
+class DapObjectRecordC:
+    """A detached copy of the properties of a NikraDAP body, joint or force object
+    The solver works with these, so the solution neither depends on nor writes into
+    the FreeCAD document, and a compiled model can be pickled to other processes"""
+    #  -------------------------------------------------------------------------
+    def __init__(self, dapObject=None, **properties):
+        if Debug:
+            DT.Mess("DapObjectRecordC-__init__")
+        if dapObject is not None:
+            self.Name = dapObject.Name
+            for propertyName in dapObject.PropertiesList:
+                value = getattr(dapObject, propertyName)
+                if isinstance(value, CAD.Vector):
+                    setattr(self, propertyName, CAD.Vector(value))
+                elif isinstance(value, RECORD_PROPERTY_TYPES):
+                    setattr(self, propertyName, copy.copy(value))
+        # Properties can also be given (or overridden) explicitly
+        for propertyName, value in properties.items():
+            setattr(self, propertyName, value)
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("DapObjectRecordC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("DapObjectRecordC-loads")
+        if state:
+            self.Type = state
+        return None
+    #  =========================================================================
@@ -377,6 +377,7 @@ class TaskPanelDapMaterialClass:
         for bodyName in bodyObjDict:
             bodyObj = bodyObjDict[bodyName]
             DT.computeCoGAndMomentInertia(bodyObj)
+        DT.saveMassPropertyCache()
 
         # Update all the stuff by asking for a re-compute
         self.materialTaskObject.recompute()
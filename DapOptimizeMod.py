@@ -0,0 +1,311 @@
+# ********************************************************************************
+# *                                                                              *
+# *   This program is free software; you can redistribute it and/or modify       *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)         *
+# *   as published by the Free Software Foundation; either version 3 of          *
+# *   the License, or (at your option) any later version.                        *
+# *   for detail see the LICENCE text file.                                      *
+# *                                                                              *
+# *   This program is distributed in the hope that it will be useful,            *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of             *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       *
+# *   See the GNU Lesser General Public License for more details.                *
+# *                                                                              *
+# *   You should have received a copy of the GNU Lesser General Public           *
+# *   License along with this program; if not, write to the Free Software        *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston,                      *
+# *   MA 02111-1307, USA                                                         *
+# *_____________________________________________________________________________ *
+# *                                                                              *
+# *        ##########################################################            *
+# *       #### Nikra-DAP FreeCAD WorkBench Revision 2.1 (c) 2024: ####           *
+# *        ##########################################################            *
+# *                                                                              *
+# *                     Authors of this workbench:                               *
+# *                   Cecil Churms <churms@gmail.com>                            *
+# *             Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                 *
+# *                                                                              *
+# *               This file is a sizeable expansion of the:                      *
+# *                "Nikra-DAP-Rev-1" workbench for FreeCAD                       *
+# *        with increased functionality and inherent code documentation          *
+# *                  by means of expanded variable naming                        *
+# *                                                                              *
+# *     Which in turn, is based on the MATLAB code Complementary to              *
+# *                  Chapters 7 and 8 of the textbook:                           *
+# *                                                                              *
+# *                     "PLANAR MULTIBODY DYNAMICS                               *
+# *         Formulation, Programming with MATLAB, and Applications"              *
+# *                          Second Edition                                      *
+# *                         by P.E. Nikravesh                                    *
+# *                          CRC Press, 2018                                     *
+# *                                                                              *
+# *     Authors of Rev-1:                                                        *
+# *            Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>         *
+# *            Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                  *
+# *            Dewald Hattingh (UP) <u17082006@tuks.co.za>                       *
+# *            Varnu Govender (UP) <govender.v@tuks.co.za>                       *
+# *                                                                              *
+# * Copyright (c) 2024 Cecil Churms <churms@gmail.com>                           *
+# * Copyright (c) 2024 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>          *
+# * Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za> *
+# * Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>               *
+# * Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>               *
+# *                                                                              *
+# *             Please refer to the Documentation and README for                 *
+# *         more information regarding this WorkBench and its usage              *
+# *                                                                              *
+# ********************************************************************************
+import FreeCAD as CAD
+
+import os
+import json
+import time
+import concurrent.futures
+import numpy as np
+from scipy.optimize import minimize, differential_evolution
+
+import DapToolsMod as DT
+import DapMainMod
+
+Debug = False
+# =============================================================================
+# The optimizer varies some parameters of a compiled model (the design variables,
+# e.g. spring stiffness, damping, link lengths or driver coefficients) within
+# their bounds to minimise an objective which is evaluated on the solution
+# Every candidate design is solved headless from the compiled model, and the
+# candidates of each iteration (the finite difference points of the gradient,
+# or the population of differential evolution) are solved in parallel
+#
+# Example of use from the FreeCAD Python console:
+#   import DapBatchMod, DapOptimizeMod
+#   model = DapBatchMod.compileActiveModel(2.0, 0.01, 5, True)
+#   optimizer = DapOptimizeMod.DapOptimizeC(model, 2.0, 0.01, 5, True)
+#   result = optimizer.optimize([("DapForce001.Stiffness", 50.0, 500.0), ("DapForce001.DampingCoeff", 0.0, 20.0)],
+#                               {"type": "settlingTime", "body": "DapBody001", "coordinate": "phi", "band": 0.02},
+#                               "/tmp/optimize")
+# =============================================================================
+# The types of objective which can be minimised, with their (optional) parameters
+# peakReaction     largest reaction force [N] in a joint (or in any joint if none is given)
+# maxAcceleration  largest acceleration [m/s^2] of the CoG of a body (or of any body if none is given)
+# settlingTime     time [s] after which a coordinate (x, y or phi) of a body stays within band times
+#                  its largest deviation from its final value
+OBJECTIVE_PARAMETERS = {"peakReaction": ["joint"],
+                        "maxAcceleration": ["body"],
+                        "settlingTime": ["body", "coordinate", "band"]}
+# The objective value of a candidate design which could not be solved
+OPTIMIZE_FAILED_OBJECTIVE = 1.0e30
+# Step of the finite differences for the gradient, as a fraction of the range of each design variable
+OPTIMIZE_DIFFERENCE_STEP = 1.0e-3
+# The history of all the candidate designs is written to this file in the optimize directory
+OPTIMIZE_HISTORY_FILE_NAME = "DapOptimizeHistory.json"
+# =============================================================================
+def peakReaction(mainInstance, objective):
+    """Return the largest reaction force [N] in the joint objective["joint"] (or any joint) over the solution"""
+    if Debug:
+        DT.Mess("peakReaction")
+    jointName = objective.get("joint", "")
+    peak = 0.0
+    if mainInstance.numConstraints == 0:
+        return peak
+    for timeIndex in range(len(mainInstance.timeValues)):
+        mainInstance.Analysis(mainInstance.timeValues[timeIndex], mainInstance.uResults[timeIndex])
+        for jointObj in mainInstance.jointObjList:
+            if jointName != "" and jointObj.Name != jointName:
+                continue
+            JacobianHead, JacobianTail = mainInstance.dictJacobianFunctions[jointObj.JointType](jointObj)
+            reactionNp = JacobianHead.T @ mainInstance.Lambda[jointObj.rowStart: jointObj.rowEnd]
+            peak = max(peak, np.hypot(reactionNp[0], reactionNp[1]) * 1e-3)
+    return peak
+#  -------------------------------------------------------------------------
+def maxAcceleration(mainInstance, objective):
+    """Return the largest acceleration [m/s^2] of the CoG of body objective["body"] (or any body) over the solution"""
+    if Debug:
+        DT.Mess("maxAcceleration")
+    bodyName = objective.get("body", "")
+    bodyIndices = [bodyIndex for bodyIndex in range(1, mainInstance.numBodies)
+                   if bodyName == "" or mainInstance.bodyObjList[bodyIndex].Name == bodyName]
+    peak = 0.0
+    for timeIndex in range(len(mainInstance.timeValues)):
+        mainInstance.Analysis(mainInstance.timeValues[timeIndex], mainInstance.uResults[timeIndex])
+        accelerationNp = mainInstance.worldDotDotNp[bodyIndices]
+        peak = max(peak, np.max(np.hypot(accelerationNp[:, 0], accelerationNp[:, 1])) * 1e-3)
+    return peak
+#  -------------------------------------------------------------------------
+def settlingTime(mainInstance, objective):
+    """Return the time [s] after which the coordinate objective["coordinate"] (x, y or phi) of body objective["body"]
+    stays within objective["band"] times its largest deviation from its final value"""
+    if Debug:
+        DT.Mess("settlingTime")
+    bodyIndex = [bodyObj.Name for bodyObj in mainInstance.bodyObjList].index(objective["body"])
+    column = (bodyIndex - 1) * 3 + ["x", "y", "phi"].index(objective.get("coordinate", "phi"))
+    deviationNp = np.abs(mainInstance.uResults[:, column] - mainInstance.uResults[-1, column])
+    outsideNp = np.nonzero(deviationNp > objective.get("band", 0.02) * np.max(deviationNp))[0]
+    if len(outsideNp) == 0:
+        return float(mainInstance.timeValues[0])
+    return float(mainInstance.timeValues[min(outsideNp[-1] + 1, len(deviationNp) - 1)])
+#  -------------------------------------------------------------------------
+# The function which evaluates each of the OBJECTIVE_PARAMETERS types on a solution
+OBJECTIVE_FUNCTIONS = {"peakReaction": peakReaction,
+                       "maxAcceleration": maxAcceleration,
+                       "settlingTime": settlingTime}
+#  -------------------------------------------------------------------------
+def solveCandidate(candidateArguments):
+    """Solve the model for one candidate design and return its objective value, the corrected
+    initial body coordinates (to warm-start the next candidates) and a message
+    This is called in the worker processes, so it must stay at module level"""
+    (compiledModel, overrides, simEnd, simDelta, Accuracy, correctInitial, objective, warmStartNp) = candidateArguments
+    warmStart = None
+    try:
+        mainInstance = DapMainMod.DapMainC(simEnd, simDelta, Accuracy, correctInitial, compiledModel=compiledModel)
+        for parameterName, value in overrides.items():
+            mainInstance.setParameter(parameterName, value)
+        # Correct the initial conditions starting from where the previous design ended up
+        if correctInitial and warmStartNp is not None:
+            mainInstance.worldNp[1:] = warmStartNp[:, 0:2]
+            mainInstance.phiNp[1:] = warmStartNp[:, 2]
+        if mainInstance.prepareSolution() is False:
+            return OPTIMIZE_FAILED_OBJECTIVE, warmStart, "Initial conditions could not be made consistent with the constraints"
+        warmStart = np.column_stack((mainInstance.worldNp[1:], mainInstance.phiNp[1:]))
+        mainInstance.integrateSolution()
+        if mainInstance.solveStatus == "failed" or len(mainInstance.timeValues) == 0:
+            return OPTIMIZE_FAILED_OBJECTIVE, warmStart, mainInstance.solveMessage
+        return float(OBJECTIVE_FUNCTIONS[objective["type"]](mainInstance, objective)), warmStart, mainInstance.solveMessage
+    except Exception as e:
+        return OPTIMIZE_FAILED_OBJECTIVE, warmStart, str(e)
+# =============================================================================
+class DapOptimizeC:
+    """Minimise an objective over the solution of a compiled model by varying some of its parameters"""
+    #  -------------------------------------------------------------------------
+    def __init__(self, compiledModel, simEnd, simDelta, Accuracy, correctInitial=True):
+        if Debug:
+            DT.Mess("DapOptimizeC-__init__")
+        self.compiledModel = compiledModel
+        self.simEnd = simEnd
+        self.simDelta = simDelta
+        self.Accuracy = Accuracy
+        self.correctInitial = correctInitial
+        self.executor = None
+        self.history = []
+        # Objective value of every design which has been solved: design tuple --> value
+        self.objectiveCache = {}
+        self.warmStartNp = None
+    #  -------------------------------------------------------------------------
+    def optimize(self, designVariables, objective, optimizeDirectory, method="L-BFGS-B", maxIterations=50, maxWorkers=None):
+        """Minimise the objective, given as a dictionary such as {"type": "peakReaction", "joint": "DapJoint001"}
+        (see OBJECTIVE_PARAMETERS), over the design variables, a list of (parameter name, lower bound, upper bound)
+        with the parameter names as in DapMainC.setParameter
+        method is "differential_evolution" or a bounded scipy.optimize.minimize method such as "L-BFGS-B"
+        The start is the current value of each parameter.  Returns the scipy OptimizeResult
+        maxWorkers=1 solves the candidates one after the other in this process"""
+        if Debug:
+            DT.Mess("DapOptimizeC-optimize")
+        if objective.get("type") not in OBJECTIVE_FUNCTIONS:
+            CAD.Console.PrintError("Unknown objective type: " + str(objective.get("type")) + "\n")
+            return None
+        baseInstance = DapMainMod.DapMainC(self.simEnd, self.simDelta, self.Accuracy, self.correctInitial,
+                                           compiledModel=self.compiledModel)
+        self.parameterNames = []
+        startList = []
+        boundsList = []
+        for parameterName, lower, upper in designVariables:
+            value = baseInstance.getParameter(parameterName)
+            if value is None:
+                CAD.Console.PrintError("Unknown design variable: " + parameterName + "\n")
+                return None
+            self.parameterNames.append(parameterName)
+            startList.append(min(max(value, lower), upper))
+            boundsList.append((lower, upper))
+        self.objective = objective
+        self.boundsNp = np.array(boundsList, dtype=np.float64)
+        self.history = []
+        self.objectiveCache = {}
+        self.warmStartNp = None
+
+        startTime = time.perf_counter()
+        if maxWorkers != 1:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=maxWorkers)
+        try:
+            if method == "differential_evolution":
+                result = differential_evolution(self.objectiveValue, boundsList, maxiter=maxIterations,
+                                                updating="deferred", polish=False, workers=self.mapCandidates)
+            else:
+                result = minimize(self.objectiveAndGradient, np.array(startList), jac=True, method=method,
+                                  bounds=boundsList, options={"maxiter": maxIterations})
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        DT.Mess("Optimization finished in " + str(round(time.perf_counter() - startTime, 3)) + " s after " +
+                str(len(self.history)) + " solutions: " + str(result.message))
+
+        os.makedirs(optimizeDirectory, exist_ok=True)
+        with open(os.path.join(optimizeDirectory, OPTIMIZE_HISTORY_FILE_NAME), "w") as historyFILE:
+            json.dump({"objective": objective,
+                       "method": method,
+                       "best": dict(zip(self.parameterNames, [float(value) for value in result.x])),
+                       "bestObjective": float(result.fun),
+                       "history": self.history}, historyFILE, indent=1)
+        return result
+    #  -------------------------------------------------------------------------
+    def evaluateCandidates(self, designList):
+        """Return the objective values of the designs in the list, solving (in parallel)
+        those which have not been solved before"""
+        if Debug:
+            DT.Mess("DapOptimizeC-evaluateCandidates")
+        keyList = [tuple(float(value) for value in design) for design in designList]
+        newKeys = list(dict.fromkeys(key for key in keyList if key not in self.objectiveCache))
+        argumentList = [(self.compiledModel, dict(zip(self.parameterNames, key)),
+                         self.simEnd, self.simDelta, self.Accuracy, self.correctInitial,
+                         self.objective, self.warmStartNp) for key in newKeys]
+        if self.executor is None:
+            resultList = [solveCandidate(candidateArguments) for candidateArguments in argumentList]
+        else:
+            resultList = list(self.executor.map(solveCandidate, argumentList))
+
+        # The next candidates start from the corrected initial conditions of the best of these
+        bestValue = OPTIMIZE_FAILED_OBJECTIVE
+        for key, (value, warmStart, message) in zip(newKeys, resultList):
+            self.objectiveCache[key] = value
+            self.history.append({"design": dict(zip(self.parameterNames, key)),
+                                 "objective": value,
+                                 "message": message})
+            if value < bestValue and warmStart is not None:
+                bestValue = value
+                self.warmStartNp = warmStart
+        return [self.objectiveCache[key] for key in keyList]
+    #  -------------------------------------------------------------------------
+    def objectiveValue(self, designNp):
+        """Return the objective value of a single design"""
+        return self.evaluateCandidates([designNp])[0]
+    #  -------------------------------------------------------------------------
+    def mapCandidates(self, function, designIterable):
+        """The workers of differential_evolution - the whole population is solved in parallel"""
+        return self.evaluateCandidates(list(designIterable))
+    #  -------------------------------------------------------------------------
+    def objectiveAndGradient(self, designNp):
+        """Return the objective value of a design and its gradient by forward differences
+        (backward at an upper bound), with all the designs solved in parallel"""
+        if Debug:
+            DT.Mess("DapOptimizeC-objectiveAndGradient")
+        stepNp = OPTIMIZE_DIFFERENCE_STEP * (self.boundsNp[:, 1] - self.boundsNp[:, 0])
+        stepNp = np.where(designNp + stepNp > self.boundsNp[:, 1], -stepNp, stepNp)
+        designList = [designNp]
+        for index in range(len(designNp)):
+            shiftedNp = designNp.copy()
+            shiftedNp[index] += stepNp[index]
+            designList.append(shiftedNp)
+        valueList = self.evaluateCandidates(designList)
+        return valueList[0], (np.array(valueList[1:]) - valueList[0]) / stepNp
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("DapOptimizeC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("DapOptimizeC-loads")
+        if state:
+            self.Type = state
+        return None
+    #  =========================================================================
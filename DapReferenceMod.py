@@ -0,0 +1,456 @@
+# ********************************************************************************
+# *                                                                              *
+# *   This program is free software; you can redistribute it and/or modify       *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)         *
+# *   as published by the Free Software Foundation; either version 3 of          *
+# *   the License, or (at your option) any later version.                        *
+# *   for detail see the LICENCE text file.                                      *
+# *                                                                              *
+# *   This program is distributed in the hope that it will be useful,            *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of             *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       *
+# *   See the GNU Lesser General Public License for more details.                *
+# *                                                                              *
+# *   You should have received a copy of the GNU Lesser General Public           *
+# *   License along with this program; if not, write to the Free Software        *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston,                      *
+# *   MA 02111-1307, USA                                                         *
+# *_____________________________________________________________________________ *
+# *                                                                              *
+# *        ##########################################################            *
+# *       #### Nikra-DAP FreeCAD WorkBench Revision 2.1 (c) 2024: ####           *
+# *        ##########################################################            *
+# *                                                                              *
+# *                     Authors of this workbench:                               *
+# *                   Cecil Churms <churms@gmail.com>                            *
+# *             Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                 *
+# *                                                                              *
+# *               This file is a sizeable expansion of the:                      *
+# *                "Nikra-DAP-Rev-1" workbench for FreeCAD                       *
+# *        with increased functionality and inherent code documentation          *
+# *                  by means of expanded variable naming                        *
+# *                                                                              *
+# *     Which in turn, is based on the MATLAB code Complementary to              *
+# *                  Chapters 7 and 8 of the textbook:                           *
+# *                                                                              *
+# *                     "PLANAR MULTIBODY DYNAMICS                               *
+# *         Formulation, Programming with MATLAB, and Applications"              *
+# *                          Second Edition                                      *
+# *                         by P.E. Nikravesh                                    *
+# *                          CRC Press, 2018                                     *
+# *                                                                              *
+# *     Authors of Rev-1:                                                        *
+# *            Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>         *
+# *            Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                  *
+# *            Dewald Hattingh (UP) <u17082006@tuks.co.za>                       *
+# *            Varnu Govender (UP) <govender.v@tuks.co.za>                       *
+# *                                                                              *
+# * Copyright (c) 2024 Cecil Churms <churms@gmail.com>                           *
+# * Copyright (c) 2024 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>          *
+# * Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za> *
+# * Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>               *
+# * Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>               *
+# *                                                                              *
+# *             Please refer to the Documentation and README for                 *
+# *         more information regarding this WorkBench and its usage              *
+# *                                                                              *
+# ********************************************************************************
+import FreeCAD as CAD
+
+import os
+import json
+import math
+import time
+import numpy as np
+
+import DapToolsMod as DT
+import DapMainMod
+from DapBenchmarkMod import DapModelBuilderC
+
+Debug = False
+# =============================================================================
+# Accuracy / performance benchmark on the reference problems of Nikravesh
+# (DT.NIKRAVESH_EXAMPLES)
+#
+# Each problem is built as a headless model, and a reference trajectory is
+# computed once at the tightest settings and stored.  Every problem is then solved
+# at each Accuracy setting with each integrator, and the error against the
+# reference is reported together with the wall time, giving error-versus-cost
+# curves from which the cheapest acceptable settings can be chosen
+#
+# NOTE: the geometry, masses and force parameters are representative planar
+# approximations of the textbook models - they are not the book's data sets
+#
+# Example of use from the FreeCAD Python console (or FreeCADCmd):
+#   import DapReferenceMod
+#   results = DapReferenceMod.runReferenceBenchmark("/tmp/DapReference.json")
+# =============================================================================
+# Settings used to compute the reference trajectories
+REFERENCE_ACCURACY = 9
+REFERENCE_INTEGRATOR = "DOP853"
+# Settings which are benchmarked against the reference
+ACCURACY_SETTINGS = [1, 2, 3, 4, 5, 6, 7]
+# Default required accuracy when choosing the cheapest settings [mm] and [rad]
+POSITION_TOLERANCE = 0.1
+ANGLE_TOLERANCE = 1.0e-3
+# =============================================================================
+# The reference models
+# =============================================================================
+def unitVector(start, end):
+    """Return the unit vector from start to end as a tuple"""
+    length = math.hypot(end[0] - start[0], end[1] - start[1])
+    return ((end[0] - start[0]) / length, (end[1] - start[1]) / length)
+#  -------------------------------------------------------------------------
+def doubleAArm():
+    """Double A-Arm suspension: upper and lower arms pivoting on the chassis,
+    carrying the wheel knuckle, with a spring-damper from the lower arm to the chassis"""
+    builder = DapModelBuilderC()
+    groundUpper = builder.addGroundPoint(0.0, 300.0)
+    groundLower = builder.addGroundPoint(0.0, 100.0)
+    groundSpring = builder.addGroundPoint(150.0, 400.0)
+    upperArm = builder.addLink("UpperArm", (0.0, 300.0), (250.0, 320.0), 2.0)
+    lowerArm = builder.addLink("LowerArm", (0.0, 100.0), (300.0, 90.0), 3.0)
+    knuckle = builder.addBodyAtPoints("Knuckle", 20.0, 2.0e5, (330.0, 200.0),
+                                      [(250.0, 320.0), (300.0, 90.0), (330.0, 200.0)])
+    builder.addJoint("Revolute", 0, groundUpper, upperArm, 0)
+    builder.addJoint("Revolute", 0, groundLower, lowerArm, 0)
+    builder.addJoint("Revolute", upperArm, 1, knuckle, 0)
+    builder.addJoint("Revolute", lowerArm, 1, knuckle, 1)
+    builder.addForce("Linear Spring Damper", lowerArm, 1, 0, groundSpring,
+                     Stiffness=2.0e4, LengthAngle0=400.0, DampingCoeff=1.0e3)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def macPhersonKnuckle(builder):
+    """Add the knuckle of the MacPherson models and return its index and the strut axis
+    Knuckle points: 0 lower ball joint, 1 wheel centre, 2 and 3 on the strut axis"""
+    strutTop = (250.0, 600.0)
+    strutBottom = (310.0, 300.0)
+    axis = unitVector(strutBottom, strutTop)
+    knuckle = builder.addBodyAtPoints("Knuckle", 20.0, 2.0e5, (320.0, 200.0),
+                                      [(300.0, 100.0), (350.0, 200.0), strutBottom,
+                                       (strutBottom[0] + 50.0 * axis[0], strutBottom[1] + 50.0 * axis[1])])
+    return knuckle, strutTop, strutBottom, axis
+#  -------------------------------------------------------------------------
+def macPhersonA():
+    """MacPherson suspension with a lower arm, the knuckle and a strut body which slides
+    on the knuckle along the strut axis and pivots on the chassis"""
+    builder = DapModelBuilderC()
+    groundLower = builder.addGroundPoint(0.0, 100.0)
+    lowerArm = builder.addLink("LowerArm", (0.0, 100.0), (300.0, 100.0), 3.0)
+    knuckle, strutTop, strutBottom, axis = macPhersonKnuckle(builder)
+    groundTop = builder.addGroundPoint(*strutTop)
+    strutSlide = (strutBottom[0] + 100.0 * axis[0], strutBottom[1] + 100.0 * axis[1])
+    strut = builder.addBodyAtPoints("Strut", 2.0, 2.0e4,
+                                    ((strutTop[0] + strutSlide[0]) / 2.0, (strutTop[1] + strutSlide[1]) / 2.0),
+                                    [strutTop, strutSlide, (strutSlide[0] + 50.0 * axis[0], strutSlide[1] + 50.0 * axis[1])])
+    builder.addJoint("Revolute", 0, groundLower, lowerArm, 0)
+    builder.addJoint("Revolute", lowerArm, 1, knuckle, 0)
+    builder.addJoint("Revolute", strut, 0, 0, groundTop)
+    builder.addJoint("Translation", knuckle, 2, strut, 1, 3, 2)
+    builder.addForce("Linear Spring Damper", knuckle, 2, 0, groundTop,
+                     Stiffness=3.0e4, LengthAngle0=math.dist(strutTop, strutBottom) + 50.0, DampingCoeff=1.5e3)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def macPhersonB():
+    """MacPherson suspension with a lower arm and the knuckle, where the strut axis of the knuckle
+    passes through the top mount on the chassis (Translation-Revolute joint)"""
+    builder = DapModelBuilderC()
+    groundLower = builder.addGroundPoint(0.0, 100.0)
+    lowerArm = builder.addLink("LowerArm", (0.0, 100.0), (300.0, 100.0), 3.0)
+    knuckle, strutTop, strutBottom, axis = macPhersonKnuckle(builder)
+    groundTop = builder.addGroundPoint(*strutTop)
+    builder.addJoint("Revolute", 0, groundLower, lowerArm, 0)
+    builder.addJoint("Revolute", lowerArm, 1, knuckle, 0)
+    builder.addJoint("Translation-Revolute", knuckle, 2, 0, groundTop, 3)
+    builder.addForce("Linear Spring Damper", knuckle, 2, 0, groundTop,
+                     Stiffness=3.0e4, LengthAngle0=math.dist(strutTop, strutBottom) + 50.0, DampingCoeff=1.5e3)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def macPhersonC():
+    """MacPherson suspension with only the knuckle - the lower arm is a massless
+    Revolute-Revolute link and the strut a Translation-Revolute joint"""
+    builder = DapModelBuilderC()
+    groundLower = builder.addGroundPoint(0.0, 100.0)
+    knuckle, strutTop, strutBottom, axis = macPhersonKnuckle(builder)
+    groundTop = builder.addGroundPoint(*strutTop)
+    builder.addJoint("Revolute-Revolute", knuckle, 0, 0, groundLower)
+    builder.addJoint("Translation-Revolute", knuckle, 2, 0, groundTop, 3)
+    builder.addForce("Linear Spring Damper", knuckle, 2, 0, groundTop,
+                     Stiffness=3.0e4, LengthAngle0=math.dist(strutTop, strutBottom) + 50.0, DampingCoeff=1.5e3)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def cartBody(builder, extraPoints=()):
+    """Add a cart on two wheels which roll on the ground (Disc joints)
+    Returns the indices of the cart, the rear wheel and the front wheel"""
+    wheelRadius = 100.0
+    cart = builder.addBodyAtPoints("Cart", 50.0, 50.0 * (600.0**2 + 200.0**2) / 12.0, (0.0, 200.0),
+                                   [(-200.0, wheelRadius), (200.0, wheelRadius)] + list(extraPoints))
+    wheels = []
+    for wheelName, x in (("RearWheel", -200.0), ("FrontWheel", 200.0)):
+        # Point 1 is on the rim behind the centre, so that the initial angle of the Disc joint is zero
+        wheel = builder.addBody(wheelName, 5.0, 5.0 * wheelRadius**2 / 2.0, (x, wheelRadius), 0.0,
+                                [(0.0, 0.0), (-wheelRadius, 0.0)])
+        builder.addJoint("Disc", wheel, 0, 0, 1, x0=x)
+        builder.addJoint("Revolute", cart, len(wheels), wheel, 0)
+        wheels.append(wheel)
+    return cart, wheels[0], wheels[1]
+#  -------------------------------------------------------------------------
+def cartA():
+    """Cart pushed by a constant horizontal force"""
+    builder = DapModelBuilderC()
+    cart, rearWheel, frontWheel = cartBody(builder)
+    builder.addForce("Constant Global Force", cart, constWorldForce=CAD.Vector(2.0e5, 0.0, 0.0))
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def cartB():
+    """Cart driven by a constant torque on its rear wheel"""
+    builder = DapModelBuilderC()
+    cart, rearWheel, frontWheel = cartBody(builder)
+    builder.addForce("Constant Torque about a Point", rearWheel, constTorque=-2.0e7)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def cartC():
+    """Cart pushed by a constant force, carrying a swinging pendulum"""
+    builder = DapModelBuilderC()
+    cart, rearWheel, frontWheel = cartBody(builder, [(0.0, 300.0)])
+    pendulum = builder.addLink("Pendulum", (0.0, 300.0), (150.0, 40.0), 2.0)
+    builder.addJoint("Revolute", cart, 2, pendulum, 0)
+    builder.addForce("Constant Global Force", cart, constWorldForce=CAD.Vector(2.0e5, 0.0, 0.0))
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def cartD():
+    """Cart tethered to the ground by a stretched spring-damper"""
+    builder = DapModelBuilderC()
+    cart, rearWheel, frontWheel = cartBody(builder, [(-300.0, 200.0)])
+    groundAnchor = builder.addGroundPoint(-700.0, 200.0)
+    builder.addForce("Linear Spring Damper", cart, 2, 0, groundAnchor,
+                     Stiffness=5.0e3, LengthAngle0=300.0, DampingCoeff=50.0)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def slidingPendulum():
+    """Block sliding freely on a horizontal track, with a pendulum released at 30 degrees"""
+    builder = DapModelBuilderC()
+    groundTrack = builder.addGroundPoint(0.0, 0.0)
+    groundTrackEnd = builder.addGroundPoint(10.0, 0.0)
+    block = builder.addBlock("Block", (0.0, 0.0), 1.0, 50.0)
+    pendulum = builder.addLink("Pendulum", (0.0, 0.0),
+                               (300.0 * math.sin(math.pi / 6.0), -300.0 * math.cos(math.pi / 6.0)), 0.5)
+    builder.addJoint("Translation", block, 0, 0, groundTrack, 1, groundTrackEnd)
+    builder.addJoint("Revolute", block, 0, pendulum, 0)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def genericSlidingPendulum():
+    """Sliding pendulum whose block is also held by a spring-damper to the ground"""
+    records = slidingPendulum()
+    builder = DapModelBuilderC()
+    builder.bodies = records["bodies"]
+    builder.joints = records["joints"]
+    builder.forces = records["forces"]
+    groundAnchor = builder.addGroundPoint(-300.0, 0.0)
+    builder.addForce("Linear Spring Damper", 1, 0, 0, groundAnchor,
+                     Stiffness=1.0e3, LengthAngle0=300.0, DampingCoeff=10.0)
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def addContact(builder, body_I_Index, body_J_Index, point_j_Index, normal, stiffness, restitution,
+               frictionStatic, frictionDynamic):
+    """Add a Contact Friction force between all the points of body I and the contact line
+    through point j of body J with the given normal (see DapContactMod)"""
+    builder.addForce("Contact Friction", body_I_Index, 0, body_J_Index, point_j_Index,
+                     ContactAllPoints=True, ContactPointRadius=0.0, ContactRadius=0.0,
+                     ContactNormal=CAD.Vector(normal[0], normal[1], 0.0), ContactStiffness=stiffness,
+                     Restitution=restitution, FloresContact=False,
+                     FrictionStatic=frictionStatic, FrictionDynamic=frictionDynamic, FrictionVelocity=10.0)
+#  -------------------------------------------------------------------------
+def conveyorBelt():
+    """Box held by a spring to the wall, resting on a conveyor belt which moves at 100 mm/s
+    The belt is a heavy block sliding freely on the ground, so its speed hardly changes,
+    and the friction drags the box along until the spring pulls it back (stick-slip)"""
+    builder = DapModelBuilderC()
+    groundTrack = builder.addGroundPoint(0.0, -500.0)
+    groundTrackEnd = builder.addGroundPoint(10.0, -500.0)
+    groundWall = builder.addGroundPoint(-300.0, 25.0)
+    # Belt points: 0 centre, 1 along the track and 2 on the top surface
+    belt = builder.addBody("Belt", 1.0e4, 1.0e4 * 1000.0**2 / 6.0, (0.0, -500.0), 0.0,
+                           [(0.0, 0.0), (100.0, 0.0), (0.0, 500.0)])
+    builder.bodies[belt].worldDot = CAD.Vector(100.0, 0.0, 0.0)
+    # Box points: 0 and 1 are the bottom corners, 2 the centre
+    box = builder.addBody("Box", 1.0, 1.0 * 50.0**2 / 6.0, (0.0, 25.0), 0.0,
+                          [(-25.0, -25.0), (25.0, -25.0), (0.0, 0.0)])
+    builder.addJoint("Translation", belt, 0, 0, groundTrack, 1, groundTrackEnd)
+    builder.addForce("Linear Spring Damper", box, 2, 0, groundWall,
+                     Stiffness=1.0e3, LengthAngle0=300.0, DampingCoeff=1.0)
+    addContact(builder, box, belt, 2, (0.0, 1.0), 1.0e7, 0.5, 0.4, 0.3)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+#  -------------------------------------------------------------------------
+def rodImpactingGround():
+    """Rod released at 30 degrees with its lower end 100 mm above the ground,
+    which bounces on both its ends"""
+    builder = DapModelBuilderC()
+    groundSurface = builder.addGroundPoint(0.0, 0.0)
+    rodLength = 400.0
+    builder.addLink("Rod", (0.0, 100.0),
+                    (rodLength * math.cos(math.pi / 6.0), 100.0 + rodLength * math.sin(math.pi / 6.0)), 1.0)
+    addContact(builder, 1, 0, groundSurface, (0.0, 1.0), 1.0e7, 0.7, 0.3, 0.2)
+    builder.addForce("Gravity")
+    return builder.modelRecords()
+# =============================================================================
+# Generator, end time and reporting interval of every reference problem
+# The contact problems use representative contact and friction parameters (see DapContactMod)
+# =============================================================================
+REFERENCE_MODELS = {
+    'Double A-Arm Suspension': (doubleAArm, 2.0, 0.01),
+    'MacPherson Suspension A': (macPhersonA, 2.0, 0.01),
+    'MacPherson Suspension B': (macPhersonB, 2.0, 0.01),
+    'MacPherson Suspension C': (macPhersonC, 2.0, 0.01),
+    'Cart A': (cartA, 2.0, 0.01),
+    'Cart B': (cartB, 2.0, 0.01),
+    'Cart C': (cartC, 2.0, 0.01),
+    'Cart D': (cartD, 4.0, 0.01),
+    'Conveyor Belt and Friction': (conveyorBelt, 3.0, 0.01),
+    'Rod Impacting Ground': (rodImpactingGround, 2.0, 0.01),
+    'Sliding Pendulum': (slidingPendulum, 3.0, 0.01),
+    'Generic Sliding Pendulum': (genericSlidingPendulum, 3.0, 0.01)}
+# =============================================================================
+def solveReferenceModel(exampleName, Accuracy, integratorMethod):
+    """Solve one reference problem and return the solver instance and the integration wall time"""
+    if Debug:
+        DT.Mess("solveReferenceModel")
+    generator, simEnd, simDelta = REFERENCE_MODELS[exampleName]
+    mainInstance = DapMainMod.DapMainC(simEnd, simDelta, Accuracy, True, modelRecords=generator())
+    mainInstance.integratorMethod = integratorMethod
+    if mainInstance.prepareSolution() is False:
+        return mainInstance, -1.0
+    startTime = time.perf_counter()
+    mainInstance.integrateSolution()
+    return mainInstance, time.perf_counter() - startTime
+#  -------------------------------------------------------------------------
+def defaultReferenceDirectory():
+    """The reference trajectories are stored in the user's FreeCAD data directory"""
+    return os.path.join(CAD.getUserAppDataDir(), "NikraDAP", "References")
+#  -------------------------------------------------------------------------
+def referenceTrajectory(exampleName, referenceDirectory, regenerate=False):
+    """Return the stored reference (timeValues, uResults) of a problem,
+    computing and storing it first if it does not yet exist"""
+    if Debug:
+        DT.Mess("referenceTrajectory")
+    fileName = os.path.join(referenceDirectory, DT.NIKRAVESH_EXAMPLES_DICTIONARY[exampleName] + ".npz")
+    if os.path.isfile(fileName) and not regenerate:
+        reference = np.load(fileName)
+        return reference["timeValues"], reference["uResults"]
+
+    DT.Mess("Computing the reference trajectory of " + exampleName)
+    mainInstance, wallTime = solveReferenceModel(exampleName, REFERENCE_ACCURACY, REFERENCE_INTEGRATOR)
+    if wallTime < 0.0 or mainInstance.solveStatus != "finished":
+        CAD.Console.PrintError("The reference trajectory of " + exampleName + " could not be computed\n")
+        return None, None
+    os.makedirs(referenceDirectory, exist_ok=True)
+    np.savez(fileName,
+             timeValues=mainInstance.timeValues,
+             uResults=mainInstance.uResults,
+             Accuracy=REFERENCE_ACCURACY,
+             integratorMethod=REFERENCE_INTEGRATOR)
+    return mainInstance.timeValues, mainInstance.uResults
+#  -------------------------------------------------------------------------
+def trajectoryError(uResults, referenceResults):
+    """Return the maximum position error [mm] and angle error [rad] of the bodies' CoGs
+    compared with the reference over the reporting times they have in common"""
+    numTicks = min(len(uResults), len(referenceResults))
+    numMovBodies = referenceResults.shape[1] // 6
+    differenceNp = (uResults[:numTicks, :numMovBodies * 3] -
+                    referenceResults[:numTicks, :numMovBodies * 3]).reshape(numTicks, numMovBodies, 3)
+    return (float(np.max(np.hypot(differenceNp[:, :, 0], differenceNp[:, :, 1]), initial=0.0)),
+            float(np.max(np.abs(differenceNp[:, :, 2]), initial=0.0)))
+#  -------------------------------------------------------------------------
+def cheapestSettings(results, positionTolerance=POSITION_TOLERANCE, angleTolerance=ANGLE_TOLERANCE):
+    """Return, for each problem, the quickest run which met the required accuracy"""
+    cheapest = {}
+    for result in results:
+        if result["status"] != "finished" or \
+                result["maxPositionError"] > positionTolerance or \
+                result["maxAngleError"] > angleTolerance:
+            continue
+        best = cheapest.get(result["example"])
+        if best is None or result["wallTime"] < best["wallTime"]:
+            cheapest[result["example"]] = result
+    return cheapest
+#  -------------------------------------------------------------------------
+def runReferenceBenchmark(resultsFileName, referenceDirectory="", accuracySettings=None,
+                          integratorMethods=None, examples=None, regenerate=False):
+    """Solve every reference problem at every Accuracy setting with every integrator,
+    and write the errors against the reference trajectories and the wall times to a JSON file"""
+    if Debug:
+        DT.Mess("runReferenceBenchmark")
+    if referenceDirectory == "":
+        referenceDirectory = defaultReferenceDirectory()
+    if accuracySettings is None:
+        accuracySettings = ACCURACY_SETTINGS
+    if integratorMethods is None:
+        integratorMethods = list(DapMainMod.INTEGRATOR_METHODS)
+    if examples is None:
+        examples = DT.NIKRAVESH_EXAMPLES
+
+    results = []
+    unsupported = []
+    for exampleName in examples:
+        if REFERENCE_MODELS.get(exampleName) is None:
+            DT.Mess(exampleName + ": not available - there is no model for it")
+            unsupported.append(exampleName)
+            continue
+        # A model which cannot be built or solved must not stop the benchmark of the others
+        try:
+            referenceTime, referenceResults = referenceTrajectory(exampleName, referenceDirectory, regenerate)
+        except Exception as e:
+            DT.Mess(exampleName + ": no reference trajectory - " + str(e))
+            referenceResults = None
+        if referenceResults is None:
+            unsupported.append(exampleName)
+            continue
+        for integratorMethod in integratorMethods:
+            for Accuracy in accuracySettings:
+                result = {"example": exampleName,
+                          "method": integratorMethod,
+                          "Accuracy": Accuracy,
+                          "status": "error",
+                          "message": "",
+                          "wallTime": -1.0,
+                          "evaluations": 0,
+                          "maxPositionError": -1.0,
+                          "maxAngleError": -1.0}
+                try:
+                    mainInstance, wallTime = solveReferenceModel(exampleName, Accuracy, integratorMethod)
+                    result["wallTime"] = wallTime
+                    result["evaluations"] = mainInstance.Counter
+                    if wallTime >= 0.0:
+                        result["status"] = mainInstance.solveStatus
+                        result["message"] = mainInstance.solveMessage
+                        result["maxPositionError"], result["maxAngleError"] = \
+                            trajectoryError(mainInstance.uResults, referenceResults)
+                except Exception as e:
+                    result["message"] = str(e)
+                DT.Mess(exampleName + " " + integratorMethod + " Accuracy=" + str(Accuracy) + ": " +
+                        result["status"] + "  " + "{:.3f}".format(result["wallTime"]) + "s  error " +
+                        "{:.3g}".format(result["maxPositionError"]) + "mm " +
+                        "{:.3g}".format(result["maxAngleError"]) + "rad")
+                results.append(result)
+
+    summary = {"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "referenceAccuracy": REFERENCE_ACCURACY,
+               "referenceIntegrator": REFERENCE_INTEGRATOR,
+               "positionTolerance": POSITION_TOLERANCE,
+               "angleTolerance": ANGLE_TOLERANCE,
+               "unsupported": unsupported,
+               "results": results,
+               "cheapest": cheapestSettings(results)}
+    with open(resultsFileName, "w") as resultsFILE:
+        json.dump(summary, resultsFILE, indent=1)
+    return summary
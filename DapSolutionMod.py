@@ -0,0 +1,222 @@
+# ********************************************************************************
+# *                                                                              *
+# *   This program is free software; you can redistribute it and/or modify       *
+# *   it under the terms of the GNU Lesser General Public License (LGPL)         *
+# *   as published by the Free Software Foundation; either version 3 of          *
+# *   the License, or (at your option) any later version.                        *
+# *   for detail see the LICENCE text file.                                      *
+# *                                                                              *
+# *   This program is distributed in the hope that it will be useful,            *
+# *   but WITHOUT ANY WARRANTY; without even the implied warranty of             *
+# *   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.                       *
+# *   See the GNU Lesser General Public License for more details.                *
+# *                                                                              *
+# *   You should have received a copy of the GNU Lesser General Public           *
+# *   License along with this program; if not, write to the Free Software        *
+# *   Foundation, Inc., 59 Temple Place, Suite 330, Boston,                      *
+# *   MA 02111-1307, USA                                                         *
+# *_____________________________________________________________________________ *
+# *                                                                              *
+# *        ##########################################################            *
+# *       #### Nikra-DAP FreeCAD WorkBench Revision 2.1 (c) 2024: ####           *
+# *        ##########################################################            *
+# *                                                                              *
+# *                     Authors of this workbench:                               *
+# *                   Cecil Churms <churms@gmail.com>                            *
+# *             Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                 *
+# *                                                                              *
+# *               This file is a sizeable expansion of the:                      *
+# *                "Nikra-DAP-Rev-1" workbench for FreeCAD                       *
+# *        with increased functionality and inherent code documentation          *
+# *                  by means of expanded variable naming                        *
+# *                                                                              *
+# *     Which in turn, is based on the MATLAB code Complementary to              *
+# *                  Chapters 7 and 8 of the textbook:                           *
+# *                                                                              *
+# *                     "PLANAR MULTIBODY DYNAMICS                               *
+# *         Formulation, Programming with MATLAB, and Applications"              *
+# *                          Second Edition                                      *
+# *                         by P.E. Nikravesh                                    *
+# *                          CRC Press, 2018                                     *
+# *                                                                              *
+# *     Authors of Rev-1:                                                        *
+# *            Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za>         *
+# *            Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>                  *
+# *            Dewald Hattingh (UP) <u17082006@tuks.co.za>                       *
+# *            Varnu Govender (UP) <govender.v@tuks.co.za>                       *
+# *                                                                              *
+# * Copyright (c) 2024 Cecil Churms <churms@gmail.com>                           *
+# * Copyright (c) 2024 Lukas du Plessis (UP) <lukas.duplessis@up.ac.za>          *
+# * Copyright (c) 2022 Alfred Bogaers (EX-MENTE) <alfred.bogaers@ex-mente.co.za> *
+# * Copyright (c) 2022 Dewald Hattingh (UP) <u17082006@tuks.co.za>               *
+# * Copyright (c) 2022 Varnu Govender (UP) <govender.v@tuks.co.za>               *
+# *                                                                              *
+# *             Please refer to the Documentation and README for                 *
+# *         more information regarding this WorkBench and its usage              *
+# *                                                                              *
+# ********************************************************************************
+import numpy as np
+
+import DapToolsMod as DT
+
+Debug = False
+# =============================================================================
+# Dense (continuous) solution of an integration
+#
+# The interpolant of every step taken by the integrator is kept as a polynomial
+# in the normalised time within the step, so the states can be found at any
+# time afterwards without solving again, e.g. to animate or post-process at a
+# different rate from the reporting time the solution was run with
+#
+# Example of use from the FreeCAD Python console:
+#   import DapSolutionMod
+#   solution = DapSolutionMod.DapDenseSolutionC()
+#   solution.loadFromFile("/tmp/DapSolution.npz")
+#   uNp = solution.sample(solution.reportingTimes(0.001))
+# =============================================================================
+# The solution is saved in this file in the output directory
+SOLUTION_FILE_NAME = "DapSolution.npz"
+# =============================================================================
+class DapDenseSolutionC:
+    """Piecewise polynomial solution u(t) made from the dense output of every integration step
+    Within step i:  u(t) = sum over k of coefficients[i, :, k] * x**k
+    where x = (t - breakpoints[i]) / (breakpoints[i+1] - breakpoints[i])"""
+    #  -------------------------------------------------------------------------
+    def __init__(self, degree=4):
+        if Debug:
+            DT.Mess("DapDenseSolutionC-__init__")
+        self.degree = degree
+        self.breakpoints = np.zeros((0,), dtype=np.float64)
+        self.coefficients = np.zeros((0, 0, degree + 1), dtype=np.float64)
+        # Steps are collected in lists while integrating and only stacked when needed
+        self.newBreakpoints = []
+        self.newCoefficients = []
+        self.makeFitMatrix()
+    #  -------------------------------------------------------------------------
+    def makeFitMatrix(self):
+        """Set up the Chebyshev-Lobatto nodes in [0, 1] where each step interpolant is sampled
+        and the inverse Vandermonde matrix which turns the samples into polynomial coefficients
+        The nodes include both ends, so the polynomials join up exactly at the breakpoints"""
+        self.fitNodes = 0.5 * (1.0 - np.cos(np.pi * np.arange(self.degree + 1) / self.degree))
+        self.fitMatrix = np.linalg.inv(np.vander(self.fitNodes, self.degree + 1, increasing=True))
+    #  -------------------------------------------------------------------------
+    def addStep(self, stepInterpolant, tOld, t):
+        """Add the interpolant (from the integrator's dense_output()) of the step from tOld to t"""
+        samples = stepInterpolant(tOld + self.fitNodes * (t - tOld))
+        if len(self.breakpoints) == 0 and len(self.newBreakpoints) == 0:
+            self.newBreakpoints.append(tOld)
+        self.newBreakpoints.append(t)
+        self.newCoefficients.append((self.fitMatrix @ samples.T).T)
+    #  -------------------------------------------------------------------------
+    def collectSteps(self):
+        """Move the steps added while integrating into the breakpoints and coefficients arrays"""
+        if len(self.newCoefficients) == 0:
+            return
+        newCoefficientsNp = np.array(self.newCoefficients)
+        if len(self.breakpoints) == 0:
+            self.coefficients = newCoefficientsNp
+        else:
+            self.coefficients = np.concatenate((self.coefficients, newCoefficientsNp))
+        self.breakpoints = np.concatenate((self.breakpoints, self.newBreakpoints))
+        self.newBreakpoints = []
+        self.newCoefficients = []
+    #  -------------------------------------------------------------------------
+    def numSteps(self):
+        """Return the number of integration steps in the solution"""
+        self.collectSteps()
+        return len(self.coefficients)
+    #  -------------------------------------------------------------------------
+    def timeRange(self):
+        """Return the start and end times of the solution"""
+        self.collectSteps()
+        if len(self.breakpoints) == 0:
+            return 0.0, 0.0
+        return self.breakpoints[0], self.breakpoints[-1]
+    #  -------------------------------------------------------------------------
+    def reportingTimes(self, timeDelta):
+        """Return the times from the start of the solution to its end at intervals of timeDelta"""
+        startTime, endTime = self.timeRange()
+        return np.arange(startTime, endTime, timeDelta)
+    #  -------------------------------------------------------------------------
+    def sample(self, times):
+        """Return the states at the given time (or array of times)
+        Times outside the solution are extrapolated from the first or last step"""
+        self.collectSteps()
+        timesNp = np.atleast_1d(np.asarray(times, dtype=np.float64))
+        stepIndex = np.clip(np.searchsorted(self.breakpoints, timesNp, side="right") - 1,
+                            0, len(self.coefficients) - 1)
+        stepStart = self.breakpoints[stepIndex]
+        x = (timesNp - stepStart) / (self.breakpoints[stepIndex + 1] - stepStart)
+        # Horner's rule, for all the times at once
+        stepCoefficients = self.coefficients[stepIndex]
+        statesNp = stepCoefficients[:, :, self.degree].copy()
+        for power in range(self.degree - 1, -1, -1):
+            statesNp = statesNp * x[:, np.newaxis] + stepCoefficients[:, :, power]
+        if np.ndim(times) == 0:
+            return statesNp[0]
+        return statesNp
+    #  -------------------------------------------------------------------------
+    def append(self, laterSolution):
+        """Add a solution which starts where this one ends (e.g. after continuing from a checkpoint)"""
+        self.collectSteps()
+        laterSolution.collectSteps()
+        if laterSolution.numSteps() == 0:
+            return
+        if self.numSteps() == 0:
+            # Keep the higher of the two degrees, so that an empty solution of a higher degree
+            # can be given the steps of an earlier one and then carry on at its own degree
+            self.breakpoints = laterSolution.breakpoints.copy()
+            if laterSolution.degree < self.degree:
+                self.coefficients = np.pad(laterSolution.coefficients,
+                                           ((0, 0), (0, 0), (0, self.degree - laterSolution.degree)))
+            else:
+                self.degree = laterSolution.degree
+                self.coefficients = laterSolution.coefficients.copy()
+                self.makeFitMatrix()
+            return
+        # Bring both to the same degree by padding the lower one with zero coefficients
+        laterCoefficients = laterSolution.coefficients
+        if laterSolution.degree > self.degree:
+            self.coefficients = np.pad(self.coefficients, ((0, 0), (0, 0), (0, laterSolution.degree - self.degree)))
+            self.degree = laterSolution.degree
+            self.makeFitMatrix()
+        elif laterSolution.degree < self.degree:
+            laterCoefficients = np.pad(laterCoefficients, ((0, 0), (0, 0), (0, self.degree - laterSolution.degree)))
+        self.coefficients = np.concatenate((self.coefficients, laterCoefficients))
+        self.breakpoints = np.concatenate((self.breakpoints, laterSolution.breakpoints[1:]))
+    #  -------------------------------------------------------------------------
+    def saveToFile(self, fileName):
+        """Write the solution to a NumPy .npz file"""
+        if Debug:
+            DT.Mess("DapDenseSolutionC-saveToFile")
+        self.collectSteps()
+        with open(fileName, "wb") as solutionFILE:
+            np.savez_compressed(solutionFILE,
+                                degree=self.degree,
+                                breakpoints=self.breakpoints,
+                                coefficients=self.coefficients)
+    #  -------------------------------------------------------------------------
+    def loadFromFile(self, fileName):
+        """Read a solution previously written by saveToFile"""
+        if Debug:
+            DT.Mess("DapDenseSolutionC-loadFromFile")
+        with np.load(fileName) as solutionNpz:
+            self.degree = int(solutionNpz["degree"])
+            self.breakpoints = solutionNpz["breakpoints"]
+            self.coefficients = solutionNpz["coefficients"]
+        self.newBreakpoints = []
+        self.newCoefficients = []
+        self.makeFitMatrix()
+    #  -------------------------------------------------------------------------
+    def dumps(self):
+        if Debug:
+            DT.Mess("DapDenseSolutionC-dumps")
+        return None
+    #  -------------------------------------------------------------------------
+    def loads(self, state):
+        if Debug:
+            DT.Mess("DapDenseSolutionC-loads")
+        if state:
+            self.Type = state
+        return None
+    #  =========================================================================
@@ -62,6 +62,8 @@ from os import path, getcwd
 from math import sin, cos, tan, asin, acos, atan2, pi
 import Part
 import time
+import threading
+import queue
 from PySide import QtGui, QtCore
 from pivy import coin
 
@@ -69,6 +71,10 @@ import DapToolsMod as DT
 import DapMainMod
 
 Debug = False
+# The kinds of analysis which the solver can do, selected by its AnalysisType property
+ANALYSIS_TYPES = ["Dynamic", "Static Equilibrium", "Modal"]
+# The operating points about which a modal analysis can linearise the equations of motion
+MODAL_STATES = ["Initial", "Static Equilibrium", "Result"]
 # =============================================================================
 def makeDapSolver(name="DapSolver"):
     """Create a Dap Solver object"""
@@ -158,6 +164,26 @@ class DapSolverClass:
         DT.addObjectProperty(solverObject, "DapResultsValid", False, "App::PropertyBool",       "", "")
         DT.addObjectProperty(solverObject, "BodyNames",       [],    "App::PropertyStringList", "", "")
         DT.addObjectProperty(solverObject, "BodyCoG",         [],    "App::PropertyVectorList", "", "")
+        DT.addObjectProperty(solverObject, "SolveProfile",    {},    "App::PropertyMap",        "", "Time [s] spent in each phase of the last solution")
+        DT.addObjectProperty(solverObject, "IntegratorStats", {},    "App::PropertyMap",        "", "Statistics of the integrator in the last solution")
+        DT.addObjectProperty(solverObject, "PersistModel",    False, "App::PropertyBool",       "", "Save the compiled model next to the document for fast re-solves")
+        DT.addObjectProperty(solverObject, "AnimationTimeStep", 0.0, "App::PropertyFloat",      "", "Time step [s] at which the animation samples the solution (0 = DeltaTime)")
+        DT.addObjectProperty(solverObject, "Events",          [],    "App::PropertyStringList", "", "Events to detect while solving - one JSON definition per line (see DapMainC.setUpEvents)")
+        DT.addObjectProperty(solverObject, "SensitivityParameters", [], "App::PropertyStringList", "", "Parameters '<object name>.<property name>' whose sensitivities are integrated with the solution into DapSensitivities.npz")
+        DT.addObjectProperty(solverObject, "AnalysisType",    ANALYSIS_TYPES, "App::PropertyEnumeration", "", "Integrate the motion (Dynamic), find the rest position (Static Equilibrium) or the vibration modes (Modal)")
+        DT.addObjectProperty(solverObject, "StaticTime",      0.0,   "App::PropertyFloat",      "", "Time [s] at which the drivers are evaluated for the static equilibrium")
+        DT.addObjectProperty(solverObject, "ModalState",      MODAL_STATES, "App::PropertyEnumeration", "", "Operating point of the modal analysis: the initial conditions, the static equilibrium at StaticTime or the previous result at StaticTime")
+        DT.addObjectProperty(solverObject, "AnimateMode",     0,     "App::PropertyInteger",    "", "Mode (1 = lowest frequency) to show in the animation after a modal analysis (0 = none)")
+        DT.addObjectProperty(solverObject, "ModeAmplitude",   10.0,  "App::PropertyFloat",      "", "Largest displacement [mm or rad] in the animation of a mode")
+        DT.addObjectProperty(solverObject, "ModeFrequencies", [],    "App::PropertyFloatList",  "", "Undamped natural frequencies [Hz] from the last modal analysis")
+        DT.addObjectProperty(solverObject, "ModeDampingRatios", [],  "App::PropertyFloatList",  "", "Damping ratios of the modes from the last modal analysis (nan for the motions which do not oscillate)")
+        DT.addObjectProperty(solverObject, "ConstraintViolations", False, "App::PropertyBool",  "", "Write the position, velocity and acceleration constraint violations of every joint into the results file")
+        DT.addObjectProperty(solverObject, "MaxConstraintViolations", {}, "App::PropertyMap",   "", "Largest constraint violations (mm or rad, and their rates) over the last solution, and the joints where they occurred")
+        # The list of analysis types may have grown since the document was saved
+        if solverObject.getEnumerationsOfProperty("AnalysisType") != ANALYSIS_TYPES:
+            analysisType = solverObject.AnalysisType
+            solverObject.AnalysisType = ANALYSIS_TYPES
+            solverObject.AnalysisType = analysisType
     #  -------------------------------------------------------------------------
     def dumps(self):
         if Debug:
@@ -268,6 +294,7 @@ class TaskPanelDapSolverClass:
 
         # Set up actions on the solver button and fileDirectory browser
         self.form.solveButton.clicked.connect(self.solveButtonClicked_Callback)
+        self.form.continueButton.clicked.connect(self.continueButtonClicked_Callback)
         self.form.browseFileDirectory.clicked.connect(self.getFolderDirectory_Callback)
 
         # Set the time in the form
@@ -287,6 +314,15 @@ class TaskPanelDapSolverClass:
         self.Accuracy = 5
         self.form.Accuracy.setValue(self.Accuracy)
         self.form.Accuracy.valueChanged.connect(self.accuracyChanged_Callback)
+
+        # The solution runs in a background thread
+        # and its progress is polled from the GUI thread by this timer
+        self.DapMainC_Instance = None
+        self.solveThread = None
+        self.progressTimer = QtCore.QTimer()
+        self.progressTimer.timeout.connect(self.progressTimer_Callback)
+        self.form.solveProgress.setValue(0)
+        self.form.solveProgressLabel.setText("")
     #  -------------------------------------------------------------------------
     def accept(self):
         """Run when we press the OK button"""
@@ -294,6 +330,12 @@ class TaskPanelDapSolverClass:
         if Debug:
             DT.Mess("TaskPanelDapSolverClass-accept")
 
+        # Stop any solution which is still running and keep what it has done so far
+        if self.solveThread is not None and self.solveThread.is_alive():
+            self.DapMainC_Instance.cancelSolution()
+            self.solveThread.join()
+            self.progressTimer_Callback()
+
         # Close the dialog
         Document = CADGui.getDocument(self.solverTaskObject.Document)
         Document.resetEdit()
@@ -319,23 +361,37 @@ class TaskPanelDapSolverClass:
             self.form.Accuracy.setValue(self.Accuracy)
     #  -------------------------------------------------------------------------
     def solveButtonClicked_Callback(self):
-        """Call the MainSolve() method in the DapMainC class"""
+        """Start the MainSolve() steps of the DapMainC class in a background thread
+        or cancel the solution if it is already running"""
 
         if Debug:
             DT.Mess("TaskPanelDapSolverClass-solveButtonClicked_Callback")
 
-        # Change the solve button to red with 'Solving' on it
-        self.form.solveButton.setDisabled(True)
-        self.form.solveButton.setText("Solving")
-        # Do some arithmetic to allow the repaint to happen
-        # before the frame becomes unresponsive due to the big maths
-        self.form.solveButton.repaint()
-        self.form.solveButton.update()
-        t = 0.0
-        for f in range(1000000):
-            t += f/10.0
-        self.form.solveButton.repaint()
-        self.form.solveButton.update()
+        # The solve button doubles as the cancel button while solving
+        if self.solveThread is not None and self.solveThread.is_alive():
+            self.DapMainC_Instance.cancelSolution()
+            self.form.solveButton.setDisabled(True)
+            self.form.solveButton.setText("Stopping")
+            return
+
+        self.startSolution(False)
+    #  -------------------------------------------------------------------------
+    def continueButtonClicked_Callback(self):
+        """Carry on with the previous solution, from where it stopped, up to the new end time"""
+
+        if Debug:
+            DT.Mess("TaskPanelDapSolverClass-continueButtonClicked_Callback")
+
+        if self.solveThread is not None and self.solveThread.is_alive():
+            return
+        self.startSolution(True)
+    #  -------------------------------------------------------------------------
+    def startSolution(self, continueSolution):
+        """Prepare the solution in the GUI thread and start the integration in a background thread
+        either from the initial conditions or continuing from the checkpoint of the previous solution"""
+
+        if Debug:
+            DT.Mess("TaskPanelDapSolverClass-startSolution")
 
         self.solverTaskObject.Directory = self.form.outputDirectory.text()
         if self.form.outputAnimOnly.isChecked():
@@ -346,17 +402,84 @@ class TaskPanelDapSolverClass:
         self.solverTaskObject.TimeLength = self.form.endTime.value()
         self.solverTaskObject.DeltaTime = self.form.reportingTime.value()
 
-        # Instantiate the DapMainC class and run the solver
+        # Instantiate the DapMainC class and prepare the initial conditions
+        # This reads the FreeCAD document, so it must be done in the GUI thread
         self.DapMainC_Instance = DapMainMod.DapMainC(self.solverTaskObject.TimeLength,
                                                      self.solverTaskObject.DeltaTime,
                                                      self.Accuracy,
                                                      self.form.correctInitial.isChecked())
-        if self.DapMainC_Instance.initialised is True:
-            self.DapMainC_Instance.MainSolve()
+        if self.DapMainC_Instance.initialised is False:
+            return
+        # The static equilibrium is found in the blink of an eye, so it needs no background thread
+        if not continueSolution and self.solverTaskObject.AnalysisType == "Static Equilibrium":
+            if self.DapMainC_Instance.StaticSolve(self.solverTaskObject.StaticTime):
+                self.form.solveProgress.setValue(100)
+            self.form.solveProgressLabel.setText(self.DapMainC_Instance.solveMessage)
+            return
+        if not continueSolution and self.solverTaskObject.AnalysisType == "Modal":
+            if self.DapMainC_Instance.ModalSolve(self.solverTaskObject.ModalState,
+                                                 self.solverTaskObject.StaticTime,
+                                                 self.solverTaskObject.AnimateMode,
+                                                 self.solverTaskObject.ModeAmplitude):
+                self.form.solveProgress.setValue(100)
+                self.form.solveProgressLabel.setText(self.DapMainC_Instance.solveMessage)
+            return
+        if continueSolution:
+            if self.DapMainC_Instance.prepareContinuation() is False:
+                return
+        elif self.DapMainC_Instance.prepareSolution() is False:
+            return
+
+        # Change the solve button to 'Cancel' and start the integration in the background
+        self.form.solveButton.setText("Cancel")
+        self.form.continueButton.setEnabled(False)
+        self.form.solveProgress.setValue(0)
+        self.form.solveProgressLabel.setText("Solving...")
+        self.DapMainC_Instance.progressQueue = queue.Queue()
+        self.solveThread = threading.Thread(target=self.DapMainC_Instance.backgroundSolve, daemon=True)
+        self.solveThread.start()
+        self.progressTimer.start(100)
+        # We return immediately and the timer will tell us when the solution is complete
+    #  -------------------------------------------------------------------------
+    def progressTimer_Callback(self):
+        """Show the latest progress of the background solution and tidy up when it has finished"""
+
+        # Only the most recent report in the queue is of interest
+        report = None
+        while True:
+            try:
+                report = self.DapMainC_Instance.progressQueue.get_nowait()
+            except queue.Empty:
+                break
+        if report is not None:
+            self.form.solveProgress.setValue(int(report["fraction"] * 100.0))
+            labelText = "t={:.4g}s  RHS:{}".format(report["time"], report["evaluations"])
+            if report["remaining"] >= 0.0:
+                labelText += "  ETA:{:.0f}s".format(report["remaining"])
+            self.form.solveProgressLabel.setText(labelText)
+
+        if self.solveThread.is_alive():
+            return
+
+        # The solution has finished (or been cancelled) so update the solver object with the results
+        self.progressTimer.stop()
+        if self.DapMainC_Instance.backgroundError != "":
+            CAD.Console.PrintError("Solution failed: " + self.DapMainC_Instance.backgroundError + "\n")
+            self.form.solveProgressLabel.setText("Failed")
+        else:
+            self.DapMainC_Instance.updateSolverObject()
+            if self.DapMainC_Instance.cancelEvent.is_set():
+                self.form.solveProgressLabel.setText("Cancelled at t={:.4g}s".format(self.DapMainC_Instance.solveEndTime))
+            elif self.DapMainC_Instance.solveStatus == "failed":
+                self.form.solveProgressLabel.setText("Failed at t={:.4g}s".format(self.DapMainC_Instance.solveEndTime))
+            else:
+                self.form.solveProgress.setValue(100)
+                self.form.solveProgressLabel.setText("Completed")
 
         # Return the solve button to green with 'Solve' on it
         self.form.solveButton.setText("Solve")
         self.form.solveButton.setEnabled(True)
+        self.form.continueButton.setEnabled(True)
         # We end here after the solving has been completed
         # and will wait for the OK button to be clicked
     #  -------------------------------------------------------------------------
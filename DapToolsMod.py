@@ -58,7 +58,10 @@
 import FreeCAD as CAD
 
 import Part
+import os
 from os import path
+import json
+import hashlib
 import math
 import numpy as np
 
@@ -163,6 +166,17 @@ NIKRAVESH_EXAMPLES_HELPER_TEXT = [
     'Rod Impacting Ground - Nikravesh pp. 176-177',
     'Sliding Pendulum - Nikravesh pp. 94, 118–120',
     'Generic Sliding Pendulum']
+# The mass properties of solids are cached (per unit density and without placement)
+# in this file in the user's FreeCAD data directory, keyed by a hash of the shape's geometry
+MASS_PROPERTY_CACHE_FILE_NAME = "MassPropertyCache.json"
+# The oldest entries are dropped when the cache grows beyond this size
+MASS_PROPERTY_CACHE_SIZE = 2000
+# The cache is loaded on first use
+massPropertyCache = None
+# Set when entries are added, so that the cache is written once after a build rather than on every miss
+massPropertyCacheDirty = False
+# Shape content hashes already computed in this session: (document, object, shape hashCode) --> hash
+shapeContentHashes = {}
 ####################################################################
 # HERE IS THE 'DICTIONARY' to the  DICTIONARIES in the DAP workbench
 # ####################################################################
@@ -442,6 +456,99 @@ def getDapModulePath():
         Mess("DapTools-getDapModulePath")
     return path.dirname(__file__)
 #  -------------------------------------------------------------------------
+def getMassPropertyCacheFileName():
+    """Return the full path of the persistent mass property cache"""
+    return path.join(CAD.getUserAppDataDir(), "NikraDAP", MASS_PROPERTY_CACHE_FILE_NAME)
+#  -------------------------------------------------------------------------
+def getMassPropertyCache():
+    """Return the mass property cache dictionary, loading it from disk the first time"""
+    global massPropertyCache
+    if massPropertyCache is None:
+        massPropertyCache = {}
+        fileName = getMassPropertyCacheFileName()
+        if path.isfile(fileName):
+            try:
+                with open(fileName) as cacheFILE:
+                    massPropertyCache = json.load(cacheFILE)
+            except (OSError, ValueError):
+                CAD.Console.PrintError("Mass property cache could not be read - it will be rebuilt\n")
+    return massPropertyCache
+#  -------------------------------------------------------------------------
+def saveMassPropertyCache():
+    """Write the mass property cache to disk if entries have been added since it was last written"""
+    global massPropertyCacheDirty
+    if Debug:
+        Mess("DapToolsMod-saveMassPropertyCache")
+    if not massPropertyCacheDirty:
+        return
+    massPropertyCacheDirty = False
+    cache = getMassPropertyCache()
+    # The entries are kept in the order of their last use, so the least recently used are dropped
+    while len(cache) > MASS_PROPERTY_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    fileName = getMassPropertyCacheFileName()
+    try:
+        os.makedirs(path.dirname(fileName), exist_ok=True)
+        with open(fileName, "w") as cacheFILE:
+            json.dump(cache, cacheFILE)
+    except OSError:
+        CAD.Console.PrintError("Mass property cache could not be written to " + fileName + "\n")
+#  -------------------------------------------------------------------------
+def clearMassPropertyCache():
+    """Empty the mass property cache (e.g. after an OpenCascade update)"""
+    global massPropertyCache, massPropertyCacheDirty
+    massPropertyCache = {}
+    shapeContentHashes.clear()
+    massPropertyCacheDirty = True
+    saveMassPropertyCache()
+#  -------------------------------------------------------------------------
+def shapeContentHash(solidObj):
+    """Return a hash of the geometry of the object's shape, independent of its placement"""
+    sessionKey = (solidObj.Document.Name, solidObj.Name, solidObj.Shape.hashCode())
+    if sessionKey not in shapeContentHashes:
+        localShape = solidObj.Shape.copy()
+        localShape.Placement = CAD.Placement()
+        shapeContentHashes[sessionKey] = hashlib.sha256(localShape.exportBrepToString().encode()).hexdigest()
+    return shapeContentHashes[sessionKey]
+#  -------------------------------------------------------------------------
+def placementMatrixNp(placement):
+    """Return the rotation of a placement as a 3x3 NumPy matrix"""
+    m = placement.Rotation.toMatrix()
+    return np.array([[m.A11, m.A12, m.A13],
+                     [m.A21, m.A22, m.A23],
+                     [m.A31, m.A32, m.A33]])
+#  -------------------------------------------------------------------------
+def solidMassProperties(solidObj):
+    """Return the volume [mm^3], the world centre of gravity and the world
+    matrix of inertia about the CoG per unit density (3x3 NumPy) of a solid
+    The OpenCascade properties are only computed when the geometry is not in the cache
+    New entries are only written to disk by saveMassPropertyCache"""
+    global massPropertyCacheDirty
+    cache = getMassPropertyCache()
+    shape = solidObj.Shape
+    contentHash = shapeContentHash(solidObj)
+    rotationNp = placementMatrixNp(shape.Placement)
+    if contentHash not in cache:
+        if Debug:
+            Mess("Mass property cache miss: " + solidObj.Name)
+        # Store everything relative to the shape without its placement
+        CoGLocal = shape.Placement.inverse().multVec(shape.CenterOfGravity)
+        m = shape.MatrixOfInertia
+        inertiaWorldNp = np.array([[m.A11, m.A12, m.A13],
+                                   [m.A21, m.A22, m.A23],
+                                   [m.A31, m.A32, m.A33]])
+        cache[contentHash] = {"volume": shape.Volume,
+                              "centreOfGravity": [CoGLocal.x, CoGLocal.y, CoGLocal.z],
+                              "matrixOfInertia": (rotationNp.T @ inertiaWorldNp @ rotationNp).tolist()}
+        massPropertyCacheDirty = True
+    else:
+        # Move the entry to the end, so that the least recently used ones are dropped first
+        cache[contentHash] = cache.pop(contentHash)
+    entry = cache[contentHash]
+    CoGWorld = shape.Placement.multVec(CAD.Vector(*entry["centreOfGravity"]))
+    inertiaWorldNp = rotationNp @ np.array(entry["matrixOfInertia"]) @ rotationNp.T
+    return entry["volume"], CoGWorld, inertiaWorldNp
+#  -------------------------------------------------------------------------
 def computeCoGAndMomentInertia(bodyObj):
     """ Computes:
     1. The world centre of mass of each body based on the weighted sum
@@ -472,7 +579,7 @@ def computeCoGAndMomentInertia(bodyObj):
 
     # Run through all the solids in the assemblyObjectList
     for assemblyPartName in bodyObj.ass4SolidsNames:
-        assemblyObj = bodyObj.Document.findObjects(Name="^" + assemblyPartName + "$")[0]
+        assemblyObj = bodyObj.Document.getObject(assemblyPartName)
         if Debug:
             Mess(str("assembly4 Part Name:  ")+str(assemblyPartName))
 
@@ -480,8 +587,8 @@ def computeCoGAndMomentInertia(bodyObj):
         # assemblyObj.applyRotation(assemblyObj.Placement.Rotation)
         # assemblyObj.applyTranslation(assemblyObj.Placement.Base)
 
-        # Volume of this assemblyObj in cubic mm
-        volume = assemblyObj.Shape.Volume
+        # Volume, CoG and matrix of inertia (per unit density) from the cache if the geometry is unchanged
+        volume, solidCentreOfGravity, solidInertiaNp = solidMassProperties(assemblyObj)
         # Density of this assemblyObj in kg per cubic mm
         index = theMaterialObject.solidsNameList.index(assemblyPartName)
         density = theMaterialObject.materialsDensityList[index] * 1e-9
@@ -494,14 +601,14 @@ def computeCoGAndMomentInertia(bodyObj):
             Mess("Mass [kg]:  "+str(mass))
 
         # Add the Centre of gravities to the list to use in parallel axis theorem
-        solidCentreOfGravityXYPlaneList.append(xyzToXYRotation.toMatrix().multVec(assemblyObj.Shape.CenterOfGravity))
+        solidCentreOfGravityXYPlaneList.append(xyzToXYRotation.toMatrix().multVec(solidCentreOfGravity))
         solidCentreOfGravityXYPlaneList[-1].z = 0.0
 
         # MatrixOfInertia[MoI] around an axis through the CoG of the Placed assemblyObj
         # and normal to the MovePlaneNormal
-        MoIVec = assemblyObj.Shape.MatrixOfInertia.multVec(MovePlaneNormal)
+        MoIVec = solidInertiaNp @ np.array([MovePlaneNormal.x, MovePlaneNormal.y, MovePlaneNormal.z])
         # MoIVecLength = MoIVec.Length * 1e-6
-        MoIVecLength = MoIVec.Length
+        MoIVecLength = np.linalg.norm(MoIVec)
         # solidMoIThroughCoGNormalToMovePlaneList.append(MoIVecLength * mass)
         # MoI calculated in [kg*mm^2]
         solidMoIThroughCoGNormalToMovePlaneList.append(MoIVecLength * density)
@@ -1499,36 +1606,22 @@ def nicePhiPlease(vectorsRelativeCoG):
 
     return phi
 #  -------------------------------------------------------------------------
-def Contact(constraintIndex, indexPoint, bodyObj, kConst, eConst, FlagsList, penetrationDot0List,
-            contact_LN_or_FM=True):
-    penetration = -bodyObj.pointXYWorldNp[indexPoint].y
-    if penetration > 0:
-        penetrationDot = -bodyObj.pointWorldDotNp[indexPoint].y
-        if FlagsList[constraintIndex] is False:
-            penetrationDot0List[constraintIndex] = penetrationDot
-            FlagsList[constraintIndex] = True
-
-        if contact_LN_or_FM is True:
-            forceY = Contact_LN(penetration, penetrationDot, penetrationDot0List[constraintIndex], kConst, eConst)
-        else:
-            forceY = Contact_FM(penetration, penetrationDot, penetrationDot0List[constraintIndex], kConst, eConst)
-
-        Friction = CAD.Vector(0.0, forceY, 0.0)
-        bodyObj.sumForces = bodyObj.sumForces + Friction
-        bodyObj.sumMoments = bodyObj.sumMoments + bodyObj.pVecRot[indexPoint].dot(Friction)
-    else:
-        FlagsList[constraintIndex] = False
-#  -------------------------------------------------------------------------
 def Contact_FM(delta, deltaDot, deltaDot0, kConst, eConst):
+    """Flores contact force for a penetration delta, penetration velocity deltaDot
+    and penetration velocity deltaDot0 at the moment of impact
+    All the arguments may also be NumPy arrays"""
     return kConst * (delta ** 1.5) * (1 + 8 * (1 - eConst) * deltaDot / (5 * eConst * deltaDot0))
 #  -------------------------------------------------------------------------
 def Contact_LN(delta, deltaDot, deltaDot0, kConst, eConst):
+    """Lankarani-Nikravesh contact force - the arguments are as for Contact_FM"""
     return kConst * (delta ** 1.5) * (1 + 3 * (1 - eConst * eConst) * deltaDot / (4 * deltaDot0))
 #  -------------------------------------------------------------------------
 def Friction_A(mu_s, mu_d, v_s, p, k_t, v, fN):
-    return fN * (mu_d + (mu_s - mu_d) * exp(-(abs(v) / v_s) ** p)) * tanh(k_t * v)
+    """Regularised Coulomb friction with a Stribeck velocity v_s for a sliding velocity v
+    All the arguments may also be NumPy arrays"""
+    return fN * (mu_d + (mu_s - mu_d) * np.exp(-(np.abs(v) / v_s) ** p)) * np.tanh(k_t * v)
 #  -------------------------------------------------------------------------
 def Friction_B(mu_s, mu_d, mu_v, v_t, fnt, v, fN):
     vr = v / v_t
-    return fN * (mu_d * tanh(4 * vr) + (mu_s - mu_d) *
-                 vr / (0.25 * vr * vr + 0.75) ** 2) + mu_v * v * tanh(4 * fN / fnt)
+    return fN * (mu_d * np.tanh(4 * vr) + (mu_s - mu_d) *
+                 vr / (0.25 * vr * vr + 0.75) ** 2) + mu_v * v * np.tanh(4 * fN / fnt)